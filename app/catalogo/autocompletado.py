@@ -0,0 +1,156 @@
+# app/catalogo/autocompletado.py
+"""
+Autocompletado de nombres de producto servido desde memoria.
+
+Cada producto aporta una clave por palabra de su nombre normalizado (sin
+acentos, en minúsculas): "Arroz Blanco 1kg" genera "arroz blanco 1kg",
+"blanco 1kg" y "1kg", así que "bla" también lo encuentra. Las claves viven en
+una lista ordenada y un prefijo se resuelve con dos búsquedas binarias; los
+resultados se ordenan por popularidad (cuántas veces aparece el producto en
+ListaProducto).
+
+Igual que el índice de sucursales, se carga en la primera consulta y se
+parchea en el CRUD de productos y de productos de lista.
+"""
+import asyncio
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ListaProducto, Producto
+from app.utils import normalizar_texto
+
+
+# Carácter mayor que cualquier otro en una clave; cierra el rango de un prefijo
+_FIN_PREFIJO = "\U0010ffff"
+
+
+def claves_de(nombre: str) -> List[str]:
+    """Sufijos del nombre normalizado que empiezan en cada palabra."""
+    palabras = normalizar_texto(nombre).split(" ")
+    return [" ".join(palabras[i:]) for i in range(len(palabras)) if palabras[i]]
+
+
+class AutocompletadoProductos:
+    def __init__(self):
+        self._entradas: List[Tuple[str, int]] = []  # (clave, IdProducto), ordenadas
+        self._nombres: Dict[int, str] = {}
+        self._normalizados: Dict[int, str] = {}
+        self._popularidad: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._nombres)
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            result = await db.execute(
+                select(
+                    Producto.IdProducto,
+                    Producto.Nombre,
+                    func.count(ListaProducto.IdLista)
+                )
+                .outerjoin(ListaProducto, ListaProducto.IdProducto == Producto.IdProducto)
+                .group_by(Producto.IdProducto, Producto.Nombre)
+            )
+            self.cargar(result.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, filas) -> None:
+        """Reconstruye la estructura a partir de filas (IdProducto, Nombre, popularidad)."""
+        self._nombres = {}
+        self._normalizados = {}
+        self._popularidad = {}
+        entradas = []
+        for id_producto, nombre, popularidad in filas:
+            self._nombres[id_producto] = nombre
+            self._normalizados[id_producto] = normalizar_texto(nombre)
+            self._popularidad[id_producto] = popularidad or 0
+            entradas.extend((clave, id_producto) for clave in claves_de(nombre))
+        entradas.sort()
+        self._entradas = entradas
+        self.cargado = True
+        self.version += 1
+
+    def _insertar(self, id_producto: int, nombre: str) -> None:
+        self._nombres[id_producto] = nombre
+        self._normalizados[id_producto] = normalizar_texto(nombre)
+        self._popularidad.setdefault(id_producto, 0)
+        for clave in claves_de(nombre):
+            insort(self._entradas, (clave, id_producto))
+
+    def _quitar(self, id_producto: int) -> None:
+        nombre = self._nombres.pop(id_producto, None)
+        if nombre is None:
+            return
+        del self._normalizados[id_producto]
+        for clave in claves_de(nombre):
+            posicion = bisect_left(self._entradas, (clave, id_producto))
+            if posicion < len(self._entradas) and self._entradas[posicion] == (clave, id_producto):
+                del self._entradas[posicion]
+
+    def actualizar(self, id_producto: int, nombre: str) -> None:
+        """Inserta un producto o cambia su nombre, conservando su popularidad."""
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_producto)
+            self._insertar(id_producto, nombre)
+
+    def eliminar(self, id_producto: int) -> None:
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_producto)
+            self._popularidad.pop(id_producto, None)
+
+    def ajustar_popularidad(self, id_producto: int, delta: int) -> None:
+        self.version += 1
+        if self.cargado and id_producto in self._nombres:
+            self._popularidad[id_producto] = max(0, self._popularidad[id_producto] + delta)
+
+    def sugerir(self, prefijo: str, limite: int = 10) -> List[dict]:
+        """Productos cuyo nombre tiene una palabra que empieza por `prefijo`, los más populares primero."""
+        prefijo = normalizar_texto(prefijo)
+        if not prefijo:
+            return []
+
+        # 1. Rango de claves con el prefijo
+        inicio = bisect_left(self._entradas, (prefijo,))
+        fin = bisect_left(self._entradas, (prefijo + _FIN_PREFIJO,), lo=inicio)
+
+        # 2. Productos distintos; los que empiezan por el prefijo ganan en caso de empate
+        desde_inicio: Dict[int, bool] = {}
+        for clave, id_producto in self._entradas[inicio:fin]:
+            inicia = clave == self._normalizados[id_producto]
+            desde_inicio[id_producto] = desde_inicio.get(id_producto, False) or inicia
+
+        # 3. Los `limite` mejores por popularidad
+        mejores = heapq.nsmallest(
+            limite,
+            desde_inicio.items(),
+            key=lambda item: (-self._popularidad[item[0]], not item[1], self._nombres[item[0]])
+        )
+        return [
+            {
+                "IdProducto": id_producto,
+                "Nombre": self._nombres[id_producto],
+                "Popularidad": self._popularidad[id_producto]
+            }
+            for id_producto, _ in mejores
+        ]
+
+
+# Instancia única por proceso
+autocompletado_productos = AutocompletadoProductos()
@@ -0,0 +1,115 @@
+# app/catalogo/busqueda.py
+"""
+Búsqueda de productos por texto sobre Producto.Nombre y Producto.Descripcion.
+
+Combina dos índices GIN creados por migración:
+- trigramas sobre f_unaccent(lower("Nombre")) para coincidencias parciales y
+  con errores de tipeo ("arros" encuentra "Arroz"),
+- tsvector en español sin acentos sobre nombre y descripción para
+  coincidencias por palabra con raíz ("galletas" encuentra "galleta").
+
+Las expresiones se escriben tal cual están en los índices para que el
+planificador los use. La paginación es por cursor ("puntaje:IdProducto"), así
+que pedir la página siguiente no recorre las anteriores.
+"""
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Deben coincidir exactamente con las expresiones de los índices de la migración
+EXPR_NOMBRE = 'f_unaccent(lower(p."Nombre"))'
+EXPR_DOCUMENTO = (
+    "to_tsvector('spanish'::regconfig, "
+    "f_unaccent(coalesce(p.\"Nombre\", '') || ' ' || coalesce(p.\"Descripcion\", '')))"
+)
+
+
+def codificar_cursor(puntaje: Decimal, id_producto: int) -> str:
+    return f"{puntaje}:{id_producto}"
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Decimal, int]:
+    try:
+        puntaje, id_producto = cursor.split(":")
+        return Decimal(puntaje), int(id_producto)
+    except (ValueError, ArithmeticError):
+        raise ValueError("Cursor inválido")
+
+
+async def buscar_productos(
+    db: AsyncSession,
+    termino: str,
+    id_categoria: Optional[int] = None,
+    precio_min: Optional[Decimal] = None,
+    precio_max: Optional[Decimal] = None,
+    cursor: Optional[str] = None,
+    limite: int = 20
+) -> Tuple[List[dict], Optional[str]]:
+    """Una página de resultados ordenada por relevancia y el cursor de la siguiente."""
+    parametros = {"termino": termino, "limite": limite + 1}
+
+    # 1. Filtros opcionales; el de precio se resuelve con EXISTS sobre ProductoProveedor
+    filtros = []
+    if id_categoria is not None:
+        filtros.append('p."IdCategoria" = :id_categoria')
+        parametros["id_categoria"] = id_categoria
+    if precio_min is not None or precio_max is not None:
+        condiciones_precio = ['pp."IdProducto" = p."IdProducto"']
+        if precio_min is not None:
+            condiciones_precio.append('pp."Precio" >= :precio_min')
+            parametros["precio_min"] = precio_min
+        if precio_max is not None:
+            condiciones_precio.append('pp."Precio" <= :precio_max')
+            parametros["precio_max"] = precio_max
+        filtros.append(
+            f'EXISTS (SELECT 1 FROM "ProductoProveedor" pp WHERE {" AND ".join(condiciones_precio)})'
+        )
+    filtros_sql = "".join(f" AND {f}" for f in filtros)
+
+    # 2. Posición del cursor
+    pagina_sql = ""
+    if cursor:
+        puntaje, id_producto = decodificar_cursor(cursor)
+        pagina_sql = (
+            'WHERE c.puntaje < :cursor_puntaje '
+            'OR (c.puntaje = :cursor_puntaje AND c."IdProducto" > :cursor_id)'
+        )
+        parametros["cursor_puntaje"] = puntaje
+        parametros["cursor_id"] = id_producto
+
+    # 3. Candidatos por índice (trigramas o texto completo), puntuados y paginados
+    stmt = text(f"""
+        WITH consulta AS (
+            SELECT f_unaccent(lower(:termino)) AS texto,
+                   plainto_tsquery('spanish'::regconfig, f_unaccent(:termino)) AS tsq
+        ),
+        candidatos AS (
+            SELECT p."IdProducto",
+                   round((word_similarity(consulta.texto, {EXPR_NOMBRE})
+                          + ts_rank({EXPR_DOCUMENTO}, consulta.tsq))::numeric, 6) AS puntaje
+            FROM "Producto" p, consulta
+            WHERE (consulta.texto <% {EXPR_NOMBRE} OR {EXPR_DOCUMENTO} @@ consulta.tsq)
+            {filtros_sql}
+        )
+        SELECT p."IdProducto", p."IdCategoria", p."IdUnidadMedida", p."Nombre", p."UrlImagen",
+               p."Descripcion", p."FechaCreacion", r."PrecioMinimo", c.puntaje AS "Puntaje"
+        FROM candidatos c
+        JOIN "Producto" p ON p."IdProducto" = c."IdProducto"
+        LEFT JOIN "PrecioProductoResumen" r ON r."IdProducto" = c."IdProducto"
+        {pagina_sql}
+        ORDER BY c.puntaje DESC, c."IdProducto"
+        LIMIT :limite
+    """)
+    result = await db.execute(stmt, parametros)
+    filas = [dict(fila) for fila in result.mappings().all()]
+
+    # 4. Si sobró una fila hay página siguiente
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(ultima["Puntaje"], ultima["IdProducto"])
+    return filas, siguiente
@@ -0,0 +1,149 @@
+# app/catalogo/categorias.py
+"""
+Jerarquía de categorías ("Lácteos" > "Leches" > "Leches deslactosadas").
+
+Categoria.IdCategoriaPadre guarda el padre directo y CategoriaJerarquia la
+clausura transitiva: una fila (IdAncestro, IdDescendiente, Profundidad) por
+cada par ancestro-descendiente, incluida la de cada categoría consigo misma con
+profundidad 0. Así los productos o conteos de un subárbol salen de un solo join
+indexado (IdAncestro = :id) sin consultas recursivas.
+
+La clausura se mantiene aquí, en la misma transacción que el CRUD de
+categorías; estas funciones hacen flush pero no commit.
+"""
+from typing import Optional
+
+from sqlalchemy import Select, delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Categoria, CategoriaJerarquia, Producto
+
+
+class CicloCategoriaError(ValueError):
+    """El nuevo padre es la propia categoría o uno de sus descendientes."""
+
+
+async def insertar_en_jerarquia(db: AsyncSession, categoria: Categoria) -> None:
+    """Agrega una categoría recién creada (sin descendientes) bajo su IdCategoriaPadre."""
+    # El flush le asigna IdCategoria
+    await db.flush()
+    await db.execute(text("""
+        INSERT INTO "CategoriaJerarquia" ("IdAncestro", "IdDescendiente", "Profundidad")
+        SELECT :id, :id, 0
+        UNION ALL
+        SELECT "IdAncestro", :id, "Profundidad" + 1
+        FROM "CategoriaJerarquia"
+        WHERE "IdDescendiente" = :padre
+    """), {"id": categoria.IdCategoria, "padre": categoria.IdCategoriaPadre})
+
+
+async def mover_en_jerarquia(db: AsyncSession, id_categoria: int, id_padre: Optional[int]) -> None:
+    """Cuelga la categoría (con todo su subárbol) de `id_padre`, o la deja como raíz si es None."""
+    await db.flush()
+
+    # 1. No se puede colgar de sí misma ni de un descendiente
+    if id_padre is not None:
+        result = await db.execute(
+            select(CategoriaJerarquia.Profundidad).where(
+                CategoriaJerarquia.IdAncestro == id_categoria,
+                CategoriaJerarquia.IdDescendiente == id_padre
+            )
+        )
+        if result.first() is not None:
+            raise CicloCategoriaError("La categoría no puede quedar dentro de sí misma")
+
+    # 2. Cortar los caminos de los ancestros actuales hacia el subárbol
+    await db.execute(text("""
+        DELETE FROM "CategoriaJerarquia" j
+        USING "CategoriaJerarquia" sub, "CategoriaJerarquia" anc
+        WHERE sub."IdAncestro" = :id
+          AND anc."IdDescendiente" = :id AND anc."Profundidad" > 0
+          AND j."IdAncestro" = anc."IdAncestro"
+          AND j."IdDescendiente" = sub."IdDescendiente"
+    """), {"id": id_categoria})
+
+    # 3. Unir cada ancestro del nuevo padre con cada nodo del subárbol
+    if id_padre is not None:
+        await db.execute(text("""
+            INSERT INTO "CategoriaJerarquia" ("IdAncestro", "IdDescendiente", "Profundidad")
+            SELECT anc."IdAncestro", sub."IdDescendiente", anc."Profundidad" + sub."Profundidad" + 1
+            FROM "CategoriaJerarquia" anc
+            CROSS JOIN "CategoriaJerarquia" sub
+            WHERE anc."IdDescendiente" = :padre AND sub."IdAncestro" = :id
+        """), {"id": id_categoria, "padre": id_padre})
+
+    await db.execute(
+        update(Categoria).where(Categoria.IdCategoria == id_categoria).values(IdCategoriaPadre=id_padre)
+    )
+
+
+async def quitar_de_jerarquia(db: AsyncSession, categoria: Categoria) -> None:
+    """
+    Saca una categoría que se va a borrar: sus hijas pasan a colgar de su padre
+    y los caminos que la atravesaban se acortan en uno.
+    """
+    await db.flush()
+    id_categoria = categoria.IdCategoria
+
+    # 1. Caminos ancestro -> descendiente que pasaban por ella
+    await db.execute(text("""
+        UPDATE "CategoriaJerarquia" j
+        SET "Profundidad" = j."Profundidad" - 1
+        FROM "CategoriaJerarquia" anc, "CategoriaJerarquia" sub
+        WHERE anc."IdDescendiente" = :id AND anc."Profundidad" > 0
+          AND sub."IdAncestro" = :id AND sub."Profundidad" > 0
+          AND j."IdAncestro" = anc."IdAncestro"
+          AND j."IdDescendiente" = sub."IdDescendiente"
+    """), {"id": id_categoria})
+
+    # 2. Sus propias filas y el padre de sus hijas
+    await db.execute(
+        delete(CategoriaJerarquia).where(
+            (CategoriaJerarquia.IdAncestro == id_categoria) | (CategoriaJerarquia.IdDescendiente == id_categoria)
+        )
+    )
+    await db.execute(
+        update(Categoria)
+        .where(Categoria.IdCategoriaPadre == id_categoria)
+        .values(IdCategoriaPadre=categoria.IdCategoriaPadre)
+    )
+
+
+def productos_del_subarbol(id_categoria: int) -> Select:
+    """Productos de la categoría y de todas sus subcategorías."""
+    return (
+        select(Producto)
+        .join(CategoriaJerarquia, CategoriaJerarquia.IdDescendiente == Producto.IdCategoria)
+        .where(CategoriaJerarquia.IdAncestro == id_categoria)
+    )
+
+
+def subcategorias_con_conteo(id_categoria: int) -> Select:
+    """
+    La categoría y sus descendientes, cada uno con la cantidad de productos de
+    su propio subárbol.
+    """
+    subarbol = CategoriaJerarquia.__table__.alias("subarbol")
+    return (
+        select(
+            Categoria,
+            CategoriaJerarquia.Profundidad,
+            func.count(Producto.IdProducto).label("TotalProductos")
+        )
+        .join(CategoriaJerarquia, CategoriaJerarquia.IdDescendiente == Categoria.IdCategoria)
+        .join(subarbol, subarbol.c.IdAncestro == Categoria.IdCategoria)
+        .outerjoin(Producto, Producto.IdCategoria == subarbol.c.IdDescendiente)
+        .where(CategoriaJerarquia.IdAncestro == id_categoria)
+        .group_by(Categoria.IdCategoria, CategoriaJerarquia.Profundidad)
+        .order_by(CategoriaJerarquia.Profundidad, Categoria.NombreCategoria)
+    )
+
+
+def ruta_categoria(id_categoria: int) -> Select:
+    """Ancestros de la categoría desde la raíz hasta ella misma."""
+    return (
+        select(Categoria)
+        .join(CategoriaJerarquia, CategoriaJerarquia.IdAncestro == Categoria.IdCategoria)
+        .where(CategoriaJerarquia.IdDescendiente == id_categoria)
+        .order_by(CategoriaJerarquia.Profundidad.desc())
+    )
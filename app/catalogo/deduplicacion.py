@@ -0,0 +1,367 @@
+# app/catalogo/deduplicacion.py
+"""
+Detección y fusión de productos duplicados ("Leche Entera 1L" y "leche entera
+1 lt" creados como dos Producto distintos).
+
+El proceso por lotes tiene tres pasos:
+
+1. Bloqueo: solo se comparan productos de la misma categoría, con unidad de
+   medida compatible (misma unidad base según ConversionUnidad o, si no hay
+   conversión, la misma IdUnidadMedida) y el mismo contenido del empaque.
+2. Candidatos: dentro de cada bloque los nombres se normalizan (sin acentos,
+   cantidades como "1 lt" o "1000 ml" llevadas a "1l", sin palabras vacías) y
+   se parten en trigramas. Un índice invertido sobre los trigramas menos
+   frecuentes de cada nombre (filtrado por prefijo) da solo los pares que
+   pueden alcanzar el umbral, sin comparar todos contra todos.
+3. Puntaje: promedio entre la similitud de Jaccard de palabras y la de
+   trigramas. Como el puntaje exige trigramas >= 2 * umbral - 1, el filtro
+   del paso 2 no descarta ningún par que lo alcanzaría.
+
+Los pares aceptados se agrupan (unión-búsqueda) y en cada grupo se conserva el
+producto con más precios. El resultado son propuestas en
+PropuestaFusionProducto; fusionar una mueve sus precios, listas, historial,
+alertas y cuarentena al producto conservado y borra el duplicado.
+"""
+import asyncio
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ConversionUnidad, Producto, ProductoProveedor, PropuestaFusionProducto
+from app.precios.resumen import recalcular_resumen
+from app.precios.unidades import recalcular_precio_unidad
+from app.utils import normalizar_texto
+
+
+UMBRAL_FUSION = 0.8
+
+# Palabras que no distinguen un producto de otro; "con" y "sin" sí lo hacen
+PALABRAS_VACIAS = frozenset({"de", "del", "la", "el", "los", "las", "y", "en", "x", "para", "a", "al"})
+
+# Unidad escrita en el nombre -> (unidad base, factor)
+UNIDADES_NOMBRE = {
+    **dict.fromkeys(["kg", "kgs", "kilo", "kilos", "kilogramo", "kilogramos"], ("kg", 1.0)),
+    **dict.fromkeys(["g", "gr", "grs", "gramo", "gramos"], ("kg", 0.001)),
+    **dict.fromkeys(["l", "lt", "lts", "litro", "litros"], ("l", 1.0)),
+    **dict.fromkeys(["ml", "cc", "mililitro", "mililitros"], ("l", 0.001)),
+    **dict.fromkeys(["u", "un", "und", "unds", "unidad", "unidades"], ("unidad", 1.0)),
+}
+
+_PATRON_CANTIDAD = re.compile(r"(\d+(?:[.,]\d+)?)\s*([a-z]+)?\b")
+_PATRON_PALABRA = re.compile(r"[a-z0-9]+")
+
+
+class FichaNombre(NamedTuple):
+    palabras: FrozenSet[str]
+    cantidades: FrozenSet[str]   # "1l", "0.5kg", "6" (números sueltos)
+    trigramas: FrozenSet[str]
+
+
+def _formatear_cantidad(valor: float, unidad: str) -> str:
+    return f"{round(valor, 6):g}{unidad}"
+
+
+def _singular(palabra: str) -> str:
+    # Suficiente para "enteras" -> "entera" o "galletas" -> "galleta"
+    return palabra[:-1] if len(palabra) > 4 and palabra.endswith("s") and not palabra.endswith("ss") else palabra
+
+
+def ficha_nombre(nombre: str) -> FichaNombre:
+    """Palabras, cantidades y trigramas del nombre normalizado."""
+    texto = normalizar_texto(nombre)
+
+    # 1. Cantidades con o sin unidad, llevadas a la unidad base
+    cantidades = set()
+
+    def _extraer(coincidencia: re.Match) -> str:
+        valor = float(coincidencia.group(1).replace(",", "."))
+        unidad = coincidencia.group(2)
+        if unidad in UNIDADES_NOMBRE:
+            base, factor = UNIDADES_NOMBRE[unidad]
+            cantidades.add(_formatear_cantidad(valor * factor, base))
+        else:
+            cantidades.add(_formatear_cantidad(valor, ""))
+            if unidad:
+                return f" {unidad} "  # "2x" o "500ml" mal escrito: la palabra se conserva
+        return " "
+
+    texto = _PATRON_CANTIDAD.sub(_extraer, texto)
+
+    # 2. Palabras sin las vacías
+    palabras = frozenset(
+        _singular(p) for p in _PATRON_PALABRA.findall(texto) if p not in PALABRAS_VACIAS
+    )
+
+    # 3. Trigramas de cada palabra con relleno, igual que pg_trgm
+    trigramas = set()
+    for palabra in palabras:
+        relleno = f"  {palabra} "
+        trigramas.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return FichaNombre(palabras, frozenset(cantidades), frozenset(trigramas))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    comunes = len(a & b)
+    return comunes / (len(a) + len(b) - comunes)
+
+
+def similitud(a: FichaNombre, b: FichaNombre) -> float:
+    """Puntaje entre 0 y 1; 0 si los nombres indican cantidades distintas."""
+    if a.cantidades and b.cantidades and a.cantidades != b.cantidades:
+        return 0.0
+    return (_jaccard(a.palabras, b.palabras) + _jaccard(a.trigramas, b.trigramas)) / 2
+
+
+def _pares_candidatos(fichas: List[FichaNombre], umbral_trigramas: float) -> Iterable[Tuple[int, int]]:
+    """
+    Pares (i, j) de `fichas` cuyo Jaccard de trigramas puede ser >= umbral_trigramas.
+    Filtrado por prefijo: con los trigramas de cada ficha ordenados del menos al
+    más frecuente, dos conjuntos que alcanzan el umbral comparten al menos uno de
+    los primeros |x| - ceil(umbral * |x|) + 1 de cada uno.
+    """
+    frecuencia = Counter(t for ficha in fichas for t in ficha.trigramas)
+    ordenadas = sorted(
+        (i for i in range(len(fichas)) if fichas[i].trigramas),
+        key=lambda i: len(fichas[i].trigramas)
+    )
+
+    indice: Dict[str, List[int]] = {}
+    for i in ordenadas:
+        trigramas = sorted(fichas[i].trigramas, key=lambda t: (frecuencia[t], t))
+        tamano = len(trigramas)
+        prefijo = trigramas[:tamano - math.ceil(umbral_trigramas * tamano) + 1]
+
+        vistos: Set[int] = set()
+        for trigrama in prefijo:
+            for j in indice.get(trigrama, ()):
+                # Se recorre por tamaño creciente: j nunca es más grande que i
+                if j not in vistos and len(fichas[j].trigramas) >= umbral_trigramas * tamano:
+                    vistos.add(j)
+                    yield j, i
+            indice.setdefault(trigrama, []).append(i)
+
+
+class _Conjuntos:
+    """Unión-búsqueda con compresión de caminos."""
+
+    def __init__(self):
+        self._padre: Dict[int, int] = {}
+
+    def raiz(self, x: int) -> int:
+        self._padre.setdefault(x, x)
+        while self._padre[x] != x:
+            self._padre[x] = self._padre[self._padre[x]]
+            x = self._padre[x]
+        return x
+
+    def unir(self, a: int, b: int) -> None:
+        self._padre[self.raiz(a)] = self.raiz(b)
+
+
+def proponer_fusiones(productos, umbral: float = UMBRAL_FUSION) -> List[Tuple[int, int, float]]:
+    """
+    Recibe filas (IdProducto, Nombre, clave de bloque, cantidad de precios) y
+    devuelve (IdProductoConservar, IdProductoDuplicado, puntaje). Cálculo puro,
+    sin base de datos: se puede correr en un hilo aparte.
+    """
+    # 1. Bloques
+    bloques: Dict[tuple, List[Tuple[int, FichaNombre]]] = {}
+    precios: Dict[int, int] = {}
+    for id_producto, nombre, bloque, cantidad_precios in productos:
+        bloques.setdefault(bloque, []).append((id_producto, ficha_nombre(nombre)))
+        precios[id_producto] = cantidad_precios
+
+    # 2. Candidatos y puntaje dentro de cada bloque
+    umbral_trigramas = max(2 * umbral - 1, 0.0)
+    conjuntos = _Conjuntos()
+    fichas_de: Dict[int, FichaNombre] = {}
+    for miembros in bloques.values():
+        if len(miembros) < 2:
+            continue
+        fichas = [ficha for _, ficha in miembros]
+        for i, j in _pares_candidatos(fichas, umbral_trigramas):
+            if similitud(fichas[i], fichas[j]) >= umbral:
+                id_i, id_j = miembros[i][0], miembros[j][0]
+                conjuntos.unir(id_i, id_j)
+                fichas_de[id_i], fichas_de[id_j] = fichas[i], fichas[j]
+
+    # 3. Grupos: se conserva el de más precios y, a igualdad, el más antiguo
+    grupos: Dict[int, List[int]] = {}
+    for id_producto in fichas_de:
+        grupos.setdefault(conjuntos.raiz(id_producto), []).append(id_producto)
+
+    propuestas = []
+    for miembros in grupos.values():
+        conservar = max(miembros, key=lambda p: (precios[p], -p))
+        for duplicado in miembros:
+            if duplicado == conservar:
+                continue
+            # En cadenas A~B~C el extremo puede quedar lejos del conservado: no se propone
+            puntaje = similitud(fichas_de[conservar], fichas_de[duplicado])
+            if puntaje >= umbral:
+                propuestas.append((conservar, duplicado, round(puntaje, 4)))
+    propuestas.sort(key=lambda p: (-p[2], p[0], p[1]))
+    return propuestas
+
+
+async def leer_productos(db: AsyncSession) -> List[tuple]:
+    """Filas para proponer_fusiones con la clave (IdCategoria, unidad compatible, contenido)."""
+    precios = (
+        select(ProductoProveedor.IdProducto, func.count().label("Precios"))
+        .group_by(ProductoProveedor.IdProducto)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            Producto.IdProducto,
+            Producto.Nombre,
+            Producto.IdCategoria,
+            Producto.IdUnidadMedida,
+            Producto.CantidadContenido,
+            ConversionUnidad.UnidadBase,
+            ConversionUnidad.Factor,
+            func.coalesce(precios.c.Precios, 0),
+        )
+        .outerjoin(ConversionUnidad, ConversionUnidad.IdUnidadMedida == Producto.IdUnidadMedida)
+        .outerjoin(precios, precios.c.IdProducto == Producto.IdProducto)
+    )
+
+    filas = []
+    for id_producto, nombre, id_categoria, id_unidad, cantidad, unidad_base, factor, n_precios in result.all():
+        # "1 litro" y "1000 ml" caen en el mismo bloque si ambas unidades tienen conversión
+        if unidad_base is not None:
+            unidad = unidad_base
+            contenido = float(cantidad or 1) * float(factor)
+        else:
+            unidad = f"um:{id_unidad}"
+            contenido = float(cantidad or 1)
+        filas.append((id_producto, nombre, (id_categoria, unidad, round(contenido, 6)), n_precios))
+    return filas
+
+
+async def generar_propuestas(db: AsyncSession, umbral: float = UMBRAL_FUSION) -> int:
+    """
+    Recalcula las propuestas de fusión. Reemplaza las pendientes y no vuelve a
+    proponer pares ya descartados. Devuelve cuántas quedaron. No hace commit.
+    """
+    # 1. Leer el catálogo y calcular fuera del bucle de eventos
+    productos = await leer_productos(db)
+    propuestas = await asyncio.to_thread(proponer_fusiones, productos, umbral)
+
+    # 2. Pares descartados por un revisor
+    result = await db.execute(
+        select(PropuestaFusionProducto.IdProductoConservar, PropuestaFusionProducto.IdProductoDuplicado)
+        .where(PropuestaFusionProducto.Estado == "descartada")
+    )
+    descartadas = {frozenset(par) for par in result.all()}
+
+    # 3. Reemplazar las pendientes
+    await db.execute(delete(PropuestaFusionProducto).where(PropuestaFusionProducto.Estado == "pendiente"))
+    ahora = datetime.now()
+    nuevas = [
+        {
+            "IdProductoConservar": conservar,
+            "IdProductoDuplicado": duplicado,
+            "Puntaje": puntaje,
+            "Estado": "pendiente",
+            "FechaCreacion": ahora,
+        }
+        for conservar, duplicado, puntaje in propuestas
+        if frozenset((conservar, duplicado)) not in descartadas
+    ]
+    if nuevas:
+        await db.execute(PropuestaFusionProducto.__table__.insert(), nuevas)
+    return len(nuevas)
+
+
+# Si ambos productos tienen precio del mismo proveedor se queda el más reciente
+SQL_PRECIOS_MAS_RECIENTES = text("""
+    UPDATE "ProductoProveedor" c
+    SET "Precio" = d."Precio", "PrecioOferta" = d."PrecioOferta", "DescripcionOferta" = d."DescripcionOferta",
+        "FechaOferta" = d."FechaOferta", "FechaPrecio" = d."FechaPrecio"
+    FROM "ProductoProveedor" d
+    WHERE c."IdProducto" = :conservar AND d."IdProducto" = :duplicado
+      AND c."IdProveedor" = d."IdProveedor"
+      AND d."FechaPrecio" > c."FechaPrecio"
+""")
+
+SQL_BORRAR_PRECIOS_REPETIDOS = text("""
+    DELETE FROM "ProductoProveedor" d
+    USING "ProductoProveedor" c
+    WHERE d."IdProducto" = :duplicado AND c."IdProducto" = :conservar
+      AND c."IdProveedor" = d."IdProveedor"
+""")
+
+# Si una lista tiene ambos productos las cantidades se suman en una sola fila
+SQL_SUMAR_LISTAS = text("""
+    UPDATE "ListaProducto" c
+    SET "Cantidad" = c."Cantidad" + d."Cantidad"
+    FROM "ListaProducto" d
+    WHERE c."IdProducto" = :conservar AND d."IdProducto" = :duplicado
+      AND c."IdLista" = d."IdLista"
+""")
+
+SQL_BORRAR_LISTAS_REPETIDAS = text("""
+    DELETE FROM "ListaProducto" d
+    USING "ListaProducto" c
+    WHERE d."IdProducto" = :duplicado AND c."IdProducto" = :conservar
+      AND c."IdLista" = d."IdLista"
+""")
+
+# Tablas sin conflictos de clave: basta con cambiar el IdProducto
+TABLAS_REAPUNTAR = ("ProductoProveedor", "ListaProducto", "HistorialPrecio", "AlertaPrecio", "PrecioCuarentena")
+
+
+async def fusionar(db: AsyncSession, propuesta: PropuestaFusionProducto) -> Dict[str, int]:
+    """
+    Aplica una propuesta: todo lo del duplicado pasa al conservado y el
+    duplicado se borra. Devuelve cuántas filas se movieron por tabla. No hace commit.
+    """
+    parametros = {"conservar": propuesta.IdProductoConservar, "duplicado": propuesta.IdProductoDuplicado}
+
+    # 1. Conflictos de clave primaria en precios y listas
+    await db.execute(SQL_PRECIOS_MAS_RECIENTES, parametros)
+    await db.execute(SQL_BORRAR_PRECIOS_REPETIDOS, parametros)
+    await db.execute(SQL_SUMAR_LISTAS, parametros)
+    await db.execute(SQL_BORRAR_LISTAS_REPETIDAS, parametros)
+
+    # 2. Reapuntar el resto
+    movidas = {}
+    for tabla in TABLAS_REAPUNTAR:
+        result = await db.execute(
+            text(f'UPDATE "{tabla}" SET "IdProducto" = :conservar WHERE "IdProducto" = :duplicado'),
+            parametros
+        )
+        movidas[tabla] = result.rowcount
+
+    # 3. Borrar el duplicado y recalcular los derivados del conservado
+    await db.execute(delete(Producto).where(Producto.IdProducto == propuesta.IdProductoDuplicado))
+    await recalcular_resumen(db, [propuesta.IdProductoConservar, propuesta.IdProductoDuplicado])
+    await recalcular_precio_unidad(db, [propuesta.IdProductoConservar])
+
+    # 4. La propuesta queda aplicada; las pendientes que nombran al duplicado ya no
+    #    tienen sentido y se borran (marcarlas "descartada" bloquearía esos pares para siempre)
+    propuesta.Estado = "aplicada"
+    propuesta.FechaRevision = datetime.now()
+    await db.execute(
+        delete(PropuestaFusionProducto)
+        .where(
+            PropuestaFusionProducto.Estado == "pendiente",
+            PropuestaFusionProducto.IdPropuesta != propuesta.IdPropuesta,
+            (PropuestaFusionProducto.IdProductoConservar == propuesta.IdProductoDuplicado)
+            | (PropuestaFusionProducto.IdProductoDuplicado == propuesta.IdProductoDuplicado)
+        )
+    )
+    return movidas
+
+
+async def precios_de(db: AsyncSession, id_producto: int) -> List[ProductoProveedor]:
+    result = await db.execute(select(ProductoProveedor).where(ProductoProveedor.IdProducto == id_producto))
+    return list(result.scalars().all())
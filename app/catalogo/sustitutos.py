@@ -0,0 +1,264 @@
+# app/catalogo/sustitutos.py
+"""
+Índice en memoria de productos sustitutos.
+
+Dos productos son sustitutos si comparten categoría y su unidad de medida es
+compatible: misma unidad base según ConversionUnidad ("kg", "l", "unidad") o,
+si la unidad no tiene conversión, la misma IdUnidadMedida. Cada grupo
+(IdCategoria, unidad) guarda una lista ordenada de (precio de referencia,
+IdProducto), donde el precio de referencia es el promedio entre proveedores
+por unidad base del empaque. Los sustitutos más parecidos de un producto son
+sus vecinos en esa lista.
+
+Los precios salen de la matriz de precios en memoria; el índice se parchea
+desde app.precios.sincronizacion y desde el CRUD de productos.
+"""
+import asyncio
+import math
+from bisect import bisect_left, insort
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ConversionUnidad, Producto
+from app.precios.matriz import matriz_precios
+
+
+# Cuántos sustitutos por producto se prueban al completar una canasta
+CANDIDATOS_CANASTA = 5
+
+
+class FichaProducto(NamedTuple):
+    grupo: Tuple[int, str]      # (IdCategoria, unidad compatible)
+    empaque: float              # Unidades (base o de medida) que trae el empaque
+    referencia: Optional[float]  # Centavos por unidad; None si nadie lo vende
+
+
+def unidad_compatible(id_unidad_medida: int, conversion: Optional[Tuple[str, float]]) -> str:
+    return conversion[0] if conversion else f"um:{id_unidad_medida}"
+
+
+def similitud(a: float, b: float) -> float:
+    """Cociente entre el menor y el mayor precio: 1 si son iguales."""
+    if a <= 0 or b <= 0:
+        return 0.0
+    return min(a, b) / max(a, b)
+
+
+class SustitutosProductos:
+    def __init__(self):
+        self._fichas: Dict[int, FichaProducto] = {}
+        self._grupos: Dict[Tuple[int, str], List[Tuple[float, int]]] = {}
+        self._conversiones: Dict[int, Tuple[str, float]] = {}
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._fichas)
+
+    def __contains__(self, id_producto: int) -> bool:
+        return id_producto in self._fichas
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        await matriz_precios.asegurar_cargado(db)
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            conversiones = await db.execute(
+                select(ConversionUnidad.IdUnidadMedida, ConversionUnidad.UnidadBase, ConversionUnidad.Factor)
+            )
+            productos = await db.execute(
+                select(
+                    Producto.IdProducto,
+                    Producto.IdCategoria,
+                    Producto.IdUnidadMedida,
+                    Producto.CantidadContenido
+                )
+            )
+            self.cargar(conversiones.all(), productos.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, conversiones, productos) -> None:
+        """
+        Reconstruye el índice a partir de filas (IdUnidadMedida, UnidadBase, Factor)
+        y (IdProducto, IdCategoria, IdUnidadMedida, CantidadContenido).
+        """
+        self._conversiones = {
+            id_unidad: (unidad_base, float(factor)) for id_unidad, unidad_base, factor in conversiones
+        }
+        productos = list(productos)
+        promedios = matriz_precios.promedios([p[0] for p in productos]).tolist() if productos else []
+
+        self._fichas = {}
+        self._grupos = {}
+        for (id_producto, id_categoria, id_unidad, cantidad), promedio in zip(productos, promedios):
+            ficha = self._ficha(id_categoria, id_unidad, cantidad, promedio)
+            self._fichas[id_producto] = ficha
+            if ficha.referencia is not None:
+                self._grupos.setdefault(ficha.grupo, []).append((ficha.referencia, id_producto))
+        for miembros in self._grupos.values():
+            miembros.sort()
+        self.cargado = True
+        self.version += 1
+
+    def invalidar(self) -> None:
+        """Fuerza una recarga completa (importaciones, cambios de conversiones, ...)."""
+        self.cargado = False
+        self.version += 1
+
+    # --- Escrituras -------------------------------------------------------
+
+    def _ficha(self, id_categoria: int, id_unidad: int, cantidad, promedio: float) -> FichaProducto:
+        conversion = self._conversiones.get(id_unidad)
+        empaque = float(cantidad or 1) * (conversion[1] if conversion else 1.0)
+        referencia = None
+        if not math.isnan(promedio) and empaque > 0:
+            referencia = promedio / empaque
+        return FichaProducto((id_categoria, unidad_compatible(id_unidad, conversion)), empaque, referencia)
+
+    def _quitar(self, id_producto: int) -> Optional[FichaProducto]:
+        ficha = self._fichas.pop(id_producto, None)
+        if ficha is None or ficha.referencia is None:
+            return ficha
+        miembros = self._grupos.get(ficha.grupo, [])
+        posicion = bisect_left(miembros, (ficha.referencia, id_producto))
+        if posicion < len(miembros) and miembros[posicion] == (ficha.referencia, id_producto):
+            del miembros[posicion]
+        if not miembros:
+            self._grupos.pop(ficha.grupo, None)
+        return ficha
+
+    def _insertar(self, id_producto: int, ficha: FichaProducto) -> None:
+        self._fichas[id_producto] = ficha
+        if ficha.referencia is not None:
+            insort(self._grupos.setdefault(ficha.grupo, []), (ficha.referencia, id_producto))
+
+    def _promedio(self, id_producto: int) -> float:
+        return float(matriz_precios.promedios([id_producto])[0])
+
+    def actualizar_producto(self, id_producto: int, id_categoria: int, id_unidad: int, cantidad) -> None:
+        """Alta o cambio de categoría, unidad o contenido de un producto."""
+        self.version += 1
+        if not self.cargado:
+            return
+        if not matriz_precios.cargado:
+            self.cargado = False
+            return
+        self._quitar(id_producto)
+        self._insertar(id_producto, self._ficha(id_categoria, id_unidad, cantidad, self._promedio(id_producto)))
+
+    def actualizar_precio(self, id_producto: int) -> None:
+        """Recalcula el precio de referencia de un producto cuyos precios cambiaron."""
+        self.version += 1
+        if not self.cargado or id_producto not in self._fichas:
+            return
+        if not matriz_precios.cargado:
+            self.cargado = False
+            return
+        ficha = self._quitar(id_producto)
+        promedio = self._promedio(id_producto)
+        referencia = promedio / ficha.empaque if not math.isnan(promedio) and ficha.empaque > 0 else None
+        self._insertar(id_producto, ficha._replace(referencia=referencia))
+
+    def eliminar_producto(self, id_producto: int) -> None:
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_producto)
+
+    # --- Consultas --------------------------------------------------------
+
+    def sustitutos(self, id_producto: int, n: int = 5) -> List[dict]:
+        """Los `n` productos del mismo grupo con el precio por unidad más parecido."""
+        ficha = self._fichas.get(id_producto)
+        if ficha is None:
+            return []
+        miembros = self._grupos.get(ficha.grupo, [])
+
+        # Sin precio propio no hay con qué comparar: los más baratos del grupo
+        if ficha.referencia is None:
+            return [
+                {"IdProducto": id_sustituto, "PrecioReferencia": referencia / 100, "Similitud": None}
+                for referencia, id_sustituto in miembros[:n]
+            ]
+
+        # Se avanza desde la posición del producto hacia ambos lados, tomando siempre el más parecido
+        posicion = bisect_left(miembros, (ficha.referencia, id_producto))
+        izquierda, derecha = posicion - 1, posicion + 1
+        elegidos = []
+        while len(elegidos) < n and (izquierda >= 0 or derecha < len(miembros)):
+            parecido_izq = similitud(miembros[izquierda][0], ficha.referencia) if izquierda >= 0 else -1.0
+            parecido_der = similitud(miembros[derecha][0], ficha.referencia) if derecha < len(miembros) else -1.0
+            if parecido_izq >= parecido_der:
+                elegidos.append((miembros[izquierda], parecido_izq))
+                izquierda -= 1
+            else:
+                elegidos.append((miembros[derecha], parecido_der))
+                derecha += 1
+
+        return [
+            {"IdProducto": id_sustituto, "PrecioReferencia": referencia / 100, "Similitud": round(parecido, 4)}
+            for (referencia, id_sustituto), parecido in elegidos
+        ]
+
+    def cubrir_faltantes(
+        self,
+        ids_productos: Sequence[int],
+        cantidades: Sequence[int],
+        ids_proveedores: Sequence[int],
+        disponible: np.ndarray,
+        n: int = CANDIDATOS_CANASTA
+    ) -> Dict[Tuple[int, int], Tuple[int, int, int]]:
+        """
+        Para cada producto faltante (fila i) en cada proveedor (columna j) de la
+        máscara `disponible`, el sustituto con el menor precio por unidad que ese
+        proveedor sí vende entre los `n` más parecidos. Los productos que ya están
+        en la canasta no cuentan como sustitutos. La cantidad se escala por el
+        contenido de ambos empaques (1 kg pedido = 2 empaques de 500 g),
+        redondeando hacia arriba a empaques enteros.
+        Devuelve {(i, j): (IdProducto sustituto, centavos, cantidad)}.
+        """
+        faltantes = np.argwhere(~disponible)
+        if faltantes.size == 0:
+            return {}
+
+        # 1. Candidatos de cada producto faltante, sin los que ya se pidieron
+        pedidos = set(ids_productos)
+        candidatos: Dict[int, List[int]] = {}
+        for i in np.unique(faltantes[:, 0]).tolist():
+            candidatos[i] = [
+                s["IdProducto"] for s in self.sustitutos(ids_productos[i], n + len(pedidos))
+                if s["IdProducto"] not in pedidos
+            ][:n]
+        ids_candidatos = sorted({id_sustituto for ids in candidatos.values() for id_sustituto in ids})
+        if not ids_candidatos:
+            return {}
+
+        # 2. Precios de todos los candidatos en los proveedores pedidos, y por unidad del empaque
+        _, centavos, disponibles = matriz_precios.submatriz(ids_candidatos, ids_proveedores)
+        fila_candidato = {id_sustituto: k for k, id_sustituto in enumerate(ids_candidatos)}
+        empaques = np.array([self._fichas[s].empaque for s in ids_candidatos], dtype=np.float64)
+        por_unidad = centavos / empaques[:, None]
+
+        # 3. El más barato por unidad disponible en cada hueco
+        cubiertos = {}
+        for i, j in faltantes.tolist():
+            vendidos = [fila_candidato[s] for s in candidatos[i] if disponibles[fila_candidato[s], j]]
+            if vendidos:
+                k = min(vendidos, key=lambda k: por_unidad[k, j])
+                empaque_original = self._fichas[ids_productos[i]].empaque
+                cantidad = math.ceil(round(cantidades[i] * empaque_original / empaques[k], 6))
+                cubiertos[(i, j)] = (ids_candidatos[k], int(centavos[k, j]), cantidad)
+        return cubiertos
+
+
+# Instancia única por proceso
+sustitutos_productos = SustitutosProductos()
@@ -0,0 +1,144 @@
+# app/geo/busqueda.py
+"""
+Búsqueda de sucursales cercanas usada por las rutas de sucursal.
+
+Por defecto se responde desde el índice en memoria (app.geo.indice). Si se
+desactiva con INDICE_SUCURSALES_EN_MEMORIA=0 (por ejemplo, con muchos workers
+y poca memoria), la búsqueda se hace en SQL con una caja envolvente sobre las
+columnas numéricas de coordenadas, ampliando el radio hasta encontrar una
+sucursal por proveedor.
+"""
+import math
+import os
+from typing import Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.geo.distancia import KM_POR_GRADO, haversine_km
+from app.geo.indice import SucursalIndexada, indice_sucursales
+from app.models.models import Sucursal
+
+load_dotenv()
+
+INDICE_EN_MEMORIA = os.getenv("INDICE_SUCURSALES_EN_MEMORIA", "1") != "0"
+
+# Radios (km) con los que se amplía la caja envolvente en la búsqueda SQL
+RADIOS_BUSQUEDA_KM = (5.0, 20.0, 80.0, 320.0)
+
+
+def caja_envolvente(lat: float, lng: float, radio_km: float) -> Tuple[float, float, float, float]:
+    """Caja (lat_min, lat_max, lng_min, lng_max) que contiene el círculo de radio_km."""
+    dlat = radio_km / KM_POR_GRADO
+    lat_extrema = min(90.0, abs(lat) + dlat)
+    coseno = math.cos(math.radians(lat_extrema))
+    dlng = 180.0 if coseno < 1e-6 else min(180.0, dlat / coseno)
+    return (
+        max(-90.0, lat - dlat),
+        min(90.0, lat + dlat),
+        max(-180.0, lng - dlng),
+        min(180.0, lng + dlng),
+    )
+
+
+async def sucursales_en_caja(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    radio_km: Optional[float] = None,
+    ids_proveedores: Optional[Iterable[int]] = None
+) -> List[SucursalIndexada]:
+    """Sucursales con coordenadas válidas dentro de la caja envolvente del radio."""
+    stmt = select(
+        Sucursal.IdSucursal,
+        Sucursal.NombreSucursal,
+        Sucursal.LatitudNum,
+        Sucursal.LongitudNum,
+        Sucursal.IdProveedor
+    ).where(
+        Sucursal.LatitudNum.isnot(None),
+        Sucursal.LongitudNum.isnot(None)
+    )
+
+    if radio_km is not None:
+        lat_min, lat_max, lng_min, lng_max = caja_envolvente(lat, lng, radio_km)
+        stmt = stmt.where(
+            Sucursal.LatitudNum.between(lat_min, lat_max),
+            Sucursal.LongitudNum.between(lng_min, lng_max)
+        )
+
+    if ids_proveedores is not None:
+        stmt = stmt.where(Sucursal.IdProveedor.in_(list(ids_proveedores)))
+
+    result = await db.execute(stmt)
+    return [
+        SucursalIndexada(
+            IdSucursal=fila.IdSucursal,
+            NombreSucursal=fila.NombreSucursal,
+            Latitud=float(fila.LatitudNum),
+            Longitud=float(fila.LongitudNum),
+            IdProveedor=fila.IdProveedor
+        )
+        for fila in result.all()
+    ]
+
+
+async def _mas_cercana_por_proveedor_sql(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    ids_proveedores: Optional[Iterable[int]] = None,
+    radio_km: Optional[float] = None
+) -> List[Tuple[SucursalIndexada, float]]:
+    if ids_proveedores is None:
+        result = await db.execute(
+            select(Sucursal.IdProveedor).distinct().where(
+                Sucursal.LatitudNum.isnot(None),
+                Sucursal.LongitudNum.isnot(None)
+            )
+        )
+        pendientes = set(result.scalars().all())
+    else:
+        pendientes = set(ids_proveedores)
+
+    radios = [r for r in RADIOS_BUSQUEDA_KM if radio_km is None or r < radio_km]
+    radios.append(radio_km)  # None = sin caja, solo para los proveedores que falten
+
+    encontradas = {}
+    for radio in radios:
+        if not pendientes:
+            break
+        candidatas = await sucursales_en_caja(db, lat, lng, radio, pendientes)
+        if not candidatas:
+            continue
+
+        distancias = haversine_km(
+            lat, lng,
+            [s.Latitud for s in candidatas],
+            [s.Longitud for s in candidatas]
+        )
+        for sucursal, distancia in zip(candidatas, distancias.tolist()):
+            # Dentro de la caja solo es seguro aceptar lo que cae dentro del círculo
+            if radio is not None and distancia > radio:
+                continue
+            actual = encontradas.get(sucursal.IdProveedor)
+            if actual is None or distancia < actual[1]:
+                encontradas[sucursal.IdProveedor] = (sucursal, distancia)
+        pendientes -= encontradas.keys()
+
+    return sorted(encontradas.values(), key=lambda x: x[1])
+
+
+async def mas_cercana_por_proveedor(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    ids_proveedores: Optional[Iterable[int]] = None,
+    radio_km: Optional[float] = None
+) -> List[Tuple[SucursalIndexada, float]]:
+    """La sucursal más cercana de cada proveedor, ordenadas por distancia (haversine)."""
+    if INDICE_EN_MEMORIA:
+        await indice_sucursales.asegurar_cargado(db)
+        return indice_sucursales.mas_cercana_por_proveedor(lat, lng, ids_proveedores, radio_km)
+    return await _mas_cercana_por_proveedor_sql(db, lat, lng, ids_proveedores, radio_km)
@@ -0,0 +1,58 @@
+# app/geo/cache.py
+"""
+Caché de resultados de las consultas de sucursales cercanas.
+
+La clave es la celda de la ubicación cuantizada (~110 m de lado) más el resto
+del cuerpo de la petición, de modo que un cliente que mueve el mapa unos metros
+reutiliza la respuesta anterior. Las entradas expiran por TTL y se desalojan
+por LRU; toda la caché se invalida cuando cambia una Sucursal o un
+ProductoProveedor.
+
+Las distancias de una respuesta en caché son las de la primera petición de la
+celda, así que pueden diferir unos metros de la ubicación exacta del cliente.
+"""
+import json
+import os
+from typing import Any, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TAMANO_CELDA_CACHE_GRADOS = 0.001
+MAX_ENTRADAS_CACHE = int(os.getenv("CACHE_CERCANAS_MAX_ENTRADAS", "4096"))
+TTL_CACHE_SEGUNDOS = int(os.getenv("CACHE_CERCANAS_TTL", "300"))
+
+
+class CacheUbicacion:
+    def __init__(
+        self,
+        max_entradas: int = MAX_ENTRADAS_CACHE,
+        ttl: int = TTL_CACHE_SEGUNDOS,
+        tamano_celda: float = TAMANO_CELDA_CACHE_GRADOS
+    ):
+        self._cache = TTLCache(maxsize=max_entradas, ttl=ttl)
+        self.tamano_celda = tamano_celda
+        # Cambia con cada invalidación; evita guardar resultados calculados con datos viejos
+        self.generacion = 0
+
+    def clave(self, consulta: str, lat: float, lng: float, datos: dict) -> Tuple[Hashable, ...]:
+        celda = (round(lat / self.tamano_celda), round(lng / self.tamano_celda))
+        return (consulta, celda, json.dumps(datos, sort_keys=True, default=str))
+
+    def obtener(self, clave: Tuple[Hashable, ...]) -> Optional[Any]:
+        return self._cache.get(clave)
+
+    def guardar(self, clave: Tuple[Hashable, ...], valor: Any, generacion: int) -> None:
+        """Guarda el valor solo si no hubo invalidaciones desde `generacion`."""
+        if generacion == self.generacion:
+            self._cache[clave] = valor
+
+    def invalidar(self) -> None:
+        self._cache.clear()
+        self.generacion += 1
+
+
+# Instancia única por proceso
+cache_cercanas = CacheUbicacion()
@@ -0,0 +1,107 @@
+# app/geo/clusters.py
+"""
+Agrupación de sucursales en clusters por nivel de zoom del mapa.
+
+Para cada zoom se mantiene una rejilla cuyo lado equivale a unos 64 px de una
+tesela de 256 px, con el conteo, la suma de coordenadas (para el centroide) y
+la mezcla de proveedores de cada celda. Los agregados se parchean al agregar o
+quitar una sucursal, así que responder una caja del mapa solo recorre las
+celdas visibles.
+"""
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+ZOOM_MIN = 0
+ZOOM_MAX_CLUSTER = 15  # A partir de aquí se devuelven las sucursales individuales
+CELDAS_POR_TESELA = 4  # 256 px / 64 px
+
+
+def tamano_celda_zoom(zoom: int) -> float:
+    return 360.0 / (2 ** zoom * CELDAS_POR_TESELA)
+
+
+class _Grupo:
+    __slots__ = ("cantidad", "suma_lat", "suma_lng", "proveedores")
+
+    def __init__(self):
+        self.cantidad = 0
+        self.suma_lat = 0.0
+        self.suma_lng = 0.0
+        self.proveedores = Counter()
+
+
+class ClustersSucursales:
+    def __init__(self):
+        self._niveles: Dict[int, Dict[Tuple[int, int], _Grupo]] = {}
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self._niveles = {zoom: {} for zoom in range(ZOOM_MIN, ZOOM_MAX_CLUSTER + 1)}
+
+    def _celda(self, zoom: int, lat: float, lng: float) -> Tuple[int, int]:
+        tamano = tamano_celda_zoom(zoom)
+        return (math.floor(lat / tamano), math.floor(lng / tamano))
+
+    def agregar(self, sucursal) -> None:
+        for zoom, celdas in self._niveles.items():
+            celda = self._celda(zoom, sucursal.Latitud, sucursal.Longitud)
+            grupo = celdas.get(celda)
+            if grupo is None:
+                grupo = celdas[celda] = _Grupo()
+            grupo.cantidad += 1
+            grupo.suma_lat += sucursal.Latitud
+            grupo.suma_lng += sucursal.Longitud
+            grupo.proveedores[sucursal.IdProveedor] += 1
+
+    def quitar(self, sucursal) -> None:
+        for zoom, celdas in self._niveles.items():
+            celda = self._celda(zoom, sucursal.Latitud, sucursal.Longitud)
+            grupo = celdas.get(celda)
+            if grupo is None:
+                continue
+            grupo.cantidad -= 1
+            if grupo.cantidad <= 0:
+                del celdas[celda]
+                continue
+            grupo.suma_lat -= sucursal.Latitud
+            grupo.suma_lng -= sucursal.Longitud
+            grupo.proveedores[sucursal.IdProveedor] -= 1
+            if grupo.proveedores[sucursal.IdProveedor] <= 0:
+                del grupo.proveedores[sucursal.IdProveedor]
+
+    def en_caja(
+        self, zoom: int, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> List[dict]:
+        """Clusters del nivel `zoom` cuyas celdas se cruzan con la caja dada."""
+        zoom = min(max(zoom, ZOOM_MIN), ZOOM_MAX_CLUSTER)
+        celdas = self._niveles[zoom]
+        i0, j0 = self._celda(zoom, lat_min, lng_min)
+        i1, j1 = self._celda(zoom, lat_max, lng_max)
+
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(celdas):
+            visibles = [
+                grupo for (i, j), grupo in celdas.items()
+                if i0 <= i <= i1 and j0 <= j <= j1
+            ]
+        else:
+            visibles = [
+                celdas[(i, j)]
+                for i in range(i0, i1 + 1)
+                for j in range(j0, j1 + 1)
+                if (i, j) in celdas
+            ]
+
+        return [
+            {
+                "Latitud": grupo.suma_lat / grupo.cantidad,
+                "Longitud": grupo.suma_lng / grupo.cantidad,
+                "Cantidad": grupo.cantidad,
+                "Proveedores": [
+                    {"IdProveedor": id_proveedor, "Cantidad": cantidad}
+                    for id_proveedor, cantidad in grupo.proveedores.most_common()
+                ]
+            }
+            for grupo in visibles
+        ]
@@ -0,0 +1,91 @@
+# app/geo/distancia.py
+"""
+Cálculo de distancias desde un origen hacia muchas sucursales.
+
+haversine_km trabaja sobre arreglos de NumPy en una sola llamada vectorizada;
+es la distancia que se usa para ordenar candidatas. La distancia geodésica
+(elipsoide WGS-84, vía geopy) es más exacta pero mucho más lenta, así que solo
+se calcula para las k candidatas que se van a devolver.
+"""
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+from geopy.distance import geodesic
+
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180.0
+
+
+def haversine_escalar(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia haversine en km entre dos puntos."""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Distancias haversine en km desde (lat, lng) a cada par (lats[i], lngs[i])."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lngs - lng)
+
+    a = np.sin(dp * 0.5) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl * 0.5) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return 2.0 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a))
+
+
+def geodesica_km(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+    """Distancia geodésica exacta; pensada para pocos puntos."""
+    return np.array(
+        [geodesic((lat, lng), (plat, plng)).km for plat, plng in zip(lats, lngs)],
+        dtype=np.float64
+    )
+
+
+def k_menores(distancias: np.ndarray, k: int) -> np.ndarray:
+    """Índices de las k distancias menores, ordenados de menor a mayor."""
+    n = len(distancias)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidatos = np.argpartition(distancias, k - 1)[:k]
+    else:
+        candidatos = np.arange(n)
+    return candidatos[np.argsort(distancias[candidatos], kind="stable")]
+
+
+def k_mas_cercanos(
+    lat: float,
+    lng: float,
+    lats,
+    lngs,
+    k: int,
+    refinar: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Índices y distancias (km) de los k puntos más cercanos al origen.
+
+    Con refinar=True se recalcula la distancia geodésica solo para esos k
+    y se reordenan con ella.
+    """
+    distancias = haversine_km(lat, lng, lats, lngs)
+    indices = k_menores(distancias, k)
+    seleccion = distancias[indices]
+
+    if refinar and len(indices):
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        seleccion = geodesica_km(lat, lng, lats[indices], lngs[indices])
+        orden = np.argsort(seleccion, kind="stable")
+        indices, seleccion = indices[orden], seleccion[orden]
+
+    return indices, seleccion
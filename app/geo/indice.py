@@ -0,0 +1,376 @@
+# app/geo/indice.py
+"""
+Índice espacial en memoria de las sucursales.
+
+Las sucursales se reparten en una rejilla de celdas de tamaño fijo (en grados)
+para que las consultas de "k más cercanas" y "dentro de un radio" solo revisen
+las celdas alrededor del punto de origen, en lugar de recorrer toda la tabla.
+
+Cada proceso de la API mantiene su propia copia del índice: se carga de forma
+perezosa en la primera consulta y se parchea en las rutas que crean, actualizan
+o eliminan sucursales.
+"""
+import asyncio
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.geo.clusters import ClustersSucursales
+from app.geo.distancia import KM_POR_GRADO, haversine_km, k_menores
+from app.models.models import Sucursal
+
+
+TAMANO_CELDA_GRADOS = 0.05  # ~5.5 km de lado en el ecuador
+
+
+class SucursalIndexada(NamedTuple):
+    IdSucursal: int
+    NombreSucursal: str
+    Latitud: float
+    Longitud: float
+    IdProveedor: int
+
+
+def parsear_coordenada(valor, limite: float = 180.0) -> Optional[float]:
+    """Convierte una coordenada guardada como texto a float, o None si no es válida."""
+    try:
+        numero = float(str(valor).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(numero) or abs(numero) > limite:
+        return None
+    return numero
+
+
+_VACIO = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+class _Rejilla:
+    """Rejilla uniforme de puntos (id -> lat, lng) agrupados por celda."""
+
+    def __init__(self, tamano: float = TAMANO_CELDA_GRADOS):
+        self.tamano = tamano
+        self.celdas: Dict[Tuple[int, int], Dict[int, Tuple[float, float]]] = {}
+        self.ubicacion: Dict[int, Tuple[int, int]] = {}
+        # Copia en arreglos de cada celda para calcular distancias vectorizadas
+        self._arreglos: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # Límites de las celdas ocupadas (solo crecen; sirven para cortar la búsqueda)
+        self._min_i = self._max_i = self._min_j = self._max_j = None
+
+    def __len__(self) -> int:
+        return len(self.ubicacion)
+
+    def _celda(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.tamano), math.floor(lng / self.tamano))
+
+    def agregar(self, id_punto: int, lat: float, lng: float) -> None:
+        self.quitar(id_punto)
+        celda = self._celda(lat, lng)
+        self.celdas.setdefault(celda, {})[id_punto] = (lat, lng)
+        self.ubicacion[id_punto] = celda
+        self._arreglos.pop(celda, None)
+
+        i, j = celda
+        if self._min_i is None:
+            self._min_i = self._max_i = i
+            self._min_j = self._max_j = j
+        else:
+            self._min_i = min(self._min_i, i)
+            self._max_i = max(self._max_i, i)
+            self._min_j = min(self._min_j, j)
+            self._max_j = max(self._max_j, j)
+
+    def quitar(self, id_punto: int) -> None:
+        celda = self.ubicacion.pop(id_punto, None)
+        if celda is None:
+            return
+        self._arreglos.pop(celda, None)
+        puntos = self.celdas[celda]
+        del puntos[id_punto]
+        if not puntos:
+            del self.celdas[celda]
+
+    def _arreglos_de(self, celdas: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ids, latitudes y longitudes de las celdas dadas, concatenados."""
+        partes = []
+        for celda in celdas:
+            arreglos = self._arreglos.get(celda)
+            if arreglos is None:
+                puntos = self.celdas[celda]
+                coordenadas = np.array(list(puntos.values()), dtype=np.float64)
+                arreglos = (
+                    np.fromiter(puntos.keys(), dtype=np.int64, count=len(puntos)),
+                    coordenadas[:, 0],
+                    coordenadas[:, 1],
+                )
+                self._arreglos[celda] = arreglos
+            partes.append(arreglos)
+
+        if not partes:
+            return _VACIO
+        if len(partes) == 1:
+            return partes[0]
+        return tuple(np.concatenate(columna) for columna in zip(*partes))
+
+    def _anillo(self, ci: int, cj: int, r: int) -> Iterable[Tuple[int, int]]:
+        if r == 0:
+            yield (ci, cj)
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield (ci - r, j)
+            yield (ci + r, j)
+        for i in range(ci - r + 1, ci + r):
+            yield (i, cj - r)
+            yield (i, cj + r)
+
+    def _cota_inferior_km(self, lat: float, r: int) -> float:
+        """Distancia mínima a cualquier punto fuera de los anillos 0..r ya revisados."""
+        lat_extrema = min(90.0, abs(lat) + (r + 1) * self.tamano)
+        factor = max(0.0, math.cos(math.radians(lat_extrema)))
+        return r * self.tamano * KM_POR_GRADO * factor
+
+    def k_cercanos(
+        self, lat: float, lng: float, k: int, radio_km: Optional[float] = None
+    ) -> List[Tuple[float, int]]:
+        """Devuelve hasta k pares (distancia_km, id) ordenados por distancia."""
+        if not self.celdas or k <= 0:
+            return []
+
+        ci, cj = self._celda(lat, lng)
+        max_anillo = max(
+            ci - self._min_i, self._max_i - ci, cj - self._min_j, self._max_j - cj, 0
+        )
+
+        # Mejores k encontrados hasta ahora (ids y distancias)
+        mejores_ids = _VACIO[0]
+        mejores_dist = _VACIO[1]
+
+        def considerar(celdas) -> None:
+            nonlocal mejores_ids, mejores_dist
+            ids, lats, lngs = self._arreglos_de(celdas)
+            if not len(ids):
+                return
+            distancias = haversine_km(lat, lng, lats, lngs)
+            if radio_km is not None:
+                dentro = distancias <= radio_km
+                ids, distancias = ids[dentro], distancias[dentro]
+            ids = np.concatenate((mejores_ids, ids))
+            distancias = np.concatenate((mejores_dist, distancias))
+            seleccion = k_menores(distancias, k)
+            mejores_ids, mejores_dist = ids[seleccion], distancias[seleccion]
+
+        revisadas = set()
+        for r in range(max_anillo + 1):
+            # Si el área de anillos supera las celdas ocupadas, es más barato recorrerlas todas
+            if (2 * r + 1) ** 2 > 2 * len(self.celdas):
+                considerar([celda for celda in self.celdas if celda not in revisadas])
+                break
+
+            ocupadas = [celda for celda in self._anillo(ci, cj, r) if celda in self.celdas]
+            revisadas.update(ocupadas)
+            considerar(ocupadas)
+
+            cota = self._cota_inferior_km(lat, r)
+            if radio_km is not None and cota > radio_km:
+                break
+            if len(mejores_ids) >= k and mejores_dist[-1] <= cota:
+                break
+
+        return list(zip(mejores_dist.tolist(), mejores_ids.tolist()))
+
+    def _celdas_en_rango(self, i0: int, j0: int, i1: int, j1: int) -> List[Tuple[int, int]]:
+        """Celdas ocupadas dentro del rango de índices (inclusive)."""
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.celdas):
+            return [
+                (i, j) for (i, j) in self.celdas
+                if i0 <= i <= i1 and j0 <= j <= j1
+            ]
+        return [
+            (i, j)
+            for i in range(i0, i1 + 1)
+            for j in range(j0, j1 + 1)
+            if (i, j) in self.celdas
+        ]
+
+    def en_caja(self, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> List[int]:
+        """Ids de los puntos dentro de la caja dada."""
+        i0, j0 = self._celda(lat_min, lng_min)
+        i1, j1 = self._celda(lat_max, lng_max)
+        ids, lats, lngs = self._arreglos_de(self._celdas_en_rango(i0, j0, i1, j1))
+        dentro = (lats >= lat_min) & (lats <= lat_max) & (lngs >= lng_min) & (lngs <= lng_max)
+        return ids[dentro].tolist()
+
+    def en_radio(self, lat: float, lng: float, radio_km: float) -> List[Tuple[float, int]]:
+        """Devuelve los pares (distancia_km, id) a menos de radio_km, ordenados."""
+        if not self.celdas or radio_km < 0:
+            return []
+
+        dlat = radio_km / KM_POR_GRADO
+        lat_extrema = min(90.0, abs(lat) + dlat)
+        coseno = math.cos(math.radians(lat_extrema))
+        dlng = 180.0 if coseno < 1e-6 else min(180.0, dlat / coseno)
+
+        i0, j0 = self._celda(lat - dlat, lng - dlng)
+        i1, j1 = self._celda(lat + dlat, lng + dlng)
+        celdas = self._celdas_en_rango(i0, j0, i1, j1)
+
+        ids, lats, lngs = self._arreglos_de(celdas)
+        distancias = haversine_km(lat, lng, lats, lngs)
+        dentro = np.flatnonzero(distancias <= radio_km)
+        orden = dentro[np.argsort(distancias[dentro], kind="stable")]
+        return list(zip(distancias[orden].tolist(), ids[orden].tolist()))
+
+
+class IndiceSucursales:
+    """
+    Índice de sucursales: una rejilla global, una rejilla por proveedor y los
+    clusters por nivel de zoom para el mapa.
+    """
+
+    def __init__(self):
+        self._sucursales: Dict[int, SucursalIndexada] = {}
+        self._global = _Rejilla()
+        self._por_proveedor: Dict[int, _Rejilla] = {}
+        self.clusters = ClustersSucursales()
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._sucursales)
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            result = await db.execute(
+                select(
+                    Sucursal.IdSucursal,
+                    Sucursal.NombreSucursal,
+                    Sucursal.LatitudNum.label("Latitud"),
+                    Sucursal.LongitudNum.label("Longitud"),
+                    Sucursal.IdProveedor
+                ).where(
+                    Sucursal.LatitudNum.isnot(None),
+                    Sucursal.LongitudNum.isnot(None)
+                )
+            )
+            self.cargar(result.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, filas) -> None:
+        self._sucursales = {}
+        self._global = _Rejilla()
+        self._por_proveedor = {}
+        self.clusters.reiniciar()
+        for fila in filas:
+            self._insertar(fila)
+        self.cargado = True
+        self.version += 1
+
+    def _insertar(self, fila) -> None:
+        latitud = parsear_coordenada(fila.Latitud, 90.0)
+        longitud = parsear_coordenada(fila.Longitud, 180.0)
+        self._quitar(fila.IdSucursal)
+        if latitud is None or longitud is None:
+            return
+
+        sucursal = SucursalIndexada(
+            IdSucursal=fila.IdSucursal,
+            NombreSucursal=fila.NombreSucursal,
+            Latitud=latitud,
+            Longitud=longitud,
+            IdProveedor=fila.IdProveedor
+        )
+        self._sucursales[sucursal.IdSucursal] = sucursal
+        self._global.agregar(sucursal.IdSucursal, latitud, longitud)
+        self._por_proveedor.setdefault(sucursal.IdProveedor, _Rejilla()).agregar(
+            sucursal.IdSucursal, latitud, longitud
+        )
+        self.clusters.agregar(sucursal)
+
+    def _quitar(self, id_sucursal: int) -> None:
+        anterior = self._sucursales.pop(id_sucursal, None)
+        if anterior is None:
+            return
+        self._global.quitar(id_sucursal)
+        self.clusters.quitar(anterior)
+        rejilla = self._por_proveedor.get(anterior.IdProveedor)
+        if rejilla is not None:
+            rejilla.quitar(id_sucursal)
+            if not len(rejilla):
+                del self._por_proveedor[anterior.IdProveedor]
+
+    def actualizar(self, sucursal) -> None:
+        """Inserta o reemplaza una sucursal (objeto Sucursal o fila equivalente)."""
+        self.version += 1
+        if self.cargado:
+            self._insertar(sucursal)
+
+    def eliminar(self, id_sucursal: int) -> None:
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_sucursal)
+
+    def obtener(self, id_sucursal: int) -> Optional[SucursalIndexada]:
+        return self._sucursales.get(id_sucursal)
+
+    def cercanas(
+        self, lat: float, lng: float, k: int, radio_km: Optional[float] = None
+    ) -> List[Tuple[SucursalIndexada, float]]:
+        """Las k sucursales más cercanas, opcionalmente limitadas a un radio."""
+        return [
+            (self._sucursales[id_sucursal], distancia)
+            for distancia, id_sucursal in self._global.k_cercanos(lat, lng, k, radio_km)
+        ]
+
+    def en_radio(self, lat: float, lng: float, radio_km: float) -> List[Tuple[SucursalIndexada, float]]:
+        return [
+            (self._sucursales[id_sucursal], distancia)
+            for distancia, id_sucursal in self._global.en_radio(lat, lng, radio_km)
+        ]
+
+    def en_caja(
+        self, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> List[SucursalIndexada]:
+        return [
+            self._sucursales[id_sucursal]
+            for id_sucursal in self._global.en_caja(lat_min, lat_max, lng_min, lng_max)
+        ]
+
+    def mas_cercana_por_proveedor(
+        self,
+        lat: float,
+        lng: float,
+        ids_proveedores: Optional[Iterable[int]] = None,
+        radio_km: Optional[float] = None
+    ) -> List[Tuple[SucursalIndexada, float]]:
+        """La sucursal más cercana de cada proveedor, ordenadas por distancia."""
+        if ids_proveedores is None:
+            ids_proveedores = list(self._por_proveedor.keys())
+
+        resultado = []
+        for id_proveedor in ids_proveedores:
+            rejilla = self._por_proveedor.get(id_proveedor)
+            if rejilla is None:
+                continue
+            encontrada = rejilla.k_cercanos(lat, lng, 1, radio_km)
+            if encontrada:
+                distancia, id_sucursal = encontrada[0]
+                resultado.append((self._sucursales[id_sucursal], distancia))
+
+        resultado.sort(key=lambda x: x[1])
+        return resultado
+
+
+# Instancia única por proceso
+indice_sucursales = IndiceSucursales()
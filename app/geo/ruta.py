@@ -0,0 +1,141 @@
+# app/geo/ruta.py
+"""
+Planificación del orden de visita de varias sucursales.
+
+El recorrido es abierto: empieza en la ubicación del usuario y termina en la
+última sucursal. Se construye con vecino más cercano y se mejora con 2-opt
+sobre una matriz de distancias haversine. La matriz entre sucursales se guarda
+en caché (la fila del origen cambia en cada consulta y se calcula aparte).
+
+El pool de procesos nunca resuelve más rápido que el propio proceso (enviar la
+matriz y recibir la ruta cuesta más que 2-opt con pocas paradas); solo se usa
+cuando el cálculo es lo bastante largo como para frenar el event loop. Ver la
+sección de rutas de scripts/benchmark_distancias.py.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.geo.distancia import haversine_km
+
+
+# Desde cuántas paradas se resuelve en otro proceso: por debajo 2-opt tarda
+# menos de ~15 ms y el viaje al pool (~1 ms más) no compensa
+UMBRAL_POOL_PROCESOS = 150
+MAX_PROCESOS_RUTA = 2
+MAX_PASADAS_2OPT = 50
+
+_pool = None
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS_RUTA)
+    return _pool
+
+
+def haversine_matriz_km(lats, lngs) -> np.ndarray:
+    """Matriz simétrica n x n de distancias haversine entre todos los puntos."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return np.vstack([haversine_km(lat, lng, lats, lngs) for lat, lng in zip(lats, lngs)])
+
+
+@lru_cache(maxsize=256)
+def _matriz_sucursales(paradas: Tuple[Tuple[int, float, float], ...]) -> np.ndarray:
+    # La clave incluye las coordenadas: si una sucursal se mueve, la entrada deja de usarse
+    matriz = haversine_matriz_km([p[1] for p in paradas], [p[2] for p in paradas])
+    matriz.setflags(write=False)
+    return matriz
+
+
+def resolver_ruta(matriz: np.ndarray, max_pasadas: int = MAX_PASADAS_2OPT) -> List[int]:
+    """
+    Orden de visita de los nodos 1..n-1 partiendo del nodo 0 (recorrido abierto).
+
+    Vecino más cercano como solución inicial y luego 2-opt hasta que no haya
+    mejoras o se agoten las pasadas.
+    """
+    n = len(matriz)
+    if n <= 2:
+        return list(range(1, n))
+
+    d = matriz.tolist()
+
+    # 1. Vecino más cercano
+    ruta = [0]
+    pendientes = set(range(1, n))
+    actual = 0
+    while pendientes:
+        siguiente = min(pendientes, key=lambda j: d[actual][j])
+        ruta.append(siguiente)
+        pendientes.remove(siguiente)
+        actual = siguiente
+
+    # 2. 2-opt: invertir el tramo ruta[i..j] si acorta el recorrido
+    for _ in range(max_pasadas):
+        mejorado = False
+        for i in range(1, n - 1):
+            a, b = ruta[i - 1], ruta[i]
+            for j in range(i + 1, n):
+                c = ruta[j]
+                delta = d[a][c] - d[a][b]
+                if j + 1 < n:
+                    e = ruta[j + 1]
+                    delta += d[b][e] - d[c][e]
+                if delta < -1e-9:
+                    ruta[i:j + 1] = reversed(ruta[i:j + 1])
+                    b = ruta[i]
+                    mejorado = True
+        if not mejorado:
+            break
+
+    return ruta[1:]
+
+
+async def planificar_ruta(
+    lat: float,
+    lng: float,
+    paradas: Sequence[Tuple[int, float, float]]
+) -> Tuple[List[int], List[float]]:
+    """
+    Ordena las paradas (IdSucursal, latitud, longitud) desde el origen.
+
+    Devuelve las posiciones de `paradas` en orden de visita y la distancia en km
+    de cada tramo (desde la parada anterior o desde el origen).
+    """
+    if not paradas:
+        return [], []
+
+    # Orden canónico por IdSucursal para reutilizar la matriz en caché
+    canonico = sorted(range(len(paradas)), key=lambda i: paradas[i][0])
+    clave = tuple(
+        (paradas[i][0], float(paradas[i][1]), float(paradas[i][2])) for i in canonico
+    )
+    entre_sucursales = _matriz_sucursales(clave)
+    desde_origen = haversine_km(lat, lng, [p[1] for p in clave], [p[2] for p in clave])
+
+    n = len(clave) + 1
+    matriz = np.empty((n, n), dtype=np.float64)
+    matriz[0, 0] = 0.0
+    matriz[0, 1:] = desde_origen
+    matriz[1:, 0] = desde_origen
+    matriz[1:, 1:] = entre_sucursales
+
+    if len(clave) >= UMBRAL_POOL_PROCESOS:
+        loop = asyncio.get_running_loop()
+        orden = await loop.run_in_executor(_obtener_pool(), resolver_ruta, matriz)
+    else:
+        orden = resolver_ruta(matriz)
+
+    tramos = []
+    anterior = 0
+    for nodo in orden:
+        tramos.append(float(matriz[anterior, nodo]))
+        anterior = nodo
+
+    return [canonico[nodo - 1] for nodo in orden], tramos
@@ -1,7 +1,12 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  
-from app.database import engine, Base, init_db
-from app.routes import tipoproveedor, tipousuario, categoria, unidadmedida, usuario, lista, producto, proveedor, listaproductos, usuarioproveedor, productoproveedor, sucursal, dashboard
+from app.database import engine, Base, init_db, AsyncSessionLocal
+from app.precios.matriz import matriz_precios
+from app.precios.alertas import indice_alertas, procesar_alertas
+from app.precios.expiracion import planificador_ofertas
+from app.precios import sincronizacion
+from app.routes import tipoproveedor, tipousuario, categoria, unidadmedida, usuario, lista, producto, proveedor, listaproductos, usuarioproveedor, productoproveedor, sucursal, dashboard, canasta, alerta, preciocuarentena, propuestafusion
 
 app = FastAPI(title="To-Barato API")
 
@@ -28,12 +33,34 @@ app.include_router(listaproductos.router, prefix="/api")
 app.include_router(usuarioproveedor.router, prefix="/api")
 app.include_router(productoproveedor.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
+app.include_router(canasta.router, prefix="/api")
+app.include_router(alerta.router, prefix="/api")
+app.include_router(preciocuarentena.router, prefix="/api")
+app.include_router(propuestafusion.router, prefix="/api")
 
 @app.on_event("startup")
 async def startup():
     # Llamamos a la función de inicialización para crear las tablas en la base de datos
     await init_db()
 
+    # Cargar la matriz de precios en memoria antes de la primera petición
+    async with AsyncSessionLocal() as db:
+        await matriz_precios.asegurar_cargado(db)
+        await indice_alertas.asegurar_cargado(db)
+
+    # Trabajador que dispara las alertas de precio encoladas por las escrituras
+    app.state.tarea_alertas = asyncio.create_task(procesar_alertas())
+    # Planificador que limpia las ofertas vencidas y avisa a las estructuras en memoria
+    app.state.tarea_ofertas = asyncio.create_task(planificador_ofertas.ejecutar(sincronizacion.ofertas_vencidas))
+    # Avisos de importaciones hechas fuera de la API (scripts/importar_precios.py)
+    app.state.tarea_importaciones = asyncio.create_task(sincronizacion.escuchar_importaciones())
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.tarea_alertas.cancel()
+    app.state.tarea_ofertas.cancel()
+    app.state.tarea_importaciones.cancel()
+
 @app.get("/")
 def root():
     return {"message": "¡API viva!"}
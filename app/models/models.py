@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text, PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Numeric, Text, PrimaryKeyConstraint, ForeignKeyConstraint, Index, text
 from sqlalchemy.orm import relationship, declarative_base
 from app.database import Base
 from datetime import datetime
@@ -8,6 +8,11 @@ import pytz
 def now_bolivia():
     return datetime.now(pytz.timezone('America/La_Paz'))
 
+def ahora_local():
+    # now_bolivia sin zona, para comparar con las columnas DateTime sin zona
+    # (FechaOferta, FechaPrecio): el contenedor corre en UTC y datetime.now() no sirve
+    return now_bolivia().replace(tzinfo=None)
+
 class TipoUsuario(Base):
     __tablename__ = 'TipoUsuario'
     
@@ -31,10 +36,27 @@ class Categoria(Base):
     
     IdCategoria = Column(Integer, primary_key=True, autoincrement=True)
     NombreCategoria = Column(String(100), nullable=False)
+    # Padre directo; la jerarquía completa está en CategoriaJerarquia
+    IdCategoriaPadre = Column(Integer, ForeignKey('Categoria.IdCategoria'))
     FechaCreacion = Column(DateTime, default=now_bolivia)
     
     Productos = relationship("Producto", back_populates="Categoria")
 
+class CategoriaJerarquia(Base):
+    """Clausura de la jerarquía de categorías, mantenida por app.catalogo.categorias.
+
+    Una fila por cada par ancestro-descendiente, incluida (c, c, 0).
+    """
+    __tablename__ = 'CategoriaJerarquia'
+    __table_args__ = (
+        PrimaryKeyConstraint('IdAncestro', 'IdDescendiente'),
+        Index('ix_categoriajerarquia_descendiente', 'IdDescendiente'),
+    )
+
+    IdAncestro = Column(Integer, ForeignKey('Categoria.IdCategoria', ondelete='CASCADE'))
+    IdDescendiente = Column(Integer, ForeignKey('Categoria.IdCategoria', ondelete='CASCADE'))
+    Profundidad = Column(Integer, nullable=False)
+
 class UnidadMedida(Base):
     __tablename__ = 'UnidadMedida'
     
@@ -43,6 +65,17 @@ class UnidadMedida(Base):
     FechaCreacion = Column(DateTime, default=now_bolivia)
     
     Productos = relationship("Producto", back_populates="UnidadMedida")
+    Conversion = relationship("ConversionUnidad", back_populates="UnidadMedida", uselist=False)
+
+class ConversionUnidad(Base):
+    """Equivalencia de una UnidadMedida con su unidad base ('kg', 'l' o 'unidad')."""
+    __tablename__ = 'ConversionUnidad'
+
+    IdUnidadMedida = Column(Integer, ForeignKey('UnidadMedida.IdUnidadMedida', ondelete='CASCADE'), primary_key=True)
+    UnidadBase = Column(String(10), nullable=False)
+    Factor = Column(Numeric(14, 6), nullable=False)  # Unidades base por cada UnidadMedida
+
+    UnidadMedida = relationship("UnidadMedida", back_populates="Conversion")
 
 class Usuario(Base):
     __tablename__ = 'Usuario'
@@ -83,18 +116,27 @@ class Proveedor(Base):
 
 class Sucursal(Base):
     __tablename__ = 'Sucursal'
+    __table_args__ = (
+        Index('ix_sucursal_latitud_longitud_num', 'latitud_num', 'longitud_num'),
+    )
     
     IdSucursal = Column(Integer, primary_key=True, autoincrement=True)
     IdProveedor = Column(Integer, ForeignKey('Proveedor.IdProveedor'), nullable=False)
     NombreSucursal = Column(String(100), nullable=False)
     Latitud = Column("latitud", String(100), nullable=False)
     Longitud = Column("longitud", String(100), nullable=False)
+    # Copia numérica de las coordenadas para filtrar por caja envolvente en SQL
+    LatitudNum = Column("latitud_num", Numeric(9, 6))
+    LongitudNum = Column("longitud_num", Numeric(9, 6))
     FechaCreacion = Column(DateTime, default=now_bolivia)
     
     Proveedor = relationship("Proveedor", back_populates="Sucursales")
 
 class Producto(Base):
     __tablename__ = 'Producto'
+    __table_args__ = (
+        Index('ix_producto_idcategoria', 'IdCategoria'),
+    )
         
     IdProducto = Column(Integer, primary_key=True, autoincrement=True)
     IdCategoria = Column(Integer, ForeignKey('Categoria.IdCategoria'), nullable=False)
@@ -102,6 +144,8 @@ class Producto(Base):
     Nombre = Column(String(100), nullable=False)
     UrlImagen = Column(Text, nullable=False)
     Descripcion = Column(Text)
+    # Contenido del empaque en IdUnidadMedida (p. ej. 500 si la unidad es gramo); vacío = 1
+    CantidadContenido = Column(Numeric(10, 3))
     FechaCreacion = Column(DateTime, default=now_bolivia)
         
     Categoria = relationship("Categoria", back_populates="Productos")
@@ -168,6 +212,7 @@ class ProductoProveedor(Base):
     __tablename__ = 'ProductoProveedor'
     __table_args__ = (
         PrimaryKeyConstraint('IdProducto', 'IdProveedor'),
+        Index('ix_productoproveedor_unidadbase_preciounidadbase', 'UnidadBase', 'PrecioUnidadBase'),
     )
     
     IdProducto = Column(Integer, ForeignKey('Producto.IdProducto'))
@@ -177,10 +222,115 @@ class ProductoProveedor(Base):
     DescripcionOferta = Column(Text)
     FechaOferta = Column(DateTime)
     FechaPrecio = Column(DateTime, nullable=False, default=now_bolivia)
+    # Precio por kg / l / unidad, mantenido por app.precios.unidades
+    UnidadBase = Column(String(10))
+    PrecioUnidadBase = Column(Numeric(14, 4))
     
     Producto = relationship("Producto", back_populates="Proveedores")
     Proveedor = relationship("Proveedor", back_populates="Productos")
 
+class PrecioProductoResumen(Base):
+    """Agregados de ProductoProveedor por producto, mantenidos al escribir precios."""
+    __tablename__ = 'PrecioProductoResumen'
+    __table_args__ = (
+        # Cubre el orden de /productoavg y el cursor de /productoavg/pagina
+        Index('ix_precioproductoresumen_preciopromedio_idproducto', 'PrecioPromedio', 'IdProducto'),
+    )
+
+    IdProducto = Column(Integer, ForeignKey('Producto.IdProducto', ondelete='CASCADE'), primary_key=True)
+    PrecioPromedio = Column(Numeric(12, 4), nullable=False)
+    PrecioMinimo = Column(Numeric(10, 2), nullable=False)
+    PrecioMaximo = Column(Numeric(10, 2), nullable=False)
+    CantidadProveedores = Column(Integer, nullable=False, default=0)
+    FechaActualizacion = Column(DateTime(timezone=True), default=now_bolivia)
+
+class HistorialPrecio(Base):
+    """Registro de solo inserción de cada precio publicado por un proveedor.
+
+    Sin claves foráneas para que el historial sobreviva al borrado del producto
+    o del proveedor; las filas llegan en orden de FechaPrecio, por eso basta un
+    índice BRIN para los rangos de fechas.
+    """
+    __tablename__ = 'HistorialPrecio'
+    __table_args__ = (
+        Index('ix_historialprecio_fechaprecio_brin', 'FechaPrecio', postgresql_using='brin'),
+        Index('ix_historialprecio_producto_proveedor_fecha', 'IdProducto', 'IdProveedor', 'FechaPrecio'),
+    )
+
+    IdHistorialPrecio = Column(BigInteger, primary_key=True, autoincrement=True)
+    IdProducto = Column(Integer, nullable=False)
+    IdProveedor = Column(Integer, nullable=False)
+    Precio = Column(Numeric(10, 2), nullable=False)
+    PrecioOferta = Column(Numeric(10, 2))
+    FechaPrecio = Column(DateTime, nullable=False)
+
+class PrecioCuarentena(Base):
+    """Precio sospechoso retenido antes de llegar a ProductoProveedor.
+
+    Se guarda la fila tal como llegó, el motivo y el precio de referencia con
+    que se comparó; al aprobarla se aplica como un precio normal.
+    """
+    __tablename__ = 'PrecioCuarentena'
+    __table_args__ = (
+        Index('ix_preciocuarentena_estado_fechacreacion', 'Estado', 'FechaCreacion'),
+    )
+
+    IdCuarentena = Column(BigInteger, primary_key=True, autoincrement=True)
+    IdProducto = Column(Integer, ForeignKey('Producto.IdProducto', ondelete='CASCADE'), nullable=False)
+    IdProveedor = Column(Integer, ForeignKey('Proveedor.IdProveedor', ondelete='CASCADE'), nullable=False)
+    Precio = Column(Numeric(10, 2), nullable=False)
+    PrecioOferta = Column(Numeric(10, 2))
+    DescripcionOferta = Column(Text)
+    FechaOferta = Column(DateTime)
+    FechaPrecio = Column(DateTime, nullable=False)
+    PrecioReferencia = Column(Numeric(10, 2))
+    Motivo = Column(String(300), nullable=False)
+    Origen = Column(String(20), nullable=False)  # 'api' o 'importacion'
+    Estado = Column(String(15), nullable=False, default='pendiente')  # 'pendiente', 'aprobado' o 'rechazado'
+    FechaCreacion = Column(DateTime, nullable=False, default=datetime.now)
+    FechaRevision = Column(DateTime)
+
+class AlertaPrecio(Base):
+    """Aviso a un usuario cuando el precio efectivo de un producto baja de PrecioObjetivo.
+
+    Se desactiva al dispararse; FechaDisparo, PrecioDisparo e IdProveedorDisparo
+    guardan qué precio la disparó.
+    """
+    __tablename__ = 'AlertaPrecio'
+    __table_args__ = (
+        Index('ix_alertaprecio_producto_activa', 'IdProducto', postgresql_where=text('"Activa"')),
+        Index('ix_alertaprecio_usuario', 'IdUsuario'),
+    )
+
+    IdAlerta = Column(Integer, primary_key=True, autoincrement=True)
+    IdUsuario = Column(Integer, ForeignKey('Usuario.IdUsuario', ondelete='CASCADE'), nullable=False)
+    IdProducto = Column(Integer, ForeignKey('Producto.IdProducto', ondelete='CASCADE'), nullable=False)
+    PrecioObjetivo = Column(Numeric(10, 2), nullable=False)
+    Activa = Column(Boolean, nullable=False, default=True)
+    FechaCreacion = Column(DateTime, default=now_bolivia)
+    FechaDisparo = Column(DateTime)
+    PrecioDisparo = Column(Numeric(10, 2))
+    IdProveedorDisparo = Column(Integer)
+
+class PropuestaFusionProducto(Base):
+    """Par de productos que parecen el mismo, propuesto por app.catalogo.deduplicacion.
+
+    Sin claves foráneas: al aplicarla el duplicado se borra y la propuesta
+    queda como registro de la fusión.
+    """
+    __tablename__ = 'PropuestaFusionProducto'
+    __table_args__ = (
+        Index('ix_propuestafusionproducto_estado_puntaje', 'Estado', 'Puntaje'),
+    )
+
+    IdPropuesta = Column(Integer, primary_key=True, autoincrement=True)
+    IdProductoConservar = Column(Integer, nullable=False)
+    IdProductoDuplicado = Column(Integer, nullable=False)
+    Puntaje = Column(Numeric(5, 4), nullable=False)
+    Estado = Column(String(15), nullable=False, default='pendiente')  # 'pendiente', 'aplicada' o 'descartada'
+    FechaCreacion = Column(DateTime, nullable=False, default=datetime.now)
+    FechaRevision = Column(DateTime)
+
 class OTP(Base):
     __tablename__ = "OTP"
     
@@ -0,0 +1,316 @@
+# app/precios/alertas.py
+"""
+Alertas de precio: avisar a un usuario cuando un producto baja de su precio objetivo.
+
+Las alertas activas viven en memoria agrupadas por producto, en una lista
+ordenada por PrecioObjetivo. Cuando se guarda un ProductoProveedor, su precio
+efectivo se compara con esa lista con una búsqueda binaria: solo las alertas
+con objetivo mayor o igual se disparan, sin tocar la base de datos.
+
+La escritura solo encola los disparos. Un trabajador en segundo plano los
+toma en lotes, marca las alertas como disparadas con una sola sentencia y
+envía los correos, como mucho MAX_ENVIOS_SIMULTANEOS a la vez. Si un correo
+falla la alerta vuelve a quedar activa y se reintenta con el próximo precio
+que la cumpla. Cuando el índice no está cargado, o tras una importación
+masiva, se encola una revisión por SQL de los productos afectados.
+"""
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import AlertaPrecio, ahora_local
+from app.precios.mejor_precio import precio_efectivo
+from app.utils import enviar_correo_alerta_precio
+
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+# Tiempo que el trabajador espera para juntar más disparos en un mismo lote
+ESPERA_LOTE = 0.5
+# Sesiones SMTP abiertas a la vez por el trabajador
+MAX_ENVIOS_SIMULTANEOS = 5
+
+_PRECIO_EFECTIVO = """
+    CASE WHEN pp."PrecioOferta" IS NOT NULL AND (pp."FechaOferta" IS NULL OR pp."FechaOferta" > :ahora)
+         THEN least(pp."Precio", pp."PrecioOferta")
+         ELSE pp."Precio" END
+"""
+
+_SELECCION_DISPARADAS = """
+    SELECT d."IdAlerta", d."PrecioObjetivo", d."PrecioDisparo",
+           u."Correo", p."Nombre" AS "Producto", pr."Nombre" AS "Proveedor"
+    FROM disparadas d
+    JOIN "Usuario" u ON u."IdUsuario" = d."IdUsuario"
+    JOIN "Producto" p ON p."IdProducto" = d."IdProducto"
+    LEFT JOIN "Proveedor" pr ON pr."IdProveedor" = d."IdProveedorDisparo"
+"""
+
+SQL_DISPARAR = text(f"""
+    WITH datos AS (
+        SELECT *
+        FROM unnest(CAST(:ids AS integer[]), CAST(:proveedores AS integer[]), CAST(:precios AS numeric[]))
+             AS d("IdAlerta", "IdProveedor", "Precio")
+    ),
+    disparadas AS (
+        UPDATE "AlertaPrecio" a
+        SET "Activa" = false, "FechaDisparo" = :ahora,
+            "PrecioDisparo" = datos."Precio", "IdProveedorDisparo" = datos."IdProveedor"
+        FROM datos
+        WHERE a."IdAlerta" = datos."IdAlerta"
+          AND a."Activa"
+          AND datos."Precio" <= a."PrecioObjetivo"
+        RETURNING a.*
+    )
+    {_SELECCION_DISPARADAS}
+""")
+
+SQL_REVISAR = f"""
+    WITH precios AS (
+        SELECT DISTINCT ON ("IdProducto") "IdProducto", "IdProveedor", "Precio"
+        FROM (
+            SELECT pp."IdProducto", pp."IdProveedor", {_PRECIO_EFECTIVO} AS "Precio"
+            FROM "ProductoProveedor" pp
+            {{filtro}}
+        ) efectivos
+        ORDER BY "IdProducto", "Precio"
+    ),
+    disparadas AS (
+        UPDATE "AlertaPrecio" a
+        SET "Activa" = false, "FechaDisparo" = :ahora,
+            "PrecioDisparo" = precios."Precio", "IdProveedorDisparo" = precios."IdProveedor"
+        FROM precios
+        WHERE a."IdProducto" = precios."IdProducto"
+          AND a."Activa"
+          AND precios."Precio" <= a."PrecioObjetivo"
+        RETURNING a.*
+    )
+    {_SELECCION_DISPARADAS}
+"""
+SQL_REVISAR_TODO = text(SQL_REVISAR.format(filtro=""))
+SQL_REVISAR_PRODUCTOS = text(SQL_REVISAR.format(filtro='WHERE pp."IdProducto" = ANY(CAST(:ids AS integer[]))'))
+
+# Alertas cuyo correo no se pudo enviar: vuelven a estar activas
+SQL_REACTIVAR = text("""
+    UPDATE "AlertaPrecio"
+    SET "Activa" = true, "FechaDisparo" = NULL, "PrecioDisparo" = NULL, "IdProveedorDisparo" = NULL
+    WHERE "IdAlerta" = ANY(CAST(:ids AS integer[])) AND NOT "Activa"
+    RETURNING "IdAlerta", "IdProducto", "PrecioObjetivo"
+""")
+
+
+class IndiceAlertas:
+    def __init__(self):
+        self._por_producto: Dict[int, List[Tuple[Decimal, int]]] = {}
+        self._alertas: Dict[int, Tuple[int, Decimal]] = {}
+        self._cola: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._alertas)
+
+    @property
+    def cola(self) -> asyncio.Queue:
+        if self._cola is None:
+            self._cola = asyncio.Queue()
+        return self._cola
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            result = await db.execute(
+                select(AlertaPrecio.IdAlerta, AlertaPrecio.IdProducto, AlertaPrecio.PrecioObjetivo)
+                .where(AlertaPrecio.Activa.is_(True))
+            )
+            self.cargar(result.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, filas: Iterable[Tuple[int, int, Decimal]]) -> None:
+        self._por_producto = {}
+        self._alertas = {}
+        for id_alerta, id_producto, objetivo in filas:
+            self._alertas[id_alerta] = (id_producto, objetivo)
+            self._por_producto.setdefault(id_producto, []).append((objetivo, id_alerta))
+        for umbrales in self._por_producto.values():
+            umbrales.sort()
+        self.cargado = True
+        self.version += 1
+
+    def invalidar(self) -> None:
+        """Fuerza una recarga completa desde la tabla de alertas activas."""
+        self.cargado = False
+        self.version += 1
+
+    # --- Escrituras -------------------------------------------------------
+
+    def guardar(self, id_alerta: int, id_producto: int, objetivo: Decimal) -> None:
+        """Alta o cambio de objetivo de una alerta activa."""
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_alerta)
+            self._alertas[id_alerta] = (id_producto, objetivo)
+            insort(self._por_producto.setdefault(id_producto, []), (objetivo, id_alerta))
+
+    def eliminar(self, id_alerta: int) -> None:
+        self.version += 1
+        if self.cargado:
+            self._quitar(id_alerta)
+
+    def eliminar_producto(self, id_producto: int) -> None:
+        self.version += 1
+        if self.cargado:
+            for _, id_alerta in self._por_producto.pop(id_producto, []):
+                self._alertas.pop(id_alerta, None)
+
+    def _quitar(self, id_alerta: int) -> None:
+        alerta = self._alertas.pop(id_alerta, None)
+        if alerta is None:
+            return
+        id_producto, objetivo = alerta
+        umbrales = self._por_producto.get(id_producto, [])
+        posicion = bisect_left(umbrales, (objetivo, id_alerta))
+        if posicion < len(umbrales) and umbrales[posicion] == (objetivo, id_alerta):
+            del umbrales[posicion]
+        if not umbrales:
+            self._por_producto.pop(id_producto, None)
+
+    # --- Evaluación -------------------------------------------------------
+
+    def evaluar_precio(self, relacion, ahora: Optional[datetime] = None) -> int:
+        """
+        Encola las alertas que dispara el precio de un ProductoProveedor recién
+        guardado y las saca del índice. Devuelve cuántas se encolaron.
+        """
+        if not self.cargado:
+            self.revisar([relacion.IdProducto])
+            return 0
+
+        precio = precio_efectivo(relacion, ahora or ahora_local())
+        umbrales = self._por_producto.get(relacion.IdProducto)
+        if not umbrales:
+            return 0
+
+        # Todas las alertas con objetivo >= precio están al final de la lista
+        posicion = bisect_left(umbrales, (precio,))
+        disparadas = umbrales[posicion:]
+        if not disparadas:
+            return 0
+        del umbrales[posicion:]
+        if not umbrales:
+            del self._por_producto[relacion.IdProducto]
+
+        self.version += 1
+        for _, id_alerta in disparadas:
+            del self._alertas[id_alerta]
+            self.cola.put_nowait(("disparo", id_alerta, relacion.IdProveedor, precio))
+        return len(disparadas)
+
+    def revisar(self, ids_productos: Optional[Iterable[int]] = None) -> None:
+        """Encola una revisión por SQL de los productos dados (todos si es None)."""
+        self.cola.put_nowait(("revision", None if ids_productos is None else list(ids_productos)))
+
+
+async def disparar_lote(db: AsyncSession, lote: List[tuple], ahora: datetime) -> List:
+    """Marca como disparadas las alertas del lote y devuelve los datos para avisar. No hace commit."""
+    filas = []
+
+    # 1. Disparos ya resueltos en memoria: una sola sentencia para todo el lote
+    disparos = [item[1:] for item in lote if item[0] == "disparo"]
+    if disparos:
+        ids, proveedores, precios = (list(columna) for columna in zip(*disparos))
+        result = await db.execute(
+            SQL_DISPARAR,
+            {"ids": ids, "proveedores": proveedores, "precios": precios, "ahora": ahora}
+        )
+        filas.extend(result.all())
+
+    # 2. Revisiones contra los precios actuales en la base de datos
+    revisiones = [item[1] for item in lote if item[0] == "revision"]
+    if revisiones:
+        if any(ids is None for ids in revisiones):
+            result = await db.execute(SQL_REVISAR_TODO, {"ahora": ahora})
+        else:
+            ids = sorted({id_producto for ids in revisiones for id_producto in ids})
+            result = await db.execute(SQL_REVISAR_PRODUCTOS, {"ids": ids, "ahora": ahora})
+        filas.extend(result.all())
+
+    return filas
+
+
+async def procesar_alertas() -> None:
+    """Trabajador en segundo plano: consume la cola en lotes hasta que se cancela la tarea."""
+    cola = indice_alertas.cola
+    limite_envios = asyncio.Semaphore(MAX_ENVIOS_SIMULTANEOS)
+    while True:
+        lote = [await cola.get()]
+        await asyncio.sleep(ESPERA_LOTE)
+        while len(lote) < TAMANO_LOTE and not cola.empty():
+            lote.append(cola.get_nowait())
+
+        try:
+            async with AsyncSessionLocal() as db:
+                filas = await disparar_lote(db, lote, ahora_local())
+                await db.commit()
+                # Tras un error las alertas sacadas del índice vuelven a cargarse aquí
+                await indice_alertas.asegurar_cargado(db)
+        except Exception:
+            logger.exception("Error al disparar un lote de %d alertas de precio", len(lote))
+            indice_alertas.invalidar()
+            continue
+
+        # Las disparadas por revisión todavía pueden estar en el índice
+        for fila in filas:
+            indice_alertas.eliminar(fila.IdAlerta)
+
+        envios = await asyncio.gather(
+            *(_avisar(limite_envios, fila) for fila in filas),
+            return_exceptions=True
+        )
+        fallidas = []
+        for fila, envio in zip(filas, envios):
+            if isinstance(envio, Exception):
+                logger.warning("No se pudo avisar la alerta %s: %s", fila.IdAlerta, envio)
+                fallidas.append(fila.IdAlerta)
+        if fallidas:
+            await reactivar(fallidas)
+
+
+async def _avisar(limite_envios: asyncio.Semaphore, fila) -> None:
+    async with limite_envios:
+        await enviar_correo_alerta_precio(
+            fila.Correo, fila.Producto, fila.Proveedor, fila.PrecioDisparo, fila.PrecioObjetivo
+        )
+
+
+async def reactivar(ids_alertas: List[int]) -> None:
+    """Vuelve a activar las alertas dadas y las devuelve al índice."""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(SQL_REACTIVAR, {"ids": ids_alertas})
+            filas = result.all()
+            await db.commit()
+    except Exception:
+        logger.exception("Error al reactivar %d alertas de precio", len(ids_alertas))
+        return
+    for id_alerta, id_producto, objetivo in filas:
+        indice_alertas.guardar(id_alerta, id_producto, objetivo)
+
+
+# Instancia única por proceso
+indice_alertas = IndiceAlertas()
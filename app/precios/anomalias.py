@@ -0,0 +1,224 @@
+# app/precios/anomalias.py
+"""
+Detección de precios anómalos (un cero de más, la coma en el lugar equivocado).
+
+Cada precio entrante se compara con dos referencias robustas:
+
+- la mediana y la MAD (desviación absoluta mediana) de lo que cobran los
+  demás proveedores por el mismo producto, sacadas de la matriz de precios;
+- la mediana de los precios recientes del mismo proveedor en HistorialPrecio.
+
+Un precio es anómalo frente a una referencia si se aleja más de UMBRAL_Z
+desviaciones robustas y además es más de FACTOR_MAXIMO veces mayor (o menor).
+Si hay ambas referencias tienen que coincidir, así una corrección de un error
+viejo del propio proveedor no queda retenida; si hay una sola, decide esa.
+Se revisan el Precio, el PrecioOferta y el precio efectivo
+least(Precio, PrecioOferta): basta que uno sea anómalo para retener la fila.
+Todo se calcula con NumPy sobre el lote completo, tanto para una importación
+masiva como para una escritura suelta (un lote de una fila).
+"""
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import HistorialPrecio, PrecioCuarentena, ahora_local
+from app.precios.matriz import matriz_precios
+
+
+UMBRAL_Z = 6.0
+FACTOR_MAXIMO = 2.5
+# Con pocos proveedores o pocos registros la mediana no es confiable
+MIN_PROVEEDORES = 3
+MIN_REGISTROS_HISTORIAL = 3
+DIAS_HISTORIAL = 90
+# La MAD es 0 si varios proveedores cobran lo mismo; la escala nunca baja de esta fracción de la mediana
+ESCALA_MINIMA = 0.1
+TAMANO_TANDA = 1000
+
+# Precios de cada fila que se comparan con las referencias
+CAMPOS_REVISADOS = ("Precio", "PrecioOferta", "Precio efectivo")
+
+# Factor que hace a la MAD comparable con la desviación estándar en datos normales
+_MAD_A_SIGMA = 1.4826
+
+
+def _mediana_filas(valores: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # Filas sin datos -> NaN
+        return np.nanmedian(valores, axis=1)
+
+
+def referencia_proveedores(ids_productos: np.ndarray, ids_proveedores: np.ndarray):
+    """
+    Mediana, MAD y cantidad de los precios (no en centavos) de los demás proveedores
+    para cada fila. La matriz de precios debe estar cargada.
+    """
+    if len(ids_productos) == 0:
+        vacio = np.empty(0)
+        return vacio, vacio, np.empty(0, dtype=np.int64)
+
+    columnas, centavos, disponible = matriz_precios.submatriz(ids_productos.tolist())
+
+    # El precio actual del mismo proveedor no cuenta como referencia
+    columna_de = {id_proveedor: j for j, id_proveedor in enumerate(columnas)}
+    propias = np.array([columna_de.get(p, -1) for p in ids_proveedores.tolist()], dtype=np.int64)
+    filas = np.flatnonzero(propias >= 0)
+    disponible[filas, propias[filas]] = False
+
+    precios = np.where(disponible, centavos / 100, np.nan)
+    mediana = _mediana_filas(precios)
+    mad = _mediana_filas(np.abs(precios - mediana[:, None]))
+    return mediana, mad, disponible.sum(axis=1)
+
+
+async def referencia_historial(db: AsyncSession, pares: pd.DataFrame) -> pd.DataFrame:
+    """Mediana y cantidad de registros recientes de cada (IdProducto, IdProveedor) de `pares`."""
+    # El historial está fechado con la hora del servidor, no con la del precio
+    desde = ahora_local() - timedelta(days=DIAS_HISTORIAL)
+    ids = sorted(pares["IdProducto"].unique().tolist())
+    partes: List[pd.DataFrame] = []
+    for inicio in range(0, len(ids), TAMANO_TANDA):
+        result = await db.execute(
+            select(
+                HistorialPrecio.IdProducto,
+                HistorialPrecio.IdProveedor,
+                func.percentile_cont(0.5).within_group(HistorialPrecio.Precio).label("MedianaHistorial"),
+                func.count().label("RegistrosHistorial"),
+            )
+            .where(
+                HistorialPrecio.IdProducto.in_(ids[inicio:inicio + TAMANO_TANDA]),
+                HistorialPrecio.FechaPrecio >= desde
+            )
+            .group_by(HistorialPrecio.IdProducto, HistorialPrecio.IdProveedor)
+        )
+        partes.append(pd.DataFrame(
+            result.all(), columns=["IdProducto", "IdProveedor", "MedianaHistorial", "RegistrosHistorial"]
+        ))
+    if not partes:
+        return pd.DataFrame(columns=["IdProducto", "IdProveedor", "MedianaHistorial", "RegistrosHistorial"])
+    return pd.concat(partes, ignore_index=True)
+
+
+def _fuera_de_rango(precio: np.ndarray, mediana: np.ndarray, escala: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.abs(precio - mediana) / np.maximum(escala, ESCALA_MINIMA * mediana)
+        razon = precio / mediana
+        return (z > UMBRAL_Z) & ((razon > FACTOR_MAXIMO) | (razon < 1 / FACTOR_MAXIMO))
+
+
+def evaluar(
+    precio: np.ndarray,
+    mediana_proveedores: np.ndarray,
+    mad_proveedores: np.ndarray,
+    cantidad_proveedores: np.ndarray,
+    mediana_historial: np.ndarray,
+    registros_historial: np.ndarray,
+) -> np.ndarray:
+    """Máscara de filas anómalas según las reglas del módulo."""
+    hay_proveedores = (cantidad_proveedores >= MIN_PROVEEDORES) & (mediana_proveedores > 0)
+    hay_historial = (registros_historial >= MIN_REGISTROS_HISTORIAL) & (mediana_historial > 0)
+
+    anomalo_proveedores = hay_proveedores & _fuera_de_rango(
+        precio, mediana_proveedores, _MAD_A_SIGMA * mad_proveedores
+    )
+    # El historial de un mismo proveedor casi no varía: solo cuenta la escala mínima
+    anomalo_historial = hay_historial & _fuera_de_rango(
+        precio, mediana_historial, np.zeros_like(precio)
+    )
+
+    return np.where(
+        hay_proveedores & hay_historial,
+        anomalo_proveedores & anomalo_historial,
+        anomalo_proveedores | anomalo_historial
+    )
+
+
+async def detectar_anomalias(db: AsyncSession, filas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recibe un DataFrame con IdProducto, IdProveedor, Precio y opcionalmente
+    PrecioOferta, y devuelve las filas anómalas (mismo índice) con
+    PrecioReferencia y Motivo.
+    """
+    if filas.empty:
+        return filas.assign(PrecioReferencia=pd.Series(dtype=float), Motivo=pd.Series(dtype=object))
+
+    # 1. Referencias: otros proveedores (memoria) e historial reciente (una consulta por tanda)
+    await matriz_precios.asegurar_cargado(db)
+    ids_productos = filas["IdProducto"].to_numpy(dtype=np.int64)
+    ids_proveedores = filas["IdProveedor"].to_numpy(dtype=np.int64)
+    mediana_prov, mad_prov, cantidad_prov = referencia_proveedores(ids_productos, ids_proveedores)
+
+    historial = await referencia_historial(db, filas[["IdProducto", "IdProveedor"]])
+    historial = filas[["IdProducto", "IdProveedor"]].merge(
+        historial, on=["IdProducto", "IdProveedor"], how="left"
+    )
+    mediana_hist = pd.to_numeric(historial["MedianaHistorial"], errors="coerce").to_numpy(dtype=float)
+    registros_hist = historial["RegistrosHistorial"].fillna(0).to_numpy(dtype=np.int64)
+
+    # 2. Reglas vectorizadas sobre todo el lote, una columna por campo revisado
+    #    (sin oferta la columna queda en NaN y nunca es anómala)
+    precio = filas["Precio"].to_numpy(dtype=float)
+    if "PrecioOferta" in filas:
+        oferta = pd.to_numeric(filas["PrecioOferta"], errors="coerce").to_numpy(dtype=float)
+    else:
+        oferta = np.full_like(precio, np.nan)
+    precios = np.column_stack([precio, oferta, np.fmin(precio, oferta)])
+    anomalo_campo = evaluar(
+        precios, mediana_prov[:, None], mad_prov[:, None], cantidad_prov[:, None],
+        mediana_hist[:, None], registros_hist[:, None]
+    )
+    anomalo = anomalo_campo.any(axis=1)
+
+    # 3. Motivo y referencia solo para las filas marcadas, con el primer campo anómalo
+    indices = np.flatnonzero(anomalo)
+    campos = anomalo_campo[indices].argmax(axis=1)
+    referencia = np.where(
+        cantidad_prov[indices] >= MIN_PROVEEDORES, mediana_prov[indices], mediana_hist[indices]
+    )
+    anomalas = filas.iloc[indices].copy()
+    anomalas["PrecioReferencia"] = np.round(referencia, 2)
+    anomalas["Motivo"] = [
+        f"{CAMPOS_REVISADOS[c]} {p:.2f} es {p / r:.1f} veces el de referencia ({r:.2f})"
+        for c, p, r in zip(campos.tolist(), precios[indices, campos], referencia)
+    ]
+    return anomalas
+
+
+async def retener_si_anomalo(db: AsyncSession, datos: dict, origen: str = "api") -> Optional[PrecioCuarentena]:
+    """
+    Revisa un precio suelto (campos de ProductoProveedor en `datos`). Si es
+    anómalo lo agrega a PrecioCuarentena y lo devuelve; si no, devuelve None.
+    No hace commit.
+    """
+    fila = pd.DataFrame([{
+        "IdProducto": datos["IdProducto"],
+        "IdProveedor": datos["IdProveedor"],
+        "Precio": float(datos["Precio"]),
+        "PrecioOferta": float(datos["PrecioOferta"]) if datos.get("PrecioOferta") is not None else np.nan,
+    }])
+    anomalas = await detectar_anomalias(db, fila)
+    if anomalas.empty:
+        return None
+
+    cuarentena = PrecioCuarentena(
+        IdProducto=datos["IdProducto"],
+        IdProveedor=datos["IdProveedor"],
+        Precio=datos["Precio"],
+        PrecioOferta=datos.get("PrecioOferta"),
+        DescripcionOferta=datos.get("DescripcionOferta"),
+        FechaOferta=datos.get("FechaOferta"),
+        FechaPrecio=(datos.get("FechaPrecio") or ahora_local()).replace(tzinfo=None),
+        PrecioReferencia=Decimal(f"{anomalas['PrecioReferencia'].iloc[0]:.2f}"),
+        Motivo=anomalas["Motivo"].iloc[0],
+        Origen=origen,
+        Estado="pendiente",
+        FechaCreacion=ahora_local()
+    )
+    db.add(cuarentena)
+    return cuarentena
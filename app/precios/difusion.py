@@ -0,0 +1,132 @@
+# app/precios/difusion.py
+"""
+Difusión en proceso de los cambios de precios a clientes conectados por SSE.
+
+Cada suscriptor tiene una cola acotada y, opcionalmente, un filtro de
+IdProducto e IdProveedor. publicar() es síncrono y no espera a nadie: reparte
+el evento entre las colas que lo aceptan, y si la cola de un cliente lento se
+llena se descartan sus eventos pendientes y se le envía "recarga" para que
+vuelva a pedir los datos completos.
+
+Los eventos llevan un id creciente y los últimos se guardan en un buffer, así
+un cliente que se reconecta con Last-Event-ID recibe lo que se perdió.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+from app.models.models import ahora_local
+from app.precios.mejor_precio import precio_efectivo
+
+
+TAMANO_COLA = 256
+TAMANO_BUFFER = 1000
+
+
+def formatear_sse(id_evento: Optional[int], evento: dict) -> str:
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {evento['tipo']}")
+    lineas.append("data: " + json.dumps(evento, default=str, separators=(",", ":")))
+    return "\n".join(lineas) + "\n\n"
+
+
+class Suscripcion:
+    def __init__(self, productos: Optional[Set[int]], proveedores: Optional[Set[int]]):
+        self.productos = productos
+        self.proveedores = proveedores
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=TAMANO_COLA)
+
+    def acepta(self, evento: dict) -> bool:
+        # Los eventos sin producto o sin proveedor (recargas, borrados masivos) llegan a todos
+        id_producto = evento.get("IdProducto")
+        if self.productos is not None and id_producto is not None and id_producto not in self.productos:
+            return False
+        id_proveedor = evento.get("IdProveedor")
+        if self.proveedores is not None and id_proveedor is not None and id_proveedor not in self.proveedores:
+            return False
+        return True
+
+    def entregar(self, id_evento: int, evento: dict) -> None:
+        try:
+            self.cola.put_nowait((id_evento, evento))
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se vacía su cola y se le pide recargar
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait((id_evento, {"tipo": "recarga"}))
+
+
+class HubPrecios:
+    def __init__(self):
+        self._suscripciones: Set[Suscripcion] = set()
+        self._buffer: Deque[Tuple[int, dict]] = deque(maxlen=TAMANO_BUFFER)
+        self._ultimo_id = 0
+
+    def __len__(self) -> int:
+        return len(self._suscripciones)
+
+    def suscribir(
+        self,
+        productos: Optional[List[int]] = None,
+        proveedores: Optional[List[int]] = None,
+        desde_id: Optional[int] = None
+    ) -> Suscripcion:
+        suscripcion = Suscripcion(
+            set(productos) if productos else None,
+            set(proveedores) if proveedores else None
+        )
+        # Reenviar lo que el cliente se perdió desde su último evento, si sigue en el buffer;
+        # un id mayor que el último viene de antes de reiniciar el proceso
+        if desde_id is not None:
+            if desde_id > self._ultimo_id or (self._buffer and desde_id < self._buffer[0][0] - 1):
+                suscripcion.entregar(self._ultimo_id, {"tipo": "recarga"})
+            else:
+                for id_evento, evento in self._buffer:
+                    if id_evento > desde_id and suscripcion.acepta(evento):
+                        suscripcion.entregar(id_evento, evento)
+        self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion) -> None:
+        self._suscripciones.discard(suscripcion)
+
+    def publicar(self, evento: dict) -> int:
+        self._ultimo_id += 1
+        self._buffer.append((self._ultimo_id, evento))
+        for suscripcion in self._suscripciones:
+            if suscripcion.acepta(evento):
+                suscripcion.entregar(self._ultimo_id, evento)
+        return self._ultimo_id
+
+    # --- Eventos de precios -----------------------------------------------
+
+    def precio_guardado(self, relacion) -> None:
+        self.publicar({
+            "tipo": "precio",
+            "IdProducto": relacion.IdProducto,
+            "IdProveedor": relacion.IdProveedor,
+            "Precio": relacion.Precio,
+            "PrecioOferta": relacion.PrecioOferta,
+            "FechaOferta": relacion.FechaOferta,
+            "PrecioEfectivo": precio_efectivo(relacion, ahora_local()),
+        })
+
+    def precio_eliminado(self, id_producto: int, id_proveedor: int) -> None:
+        self.publicar({"tipo": "eliminado", "IdProducto": id_producto, "IdProveedor": id_proveedor})
+
+    def producto_eliminado(self, id_producto: int) -> None:
+        self.publicar({"tipo": "eliminado", "IdProducto": id_producto})
+
+    def proveedor_eliminado(self, id_proveedor: int) -> None:
+        self.publicar({"tipo": "eliminado", "IdProveedor": id_proveedor})
+
+    def recarga(self) -> None:
+        """Cambios masivos: los clientes deben volver a pedir los precios."""
+        self.publicar({"tipo": "recarga"})
+
+
+# Instancia única por proceso
+hub_precios = HubPrecios()
@@ -0,0 +1,162 @@
+# app/precios/expiracion.py
+"""
+Vencimiento de ofertas de ProductoProveedor.
+
+FechaOferta es la fecha en que termina la oferta. Un planificador en segundo
+plano guarda las próximas fechas de fin en un heap y duerme hasta la más
+cercana; al despertar limpia en lotes las ofertas vencidas (PrecioOferta,
+DescripcionOferta y FechaOferta quedan en NULL), deja el cambio en
+HistorialPrecio y avisa por app.precios.sincronizacion para que índices,
+matriz, cachés y clientes SSE se actualicen. Así los precios guardados ya no
+tienen ofertas vencidas y las lecturas no necesitan comparar fechas.
+
+Antes FechaOferta era la fecha de registro de la oferta. La migración
+8e2f4b6a9c03 sacó esos valores viejos (todos pasados) de la columna, y la API
+y la importación solo aceptan fechas de fin futuras, así que toda FechaOferta
+que el planificador encuentra vencida es una fecha de fin real.
+
+El heap puede tener entradas viejas (ofertas cambiadas o ya borradas): la
+sentencia de limpieza vuelve a comprobar FechaOferta en la base de datos.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import ProductoProveedor, ahora_local
+
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+# Aunque no haya ofertas próximas se revisa de vez en cuando por si algo no llegó al heap
+ESPERA_MAXIMA = 300
+# Pausa tras un error (p. ej. base de datos caída) antes de reintentar
+ESPERA_ERROR = 30
+
+SQL_VENCER = text("""
+    WITH vencidas AS (
+        UPDATE "ProductoProveedor" pp
+        SET "PrecioOferta" = NULL, "DescripcionOferta" = NULL, "FechaOferta" = NULL
+        FROM unnest(CAST(:productos AS integer[]), CAST(:proveedores AS integer[]))
+             AS d("IdProducto", "IdProveedor")
+        WHERE pp."IdProducto" = d."IdProducto"
+          AND pp."IdProveedor" = d."IdProveedor"
+          AND pp."FechaOferta" <= :ahora
+        RETURNING pp."IdProducto", pp."IdProveedor", pp."Precio", pp."PrecioOferta", pp."FechaOferta"
+    ),
+    archivadas AS (
+        INSERT INTO "HistorialPrecio" ("IdProducto", "IdProveedor", "Precio", "PrecioOferta", "FechaPrecio")
+        SELECT "IdProducto", "IdProveedor", "Precio", NULL, :registrado
+        FROM vencidas
+    )
+    SELECT * FROM vencidas
+""")
+
+
+class PlanificadorOfertas:
+    def __init__(self):
+        self._vencimientos: List[Tuple[datetime, int, int]] = []
+        self._despertar: Optional[asyncio.Event] = None
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._vencimientos)
+
+    @property
+    def despertar(self) -> asyncio.Event:
+        if self._despertar is None:
+            self._despertar = asyncio.Event()
+        return self._despertar
+
+    async def cargar(self, db: AsyncSession) -> None:
+        version_inicial = self.version
+        result = await db.execute(
+            select(ProductoProveedor.FechaOferta, ProductoProveedor.IdProducto, ProductoProveedor.IdProveedor)
+            .where(ProductoProveedor.PrecioOferta.is_not(None), ProductoProveedor.FechaOferta.is_not(None))
+        )
+        self._vencimientos = [tuple(fila) for fila in result.all()]
+        heapq.heapify(self._vencimientos)
+        # Lo programado mientras se leía la tabla se perdió al reemplazar el heap: se recarga en la próxima vuelta
+        self.cargado = self.version == version_inicial
+
+    def invalidar(self) -> None:
+        """Cambios masivos: el heap se vuelve a leer de la tabla en la próxima vuelta."""
+        self.cargado = False
+        self.version += 1
+        self.despertar.set()
+
+    def programar(self, relacion) -> None:
+        """Agrega el fin de oferta de un ProductoProveedor recién guardado."""
+        if relacion.PrecioOferta is None or relacion.FechaOferta is None:
+            return
+        self.version += 1
+        heapq.heappush(self._vencimientos, (relacion.FechaOferta, relacion.IdProducto, relacion.IdProveedor))
+        # Si es la más próxima, el planificador debe recalcular cuánto dormir
+        if self._vencimientos[0][1:] == (relacion.IdProducto, relacion.IdProveedor):
+            self.despertar.set()
+
+    def _espera(self, ahora: datetime) -> float:
+        if not self._vencimientos:
+            return ESPERA_MAXIMA
+        return min(max((self._vencimientos[0][0] - ahora).total_seconds(), 0), ESPERA_MAXIMA)
+
+    def _vencidos(self, ahora: datetime) -> List[Tuple[int, int]]:
+        pares = set()
+        while self._vencimientos and self._vencimientos[0][0] <= ahora and len(pares) < TAMANO_LOTE:
+            _, id_producto, id_proveedor = heapq.heappop(self._vencimientos)
+            pares.add((id_producto, id_proveedor))
+        return sorted(pares)
+
+    async def vencer(self, db: AsyncSession, ahora: datetime, al_vencer: Callable[[List], None]) -> int:
+        """
+        Limpia las ofertas vencidas hasta `ahora`, lote por lote. Hace commit de
+        cada lote y le pasa sus filas a `al_vencer`. Devuelve cuántas limpió.
+        """
+        total = 0
+        while True:
+            pares = self._vencidos(ahora)
+            if not pares:
+                return total
+            productos, proveedores = (list(columna) for columna in zip(*pares))
+            result = await db.execute(
+                SQL_VENCER,
+                {"productos": productos, "proveedores": proveedores, "ahora": ahora, "registrado": ahora_local()}
+            )
+            filas = result.all()
+            await db.commit()
+            if filas:
+                al_vencer(filas)
+            total += len(filas)
+
+    async def ejecutar(self, al_vencer: Callable[[List], None]) -> None:
+        """Bucle del planificador; `al_vencer` recibe las filas ya limpiadas de cada lote."""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    if not self.cargado:
+                        await self.cargar(db)
+                    await self.vencer(db, ahora_local(), al_vencer)
+            except Exception:
+                logger.exception("Error al vencer ofertas")
+                self.cargado = False
+                await asyncio.sleep(ESPERA_ERROR)
+
+            self.despertar.clear()
+            if not self.cargado:
+                continue
+            try:
+                await asyncio.wait_for(self.despertar.wait(), self._espera(ahora_local()))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Instancia única por proceso
+planificador_ofertas = PlanificadorOfertas()
@@ -0,0 +1,75 @@
+# app/precios/historial.py
+"""
+Historial de precios de ProductoProveedor.
+
+ProductoProveedor solo guarda el precio vigente; cada alta o cambio de precio
+agrega además una fila a HistorialPrecio en la misma transacción. Las series
+se devuelven agregadas por día, semana o mes (mínimo, promedio y máximo), así
+que el tamaño de la respuesta no crece con la cantidad de registros.
+
+Las filas del historial se fechan con la hora del servidor (ahora_local),
+nunca con la FechaPrecio que manda el cliente: así llegan en orden, como
+supone el índice BRIN, y un precio cargado con fecha atrasada no aparece en
+un período de la serie que ya había pasado.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import HistorialPrecio, ProductoProveedor, ahora_local
+
+
+# Valor del parámetro `intervalo` -> unidad de date_trunc
+INTERVALOS = {"dia": "day", "semana": "week", "mes": "month"}
+DIAS_HISTORIAL_POR_DEFECTO = 365
+
+
+def registrar_precio(db: AsyncSession, relacion: ProductoProveedor) -> None:
+    """Agrega el precio actual de `relacion` al historial. No hace commit."""
+    db.add(HistorialPrecio(
+        IdProducto=relacion.IdProducto,
+        IdProveedor=relacion.IdProveedor,
+        Precio=relacion.Precio,
+        PrecioOferta=relacion.PrecioOferta,
+        FechaPrecio=ahora_local()
+    ))
+
+
+async def serie_precios(
+    db: AsyncSession,
+    id_producto: int,
+    id_proveedor: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    intervalo: str = "dia"
+) -> List[dict]:
+    """Mínimo, promedio y máximo del precio por proveedor y periodo."""
+    hasta = (hasta or ahora_local()).replace(tzinfo=None)
+    desde = (desde or hasta - timedelta(days=DIAS_HISTORIAL_POR_DEFECTO)).replace(tzinfo=None)
+    periodo = func.date_trunc(INTERVALOS[intervalo], HistorialPrecio.FechaPrecio).label("Periodo")
+
+    stmt = (
+        select(
+            HistorialPrecio.IdProveedor,
+            periodo,
+            func.min(HistorialPrecio.Precio).label("PrecioMinimo"),
+            func.avg(HistorialPrecio.Precio).label("PrecioPromedio"),
+            func.max(HistorialPrecio.Precio).label("PrecioMaximo"),
+            func.min(HistorialPrecio.PrecioOferta).label("PrecioOfertaMinimo"),
+            func.count().label("Registros")
+        )
+        .where(
+            HistorialPrecio.IdProducto == id_producto,
+            HistorialPrecio.FechaPrecio >= desde,
+            HistorialPrecio.FechaPrecio <= hasta
+        )
+        .group_by(HistorialPrecio.IdProveedor, periodo)
+        .order_by(HistorialPrecio.IdProveedor, periodo)
+    )
+    if id_proveedor is not None:
+        stmt = stmt.where(HistorialPrecio.IdProveedor == id_proveedor)
+
+    result = await db.execute(stmt)
+    return [dict(fila._mapping) for fila in result.all()]
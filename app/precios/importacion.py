@@ -0,0 +1,326 @@
+# app/precios/importacion.py
+"""
+Importación masiva de hojas de precios (CSV o XLSX) a ProductoProveedor.
+
+El archivo se lee por lotes (pandas para CSV, openpyxl en modo solo lectura
+para XLSX) y cada lote se valida de forma vectorizada contra los productos y
+proveedores existentes, cargados una sola vez. Las filas válidas se copian con
+COPY a una tabla temporal y al final un único INSERT ... ON CONFLICT las vuelca
+en ProductoProveedor, registra los cambios en el historial y recalcula el
+resumen de precios, todo en la misma transacción. Las filas inválidas no
+detienen la importación: se devuelven con su número de fila y el motivo. Las
+filas con precios anómalos (ver app.precios.anomalias) van a PrecioCuarentena
+en lugar de a ProductoProveedor.
+
+Leer, validar y convertir cada lote es trabajo de CPU de pandas/openpyxl y se
+hace en un hilo aparte (asyncio.to_thread): una hoja grande no frena las demás
+peticiones ni los latidos de los clientes SSE.
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from zipfile import BadZipFile
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Producto, Proveedor, ahora_local
+from app.precios.anomalias import detectar_anomalias
+from app.precios.resumen import recalcular_resumen
+from app.precios.unidades import recalcular_precio_unidad
+
+
+COLUMNAS_REQUERIDAS = ("IdProducto", "IdProveedor", "Precio")
+COLUMNAS_OPCIONALES = ("PrecioOferta", "DescripcionOferta", "FechaOferta", "FechaPrecio")
+COLUMNAS = COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES
+TAMANO_LOTE = 5000
+MAX_ERRORES_REPORTADOS = 1000
+PRECIO_MAXIMO = 10 ** 8  # Numeric(10, 2)
+
+TABLA_TEMPORAL = "importacion_productoproveedor"
+COLUMNAS_CUARENTENA = list(COLUMNAS) + ["PrecioReferencia", "Motivo", "Origen", "Estado", "FechaCreacion"]
+
+
+def _normalizar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(columna).strip() for columna in df.columns]
+    return df
+
+
+def leer_lotes(archivo: BinaryIO, nombre: str, tamano_lote: int = TAMANO_LOTE) -> Iterator[pd.DataFrame]:
+    """Lotes del archivo como DataFrames con una columna `Fila` (número de fila en la hoja)."""
+    extension = Path(nombre).suffix.lower()
+    fila = 2  # La fila 1 es el encabezado
+
+    if extension == ".csv":
+        for lote in pd.read_csv(archivo, chunksize=tamano_lote, dtype=str, skipinitialspace=True):
+            lote = _normalizar_columnas(lote)
+            lote["Fila"] = range(fila, fila + len(lote))
+            fila += len(lote)
+            yield lote.reset_index(drop=True)
+
+    elif extension in (".xlsx", ".xlsm"):
+        try:
+            libro = load_workbook(archivo, read_only=True, data_only=True)
+        except (InvalidFileException, BadZipFile) as e:
+            raise ValueError(f"No se pudo leer el archivo Excel: {e}")
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezado = next(filas, None)
+            if encabezado is None:
+                return
+            encabezado = [str(c).strip() if c is not None else "" for c in encabezado]
+
+            pendientes: List[tuple] = []
+            for valores in filas:
+                if all(v is None for v in valores):
+                    fila += 1
+                    continue
+                pendientes.append((fila,) + tuple(valores))
+                fila += 1
+                if len(pendientes) >= tamano_lote:
+                    yield _lote_excel(encabezado, pendientes)
+                    pendientes = []
+            if pendientes:
+                yield _lote_excel(encabezado, pendientes)
+        finally:
+            libro.close()
+
+    else:
+        raise ValueError("Formato no soportado: use un archivo .csv o .xlsx")
+
+
+def _lote_excel(encabezado: List[str], filas: List[tuple]) -> pd.DataFrame:
+    ancho = len(encabezado) + 1
+    filas = [f[:ancho] + (None,) * (ancho - len(f)) for f in filas]
+    return pd.DataFrame(filas, columns=["Fila"] + encabezado)
+
+
+def validar_lote(
+    lote: pd.DataFrame,
+    productos_validos: pd.Index,
+    proveedores_validos: pd.Index,
+    id_proveedor: Optional[int] = None,
+    ahora: Optional[datetime] = None
+) -> Tuple[pd.DataFrame, List[dict]]:
+    """Separa el lote en filas válidas (tipadas) y errores por fila."""
+    ahora = ahora or ahora_local()
+
+    # 1. Validar columnas
+    if id_proveedor is not None:
+        lote["IdProveedor"] = id_proveedor
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in lote.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+    for columna in COLUMNAS_OPCIONALES:
+        if columna not in lote.columns:
+            lote[columna] = None
+
+    # 2. Convertir tipos; lo que no se puede convertir queda en NaN/NaT
+    id_producto = pd.to_numeric(lote["IdProducto"], errors="coerce")
+    id_prov = pd.to_numeric(lote["IdProveedor"], errors="coerce")
+    precio = pd.to_numeric(lote["Precio"], errors="coerce").round(2)
+    oferta_texto = lote["PrecioOferta"].astype("string").str.strip().replace("", pd.NA)
+    oferta = pd.to_numeric(oferta_texto, errors="coerce").round(2)
+    fecha_oferta = pd.to_datetime(lote["FechaOferta"], errors="coerce")
+    fecha_precio_leida = pd.to_datetime(lote["FechaPrecio"], errors="coerce")
+    fecha_precio = fecha_precio_leida.fillna(pd.Timestamp(ahora))
+
+    # 3. Reglas, en orden; cada fila se reporta solo con el primer error
+    reglas = [
+        (id_producto.isna() | (id_producto % 1 != 0), "IdProducto no es un entero"),
+        (id_prov.isna() | (id_prov % 1 != 0), "IdProveedor no es un entero"),
+        (~id_producto.isin(productos_validos), "Producto no encontrado"),
+        (~id_prov.isin(proveedores_validos), "Proveedor no encontrado"),
+        (precio.isna(), "Precio no es numérico"),
+        (precio <= 0, "El precio debe ser mayor que cero"),
+        (precio >= PRECIO_MAXIMO, "El precio excede el máximo permitido"),
+        (oferta_texto.notna() & oferta.isna(), "PrecioOferta no es numérico"),
+        (oferta.notna() & (oferta <= 0), "El precio de oferta debe ser mayor que cero"),
+        (oferta.notna() & (oferta >= PRECIO_MAXIMO), "El precio de oferta excede el máximo permitido"),
+        (lote["FechaOferta"].notna() & fecha_oferta.isna(), "FechaOferta no es una fecha válida"),
+        (fecha_oferta.notna() & (fecha_oferta <= pd.Timestamp(ahora)), "FechaOferta es la fecha de fin de la oferta y debe ser futura"),
+        (lote["FechaPrecio"].notna() & fecha_precio_leida.isna(), "FechaPrecio no es una fecha válida"),
+        (fecha_precio > pd.Timestamp(ahora), "FechaPrecio no puede ser futura"),
+    ]
+
+    errores: List[dict] = []
+    invalidas = pd.Series(False, index=lote.index)
+    for mascara, mensaje in reglas:
+        nuevas = mascara.fillna(True).astype(bool) & ~invalidas
+        errores.extend({"Fila": int(f), "Error": mensaje} for f in lote.loc[nuevas, "Fila"])
+        invalidas |= nuevas
+
+    # 4. Filas válidas, con los tipos de la tabla temporal
+    validas = ~invalidas
+    descripcion = lote["DescripcionOferta"].where(lote["DescripcionOferta"].notna(), None)
+    validos = pd.DataFrame({
+        "Fila": lote.loc[validas, "Fila"].astype(int),
+        "IdProducto": id_producto[validas].astype(int),
+        "IdProveedor": id_prov[validas].astype(int),
+        "Precio": precio[validas],
+        "PrecioOferta": oferta[validas],
+        "DescripcionOferta": descripcion[validas],
+        "FechaOferta": fecha_oferta[validas],
+        "FechaPrecio": fecha_precio[validas],
+    })
+    return validos, errores
+
+
+def _registros(validos: pd.DataFrame) -> List[tuple]:
+    """Tuplas nativas de Python para COPY (NaN/NaT -> None)."""
+    validos = validos.astype(object).where(validos.notna(), None)
+    registros = []
+    for fila in validos.itertuples(index=False):
+        registros.append((
+            fila.Fila,
+            fila.IdProducto,
+            fila.IdProveedor,
+            Decimal(f"{fila.Precio:.2f}"),
+            Decimal(f"{fila.PrecioOferta:.2f}") if fila.PrecioOferta is not None else None,
+            str(fila.DescripcionOferta) if fila.DescripcionOferta is not None else None,
+            fila.FechaOferta.to_pydatetime().replace(tzinfo=None) if fila.FechaOferta is not None else None,
+            fila.FechaPrecio.to_pydatetime().replace(tzinfo=None),
+        ))
+    return registros
+
+
+def _registros_cuarentena(anomalas: pd.DataFrame, ahora: datetime) -> List[tuple]:
+    """Tuplas para COPY a PrecioCuarentena: las columnas de la hoja más referencia y motivo."""
+    return [
+        registro[1:] + (Decimal(f"{referencia:.2f}"), motivo, "importacion", "pendiente", ahora)
+        for registro, referencia, motivo in zip(
+            _registros(anomalas.drop(columns=["PrecioReferencia", "Motivo"])),
+            anomalas["PrecioReferencia"],
+            anomalas["Motivo"]
+        )
+    ]
+
+
+async def importar_precios(
+    db: AsyncSession,
+    archivo: BinaryIO,
+    nombre: str,
+    id_proveedor: Optional[int] = None,
+    tamano_lote: int = TAMANO_LOTE,
+    revisar_anomalias: bool = True
+) -> dict:
+    """Importa la hoja y hace commit. Devuelve conteos y errores por fila."""
+    # 1. Catálogos para validar (una consulta por tabla, no una por fila)
+    productos_validos = pd.Index((await db.execute(select(Producto.IdProducto))).scalars().all())
+    proveedores_validos = pd.Index((await db.execute(select(Proveedor.IdProveedor))).scalars().all())
+    if id_proveedor is not None and id_proveedor not in proveedores_validos:
+        raise LookupError("Proveedor no encontrado")
+
+    # 2. Tabla temporal para COPY; se borra sola al terminar la transacción
+    await db.execute(text(f"""
+        CREATE TEMP TABLE {TABLA_TEMPORAL} (
+            "Fila" integer NOT NULL,
+            "IdProducto" integer NOT NULL,
+            "IdProveedor" integer NOT NULL,
+            "Precio" numeric(10, 2) NOT NULL,
+            "PrecioOferta" numeric(10, 2),
+            "DescripcionOferta" text,
+            "FechaOferta" timestamp,
+            "FechaPrecio" timestamp NOT NULL
+        ) ON COMMIT DROP
+    """))
+    conexion = await (await db.connection()).get_raw_connection()
+    asyncpg_conn = conexion.driver_connection
+
+    # 3. Leer, validar y copiar por lotes; los precios anómalos van a cuarentena
+    leidas, errores, cuarentena = 0, [], []
+    ahora = ahora_local()
+    lotes = leer_lotes(archivo, nombre, tamano_lote)
+    while (lote := await asyncio.to_thread(next, lotes, None)) is not None:
+        leidas += len(lote)
+        validos, errores_lote = await asyncio.to_thread(
+            validar_lote, lote, productos_validos, proveedores_validos, id_proveedor, ahora
+        )
+        errores.extend(errores_lote)
+        if revisar_anomalias and not validos.empty:
+            anomalas = await detectar_anomalias(db, validos)
+            if not anomalas.empty:
+                await asyncpg_conn.copy_records_to_table(
+                    "PrecioCuarentena",
+                    records=_registros_cuarentena(anomalas, ahora),
+                    columns=COLUMNAS_CUARENTENA
+                )
+                cuarentena.extend(
+                    {"Fila": int(f), "Motivo": m} for f, m in zip(anomalas["Fila"], anomalas["Motivo"])
+                )
+                validos = validos.drop(index=anomalas.index)
+        if not validos.empty:
+            await asyncpg_conn.copy_records_to_table(
+                TABLA_TEMPORAL,
+                records=await asyncio.to_thread(_registros, validos),
+                columns=["Fila"] + list(COLUMNAS)
+            )
+
+    # 4. Volcar en ProductoProveedor; si un par aparece varias veces gana la última fila.
+    #    Todos los CTE ven la tabla antes del upsert, así que `cambios` compara
+    #    contra el precio anterior para decidir qué va al historial
+    resultado = await db.execute(text(f"""
+        WITH nuevos AS (
+            SELECT DISTINCT ON ("IdProducto", "IdProveedor") *
+            FROM {TABLA_TEMPORAL}
+            ORDER BY "IdProducto", "IdProveedor", "Fila" DESC
+        ),
+        cambios AS (
+            SELECT n.*
+            FROM nuevos n
+            LEFT JOIN "ProductoProveedor" pp
+                ON pp."IdProducto" = n."IdProducto" AND pp."IdProveedor" = n."IdProveedor"
+            WHERE pp."IdProducto" IS NULL
+               OR (pp."Precio", pp."PrecioOferta") IS DISTINCT FROM (n."Precio", n."PrecioOferta")
+        ),
+        upsert AS (
+            INSERT INTO "ProductoProveedor"
+                ("IdProducto", "IdProveedor", "Precio", "PrecioOferta",
+                 "DescripcionOferta", "FechaOferta", "FechaPrecio")
+            SELECT "IdProducto", "IdProveedor", "Precio", "PrecioOferta",
+                   coalesce("DescripcionOferta", 'No habia oferta'), "FechaOferta", "FechaPrecio"
+            FROM nuevos
+            ON CONFLICT ("IdProducto", "IdProveedor") DO UPDATE SET
+                "Precio" = excluded."Precio",
+                "PrecioOferta" = excluded."PrecioOferta",
+                "DescripcionOferta" = excluded."DescripcionOferta",
+                "FechaOferta" = excluded."FechaOferta",
+                "FechaPrecio" = excluded."FechaPrecio"
+            RETURNING "IdProducto", (xmax = 0) AS insertado
+        ),
+        historial AS (
+            INSERT INTO "HistorialPrecio" ("IdProducto", "IdProveedor", "Precio", "PrecioOferta", "FechaPrecio")
+            SELECT "IdProducto", "IdProveedor", "Precio", "PrecioOferta", :registrado
+            FROM cambios
+            RETURNING 1
+        )
+        SELECT
+            (SELECT count(*) FROM upsert WHERE insertado) AS insertados,
+            (SELECT count(*) FROM upsert WHERE NOT insertado) AS actualizados,
+            (SELECT count(*) FROM historial) AS cambios_precio,
+            (SELECT coalesce(array_agg(DISTINCT "IdProducto"), '{{}}') FROM upsert) AS productos
+    """), {"registrado": ahora_local()})
+    insertados, actualizados, cambios_precio, productos = resultado.one()
+
+    # 5. Resumen y precio por unidad base de los productos tocados, y commit
+    await recalcular_resumen(db, productos)
+    await recalcular_precio_unidad(db, productos)
+    await db.commit()
+
+    errores.sort(key=lambda e: e["Fila"])
+    return {
+        "FilasLeidas": leidas,
+        "FilasValidas": leidas - len(errores),
+        "Insertados": insertados,
+        "Actualizados": actualizados,
+        "CambiosPrecio": cambios_precio,
+        "EnCuarentena": len(cuarentena),
+        "FilasEnCuarentena": cuarentena[:MAX_ERRORES_REPORTADOS],
+        "TotalErrores": len(errores),
+        "Errores": errores[:MAX_ERRORES_REPORTADOS],
+    }
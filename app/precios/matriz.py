@@ -0,0 +1,222 @@
+# app/precios/matriz.py
+"""
+Matriz densa de precios producto x proveedor en memoria.
+
+Los precios se guardan en centavos en un arreglo int64 de NumPy, con una
+máscara booleana de disponibilidad del mismo tamaño. Cada celda tiene el precio
+efectivo (la oferta mientras FechaOferta no haya pasado, ver
+app.precios.mejor_precio.precio_efectivo), igual que el índice de mejor precio
+y las alertas; cuando el planificador de ofertas vence una oferta, el aviso de
+app.precios.sincronizacion devuelve la celda al Precio de lista. Los IdProducto e IdProveedor se traducen a filas y columnas densas con
+diccionarios; cuando aparece un id nuevo la matriz crece al doble.
+
+Con esto el total de una canasta en todos los proveedores es una sola
+multiplicación matriz-vector, sin ir a la base de datos. Se carga al iniciar
+la API y se parchea desde app.precios.sincronizacion.
+"""
+import asyncio
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ProductoProveedor, ahora_local
+from app.precios.mejor_precio import precio_efectivo
+
+
+CAPACIDAD_INICIAL = 64
+
+
+def a_centavos(precio) -> int:
+    return int((Decimal(precio) * 100).to_integral_value())
+
+
+class MatrizPrecios:
+    def __init__(self):
+        self._reiniciar()
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def _reiniciar(self, filas: int = CAPACIDAD_INICIAL, columnas: int = CAPACIDAD_INICIAL) -> None:
+        self._centavos = np.zeros((filas, columnas), dtype=np.int64)
+        self._disponible = np.zeros((filas, columnas), dtype=bool)
+        self._fila_producto: Dict[int, int] = {}
+        self._columna_proveedor: Dict[int, int] = {}
+        self._ids_productos: List[int] = []
+        self._ids_proveedores: List[int] = []
+
+    def __len__(self) -> int:
+        return int(self._disponible.sum())
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            result = await db.execute(
+                select(
+                    ProductoProveedor.IdProducto,
+                    ProductoProveedor.IdProveedor,
+                    ProductoProveedor.Precio,
+                    ProductoProveedor.PrecioOferta,
+                    ProductoProveedor.FechaOferta
+                )
+            )
+            self.cargar(result.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, filas: Iterable) -> None:
+        """Filas con IdProducto, IdProveedor, Precio, PrecioOferta y FechaOferta."""
+        filas = list(filas)
+        ahora = ahora_local()
+        productos = sorted({f[0] for f in filas})
+        proveedores = sorted({f[1] for f in filas})
+        self._reiniciar(max(len(productos), CAPACIDAD_INICIAL), max(len(proveedores), CAPACIDAD_INICIAL))
+        self._ids_productos = productos
+        self._ids_proveedores = proveedores
+        self._fila_producto = {id_producto: i for i, id_producto in enumerate(productos)}
+        self._columna_proveedor = {id_proveedor: j for j, id_proveedor in enumerate(proveedores)}
+
+        if filas:
+            i = np.fromiter((self._fila_producto[f[0]] for f in filas), dtype=np.int64, count=len(filas))
+            j = np.fromiter((self._columna_proveedor[f[1]] for f in filas), dtype=np.int64, count=len(filas))
+            self._centavos[i, j] = [a_centavos(precio_efectivo(f, ahora)) for f in filas]
+            self._disponible[i, j] = True
+
+        self.cargado = True
+        self.version += 1
+
+    def invalidar(self) -> None:
+        """Fuerza una recarga completa en la próxima consulta (p. ej. tras una importación masiva)."""
+        self.cargado = False
+        self.version += 1
+
+    # --- Escrituras -------------------------------------------------------
+
+    def _crecer(self, filas: int, columnas: int) -> None:
+        alto, ancho = self._centavos.shape
+        if filas <= alto and columnas <= ancho:
+            return
+        nuevo_alto = alto * 2 if filas > alto else alto
+        nuevo_ancho = ancho * 2 if columnas > ancho else ancho
+        centavos = np.zeros((nuevo_alto, nuevo_ancho), dtype=np.int64)
+        disponible = np.zeros((nuevo_alto, nuevo_ancho), dtype=bool)
+        centavos[:alto, :ancho] = self._centavos
+        disponible[:alto, :ancho] = self._disponible
+        self._centavos, self._disponible = centavos, disponible
+
+    def _fila(self, id_producto: int) -> int:
+        fila = self._fila_producto.get(id_producto)
+        if fila is None:
+            fila = self._fila_producto[id_producto] = len(self._ids_productos)
+            self._ids_productos.append(id_producto)
+            self._crecer(fila + 1, len(self._ids_proveedores))
+        return fila
+
+    def _columna(self, id_proveedor: int) -> int:
+        columna = self._columna_proveedor.get(id_proveedor)
+        if columna is None:
+            columna = self._columna_proveedor[id_proveedor] = len(self._ids_proveedores)
+            self._ids_proveedores.append(id_proveedor)
+            self._crecer(len(self._ids_productos), columna + 1)
+        return columna
+
+    def actualizar(self, relacion) -> None:
+        """Fija el precio efectivo de un ProductoProveedor (objeto o fila equivalente)."""
+        self.version += 1
+        if not self.cargado:
+            return
+        i, j = self._fila(relacion.IdProducto), self._columna(relacion.IdProveedor)
+        self._centavos[i, j] = a_centavos(precio_efectivo(relacion, ahora_local()))
+        self._disponible[i, j] = True
+
+    def eliminar(self, id_producto: int, id_proveedor: int) -> None:
+        self.version += 1
+        i = self._fila_producto.get(id_producto)
+        j = self._columna_proveedor.get(id_proveedor)
+        if self.cargado and i is not None and j is not None:
+            self._disponible[i, j] = False
+
+    def eliminar_producto(self, id_producto: int) -> None:
+        self.version += 1
+        i = self._fila_producto.get(id_producto)
+        if self.cargado and i is not None:
+            self._disponible[i, :] = False
+
+    def eliminar_proveedor(self, id_proveedor: int) -> None:
+        self.version += 1
+        j = self._columna_proveedor.get(id_proveedor)
+        if self.cargado and j is not None:
+            self._disponible[:, j] = False
+
+    # --- Consultas --------------------------------------------------------
+
+    def submatriz(
+        self, ids_productos: Sequence[int], ids_proveedores: Optional[Sequence[int]] = None
+    ) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """
+        Precios en centavos y disponibilidad para los productos (filas, en el
+        orden pedido) y proveedores (columnas) dados. Sin `ids_proveedores` se
+        usan todos los conocidos. Los ids desconocidos quedan como no disponibles.
+        """
+        if ids_proveedores is None:
+            ids_proveedores = list(self._ids_proveedores)
+        else:
+            ids_proveedores = list(ids_proveedores)
+
+        # Las filas/columnas de ids desconocidos apuntan a -1 y se enmascaran después
+        filas = np.array([self._fila_producto.get(i, -1) for i in ids_productos], dtype=np.int64)
+        columnas = np.array([self._columna_proveedor.get(j, -1) for j in ids_proveedores], dtype=np.int64)
+        centavos = self._centavos[np.ix_(filas, columnas)]
+        disponible = self._disponible[np.ix_(filas, columnas)]
+        disponible &= (filas >= 0)[:, None] & (columnas >= 0)[None, :]
+        centavos = np.where(disponible, centavos, 0)
+        return ids_proveedores, centavos, disponible
+
+    def totales_canasta(
+        self,
+        ids_productos: Sequence[int],
+        cantidades: Sequence[int],
+        ids_proveedores: Optional[Sequence[int]] = None
+    ) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """Total en centavos y cantidad de productos faltantes por proveedor."""
+        ids_proveedores, centavos, disponible = self.submatriz(ids_productos, ids_proveedores)
+        cantidades = np.asarray(cantidades, dtype=np.int64)
+        totales = cantidades @ centavos
+        faltantes = (~disponible).sum(axis=0)
+        return ids_proveedores, totales, faltantes
+
+    def promedios(self, ids_productos: Sequence[int]) -> np.ndarray:
+        """Precio promedio en centavos de cada producto entre quienes lo venden (NaN si nadie)."""
+        _, centavos, disponible = self.submatriz(ids_productos)
+        cantidad = disponible.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(cantidad > 0, centavos.sum(axis=1) / cantidad, np.nan)
+
+    def productos_de(self, ids_proveedores: Sequence[int]) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """
+        Productos que vende al menos uno de los proveedores dados, con el
+        proveedor más barato entre ellos y su precio en centavos.
+        """
+        ids_proveedores, centavos, disponible = self.submatriz(self._ids_productos, ids_proveedores)
+        if not ids_proveedores:
+            return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        alguno = disponible.any(axis=1)
+        precios = np.where(disponible, centavos, np.iinfo(np.int64).max)
+        mejor = precios.argmin(axis=1)
+        filas = np.flatnonzero(alguno)
+        ids = [self._ids_productos[i] for i in filas.tolist()]
+        proveedores = np.asarray(ids_proveedores, dtype=np.int64)[mejor[filas]]
+        return ids, proveedores, precios[filas, mejor[filas]]
+
+
+# Instancia única por proceso
+matriz_precios = MatrizPrecios()
@@ -0,0 +1,200 @@
+# app/precios/mejor_precio.py
+"""
+Índice en memoria del precio efectivo por producto.
+
+El precio efectivo de un ProductoProveedor es PrecioOferta mientras la oferta
+esté vigente (FechaOferta vacía o todavía no alcanzada; FechaOferta es la fecha
+en que la oferta termina; los valores anteriores a ese cambio se dejaron vacíos
+por migración) y Precio en cualquier otro caso. Para cada producto
+se guarda una lista ordenada de (precio efectivo, IdProveedor), así que el más
+barato es el primer elemento.
+
+Las ofertas con fecha de fin se guardan además en un heap; antes de cada
+consulta se sacan las vencidas y su proveedor vuelve a su precio normal. Las
+escrituras llegan por app.precios.sincronizacion.
+"""
+import asyncio
+import heapq
+from bisect import bisect_left, insort
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ProductoProveedor, ahora_local
+
+
+class PrecioVigente(NamedTuple):
+    IdProducto: int
+    IdProveedor: int
+    Precio: Decimal
+    PrecioOferta: Optional[Decimal]
+    FechaOferta: Optional[datetime]
+
+
+def oferta_vigente(fila, ahora: datetime) -> bool:
+    return fila.PrecioOferta is not None and (fila.FechaOferta is None or fila.FechaOferta > ahora)
+
+
+def precio_efectivo(fila, ahora: datetime) -> Decimal:
+    if oferta_vigente(fila, ahora):
+        return min(fila.Precio, fila.PrecioOferta)
+    return fila.Precio
+
+
+class IndiceMejorPrecio:
+    def __init__(self):
+        self._filas: Dict[Tuple[int, int], PrecioVigente] = {}
+        self._efectivos: Dict[Tuple[int, int], Decimal] = {}
+        self._por_producto: Dict[int, List[Tuple[Decimal, int]]] = {}
+        self._vencimientos: List[Tuple[datetime, int, int]] = []
+        self._lock = asyncio.Lock()
+        self.cargado = False
+        # Se incrementa con cada cambio; permite detectar escrituras durante una carga
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._filas)
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            version_inicial = self.version
+            result = await db.execute(
+                select(
+                    ProductoProveedor.IdProducto,
+                    ProductoProveedor.IdProveedor,
+                    ProductoProveedor.Precio,
+                    ProductoProveedor.PrecioOferta,
+                    ProductoProveedor.FechaOferta
+                )
+            )
+            self.cargar(result.all())
+            # Si hubo escrituras mientras se leía la tabla, se recargará en la próxima consulta
+            if self.version != version_inicial + 1:
+                self.cargado = False
+
+    def cargar(self, filas: Iterable, ahora: Optional[datetime] = None) -> None:
+        ahora = ahora or ahora_local()
+        self._filas = {}
+        self._efectivos = {}
+        self._por_producto = {}
+        self._vencimientos = []
+        for fila in filas:
+            fila = PrecioVigente(*fila)
+            clave = (fila.IdProducto, fila.IdProveedor)
+            self._filas[clave] = fila
+            self._efectivos[clave] = precio_efectivo(fila, ahora)
+            self._por_producto.setdefault(fila.IdProducto, []).append((self._efectivos[clave], fila.IdProveedor))
+            if oferta_vigente(fila, ahora) and fila.FechaOferta is not None:
+                self._vencimientos.append((fila.FechaOferta, fila.IdProducto, fila.IdProveedor))
+        for precios in self._por_producto.values():
+            precios.sort()
+        heapq.heapify(self._vencimientos)
+        self.cargado = True
+        self.version += 1
+
+    def invalidar(self) -> None:
+        """Fuerza una recarga completa en la próxima consulta (p. ej. tras una importación masiva)."""
+        self.cargado = False
+        self.version += 1
+
+    # --- Escrituras -------------------------------------------------------
+
+    def _quitar(self, clave: Tuple[int, int]) -> None:
+        self._filas.pop(clave, None)
+        efectivo = self._efectivos.pop(clave, None)
+        if efectivo is None:
+            return
+        precios = self._por_producto.get(clave[0], [])
+        posicion = bisect_left(precios, (efectivo, clave[1]))
+        if posicion < len(precios) and precios[posicion] == (efectivo, clave[1]):
+            del precios[posicion]
+        if not precios:
+            self._por_producto.pop(clave[0], None)
+
+    def _insertar(self, fila: PrecioVigente, ahora: datetime) -> None:
+        clave = (fila.IdProducto, fila.IdProveedor)
+        self._filas[clave] = fila
+        self._efectivos[clave] = precio_efectivo(fila, ahora)
+        insort(self._por_producto.setdefault(fila.IdProducto, []), (self._efectivos[clave], fila.IdProveedor))
+        if oferta_vigente(fila, ahora) and fila.FechaOferta is not None:
+            heapq.heappush(self._vencimientos, (fila.FechaOferta, fila.IdProducto, fila.IdProveedor))
+
+    def actualizar(self, relacion) -> None:
+        """Inserta o reemplaza el precio de un ProductoProveedor (objeto o fila equivalente)."""
+        self.version += 1
+        if not self.cargado:
+            return
+        fila = PrecioVigente(
+            relacion.IdProducto, relacion.IdProveedor, relacion.Precio,
+            relacion.PrecioOferta, relacion.FechaOferta
+        )
+        self._quitar((fila.IdProducto, fila.IdProveedor))
+        self._insertar(fila, ahora_local())
+
+    def eliminar(self, id_producto: int, id_proveedor: int) -> None:
+        self.version += 1
+        if self.cargado:
+            self._quitar((id_producto, id_proveedor))
+
+    def eliminar_producto(self, id_producto: int) -> None:
+        self.version += 1
+        if self.cargado:
+            for _, id_proveedor in list(self._por_producto.get(id_producto, [])):
+                self._quitar((id_producto, id_proveedor))
+
+    def eliminar_proveedor(self, id_proveedor: int) -> None:
+        self.version += 1
+        if self.cargado:
+            for clave in [c for c in self._filas if c[1] == id_proveedor]:
+                self._quitar(clave)
+
+    def vencer_ofertas(self, ahora: Optional[datetime] = None) -> List[Tuple[int, int]]:
+        """Reubica los proveedores cuya oferta terminó. Devuelve los pares afectados."""
+        ahora = ahora or ahora_local()
+        vencidos = []
+        while self._vencimientos and self._vencimientos[0][0] <= ahora:
+            fecha, id_producto, id_proveedor = heapq.heappop(self._vencimientos)
+            fila = self._filas.get((id_producto, id_proveedor))
+            # La entrada del heap puede ser vieja si la fila cambió después
+            if fila is None or fila.FechaOferta != fecha:
+                continue
+            self._quitar((id_producto, id_proveedor))
+            self._insertar(fila, ahora)
+            vencidos.append((id_producto, id_proveedor))
+        return vencidos
+
+    # --- Consultas --------------------------------------------------------
+
+    def mejores(self, id_producto: int, n: int = 1, ahora: Optional[datetime] = None) -> List[dict]:
+        """Los `n` proveedores más baratos del producto según el precio efectivo."""
+        ahora = ahora or ahora_local()
+        self.vencer_ofertas(ahora)
+        respuesta = []
+        for efectivo, id_proveedor in self._por_producto.get(id_producto, [])[:n]:
+            fila = self._filas[(id_producto, id_proveedor)]
+            en_oferta = oferta_vigente(fila, ahora)
+            respuesta.append({
+                "IdProveedor": id_proveedor,
+                "PrecioEfectivo": efectivo,
+                "Precio": fila.Precio,
+                "PrecioOferta": fila.PrecioOferta if en_oferta else None,
+                "FechaFinOferta": fila.FechaOferta if en_oferta else None,
+                "EnOferta": en_oferta,
+            })
+        return respuesta
+
+    def precio(self, id_producto: int, id_proveedor: int) -> Optional[Decimal]:
+        """Precio efectivo de un par, o None si el proveedor no vende el producto."""
+        self.vencer_ofertas()
+        return self._efectivos.get((id_producto, id_proveedor))
+
+
+# Instancia única por proceso
+indice_mejor_precio = IndiceMejorPrecio()
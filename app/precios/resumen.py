@@ -0,0 +1,170 @@
+# app/precios/resumen.py
+"""
+Resumen de precios por producto (promedio, mínimo, máximo y cantidad de
+proveedores) guardado en PrecioProductoResumen.
+
+Cada escritura sobre ProductoProveedor recalcula solo los productos afectados,
+dentro de la misma transacción, así que el resumen nunca queda desfasado de los
+precios confirmados. Antes de agregar se toma un advisory lock por producto
+hasta el fin de la transacción: dos escrituras concurrentes sobre el mismo
+producto recalculan una después de la otra, y la segunda ya ve la fila de la
+primera (en READ COMMITTED cada sentencia ve lo confirmado antes de empezar).
+
+/productoavg lo lee directamente en vez de agrupar toda la tabla de precios, y
+/productoavg/pagina lo recorre por cursor sobre (PrecioPromedio, IdProducto).
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import PrecioProductoResumen, Producto, ProductoProveedor
+
+
+TAMANO_TANDA = 1000
+# Primer argumento de pg_advisory_xact_lock(int, int): separa estos bloqueos de otros usos
+CLAVE_BLOQUEO_RESUMEN = 10
+
+# Los ids se bloquean en orden para que dos transacciones no se esperen mutuamente
+SQL_BLOQUEAR_PRODUCTOS = text("""
+    SELECT pg_advisory_xact_lock(:clave, ids.id)
+    FROM (SELECT id FROM unnest(CAST(:ids AS integer[])) AS id ORDER BY id) AS ids
+""")
+
+
+async def recalcular_resumen(db: AsyncSession, ids_productos: Iterable[int]) -> None:
+    """Recalcula el resumen de los productos dados. Hace flush pero no commit."""
+    ids = sorted(set(ids_productos))
+    if not ids:
+        return
+
+    # La sesión no usa autoflush: los cambios pendientes deben llegar a la BD
+    await db.flush()
+
+    # Las importaciones masivas pueden tocar miles de productos; se recalculan
+    # por tandas para no exceder el límite de parámetros de asyncpg
+    for inicio in range(0, len(ids), TAMANO_TANDA):
+        await _recalcular_tanda(db, ids[inicio:inicio + TAMANO_TANDA])
+
+
+async def _recalcular_tanda(db: AsyncSession, ids: List[int]) -> None:
+    # 0. Serializar con otras transacciones que recalculan los mismos productos
+    await db.execute(SQL_BLOQUEAR_PRODUCTOS, {"clave": CLAVE_BLOQUEO_RESUMEN, "ids": ids})
+
+    # 1. Insertar o actualizar los agregados de los productos que tienen precios
+    agregados = (
+        select(
+            ProductoProveedor.IdProducto,
+            func.avg(ProductoProveedor.Precio),
+            func.min(ProductoProveedor.Precio),
+            func.max(ProductoProveedor.Precio),
+            func.count(),
+            func.now()
+        )
+        .where(ProductoProveedor.IdProducto.in_(ids))
+        .group_by(ProductoProveedor.IdProducto)
+    )
+    stmt = insert(PrecioProductoResumen).from_select(
+        [
+            PrecioProductoResumen.IdProducto,
+            PrecioProductoResumen.PrecioPromedio,
+            PrecioProductoResumen.PrecioMinimo,
+            PrecioProductoResumen.PrecioMaximo,
+            PrecioProductoResumen.CantidadProveedores,
+            PrecioProductoResumen.FechaActualizacion,
+        ],
+        agregados
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PrecioProductoResumen.IdProducto],
+        set_={
+            "PrecioPromedio": stmt.excluded.PrecioPromedio,
+            "PrecioMinimo": stmt.excluded.PrecioMinimo,
+            "PrecioMaximo": stmt.excluded.PrecioMaximo,
+            "CantidadProveedores": stmt.excluded.CantidadProveedores,
+            "FechaActualizacion": stmt.excluded.FechaActualizacion,
+        }
+    )
+    await db.execute(stmt)
+
+    # 2. Quitar el resumen de los productos que se quedaron sin precios
+    await db.execute(
+        delete(PrecioProductoResumen).where(
+            PrecioProductoResumen.IdProducto.in_(ids),
+            ~exists().where(ProductoProveedor.IdProducto == PrecioProductoResumen.IdProducto)
+        ).execution_options(synchronize_session=False)
+    )
+
+
+# --- Lectura paginada ---------------------------------------------------------
+# Cursor "p:PrecioPromedio:IdProducto" dentro de los productos con precios y
+# "s:IdProducto" dentro de los que no tienen (van al final, por IdProducto).
+
+def codificar_cursor(precio: Optional[Decimal], id_producto: int) -> str:
+    return f"s:{id_producto}" if precio is None else f"p:{precio}:{id_producto}"
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Optional[Decimal], int]:
+    try:
+        partes = cursor.split(":")
+        if partes[0] == "s" and len(partes) == 2:
+            return None, int(partes[1])
+        if partes[0] == "p" and len(partes) == 3:
+            return Decimal(partes[1]), int(partes[2])
+    except (ValueError, InvalidOperation):
+        pass
+    raise ValueError("Cursor inválido")
+
+
+async def pagina_por_precio_promedio(
+    db: AsyncSession, cursor: Optional[str] = None, limite: int = 100
+) -> Tuple[List[tuple], Optional[str]]:
+    """
+    Filas (Producto, PrecioProductoResumen o None) ordenadas por precio promedio
+    ascendente, los productos sin precios al final, y el cursor de la siguiente página.
+    """
+    con_precios, precio_cursor, id_cursor = True, None, 0
+    if cursor:
+        precio_cursor, id_cursor = decodificar_cursor(cursor)
+        con_precios = precio_cursor is not None
+    filas: List[tuple] = []
+
+    # 1. Productos con resumen, por el índice (PrecioPromedio, IdProducto)
+    if con_precios:
+        consulta = (
+            select(Producto, PrecioProductoResumen)
+            .join(PrecioProductoResumen, Producto.IdProducto == PrecioProductoResumen.IdProducto)
+            .order_by(PrecioProductoResumen.PrecioPromedio, PrecioProductoResumen.IdProducto)
+            .limit(limite + 1)
+        )
+        if precio_cursor is not None:
+            consulta = consulta.where(
+                tuple_(PrecioProductoResumen.PrecioPromedio, PrecioProductoResumen.IdProducto)
+                > tuple_(precio_cursor, id_cursor)
+            )
+        result = await db.execute(consulta)
+        filas = [tuple(fila) for fila in result.all()]
+        id_cursor = 0
+
+    # 2. Si la página no se llenó, siguen los productos sin precios
+    if len(filas) <= limite:
+        result = await db.execute(
+            select(Producto)
+            .where(
+                Producto.IdProducto > id_cursor,
+                ~exists().where(PrecioProductoResumen.IdProducto == Producto.IdProducto)
+            )
+            .order_by(Producto.IdProducto)
+            .limit(limite + 1 - len(filas))
+        )
+        filas += [(producto, None) for producto in result.scalars().all()]
+
+    # 3. Si sobró una fila hay página siguiente
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        producto, resumen = filas[-1]
+        siguiente = codificar_cursor(resumen.PrecioPromedio if resumen else None, producto.IdProducto)
+    return filas, siguiente
@@ -0,0 +1,128 @@
+# app/precios/sincronizacion.py
+"""
+Punto único de aviso de cambios de precios confirmados.
+
+Las rutas que escriben ProductoProveedor llaman a estas funciones después del
+commit, y cada estructura en memoria que depende de los precios (caché de
+sucursales cercanas, índice de mejor precio, matriz de precios, sustitutos,
+alertas, clientes SSE, ...) se actualiza aquí, no en cada ruta por separado.
+
+Los procesos fuera de la API (scripts/importar_precios.py) no tienen acceso a
+esa memoria: avisan con NOTIFY en CANAL_IMPORTACIONES y cada proceso de la API,
+que escucha ese canal con escuchar_importaciones, recarga lo que depende de
+los precios.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.catalogo.sustitutos import sustitutos_productos
+from app.database import engine
+from app.geo.cache import cache_cercanas
+from app.precios.alertas import indice_alertas
+from app.precios.difusion import hub_precios
+from app.precios.expiracion import planificador_ofertas
+from app.precios.matriz import matriz_precios
+from app.precios.mejor_precio import indice_mejor_precio
+
+
+logger = logging.getLogger(__name__)
+
+CANAL_IMPORTACIONES = "precios_importados"
+# Cada cuánto se comprueba que la conexión que escucha sigue viva
+ESPERA_ESCUCHA = 30
+
+
+def precio_guardado(relacion) -> None:
+    """Alta o modificación de un ProductoProveedor."""
+    indice_mejor_precio.actualizar(relacion)
+    matriz_precios.actualizar(relacion)
+    sustitutos_productos.actualizar_precio(relacion.IdProducto)
+    indice_alertas.evaluar_precio(relacion)
+    hub_precios.precio_guardado(relacion)
+    planificador_ofertas.programar(relacion)
+    cache_cercanas.invalidar()
+
+
+def precio_eliminado(id_producto: int, id_proveedor: int) -> None:
+    indice_mejor_precio.eliminar(id_producto, id_proveedor)
+    matriz_precios.eliminar(id_producto, id_proveedor)
+    sustitutos_productos.actualizar_precio(id_producto)
+    hub_precios.precio_eliminado(id_producto, id_proveedor)
+    cache_cercanas.invalidar()
+
+
+def producto_eliminado(id_producto: int) -> None:
+    indice_mejor_precio.eliminar_producto(id_producto)
+    matriz_precios.eliminar_producto(id_producto)
+    sustitutos_productos.eliminar_producto(id_producto)
+    indice_alertas.eliminar_producto(id_producto)
+    hub_precios.producto_eliminado(id_producto)
+    cache_cercanas.invalidar()
+
+
+def productos_fusionados(id_duplicado: int, relaciones) -> None:
+    """El duplicado se borró y sus precios y alertas pasaron al producto conservado."""
+    producto_eliminado(id_duplicado)
+    # Las alertas movidas no están en el índice bajo el conservado; sin índice,
+    # cada precio guardado deja su producto para revisar contra la tabla
+    indice_alertas.invalidar()
+    for relacion in relaciones:
+        precio_guardado(relacion)
+
+
+def proveedor_eliminado(id_proveedor: int) -> None:
+    indice_mejor_precio.eliminar_proveedor(id_proveedor)
+    matriz_precios.eliminar_proveedor(id_proveedor)
+    # Cambian los promedios de todo lo que vendía: se recalculan en la próxima consulta
+    sustitutos_productos.invalidar()
+    hub_precios.proveedor_eliminado(id_proveedor)
+    cache_cercanas.invalidar()
+
+
+def precios_importados() -> None:
+    """Cambios masivos: las estructuras se recargan completas en la próxima consulta."""
+    indice_mejor_precio.invalidar()
+    matriz_precios.invalidar()
+    sustitutos_productos.invalidar()
+    indice_alertas.revisar()
+    hub_precios.recarga()
+    planificador_ofertas.invalidar()
+    cache_cercanas.invalidar()
+
+
+def ofertas_vencidas(filas) -> None:
+    """Filas de ProductoProveedor a las que el planificador les quitó la oferta vencida."""
+    for fila in filas:
+        precio_guardado(fila)
+
+
+async def avisar_importacion(db: AsyncSession) -> None:
+    """NOTIFY para que los procesos de la API recarguen; llega cuando `db` hace commit."""
+    await db.execute(text("SELECT pg_notify(:canal, '')"), {"canal": CANAL_IMPORTACIONES})
+
+
+async def escuchar_importaciones() -> None:
+    """
+    Tarea en segundo plano: LISTEN en CANAL_IMPORTACIONES hasta que se cancela.
+    Si la conexión se cae se recarga todo igual (pudo perderse un aviso) y se
+    vuelve a conectar.
+    """
+    def al_avisar(conexion, pid, canal, carga):
+        precios_importados()
+
+    while True:
+        try:
+            async with engine.connect() as conexion:
+                escucha = (await conexion.get_raw_connection()).driver_connection
+                await escucha.add_listener(CANAL_IMPORTACIONES, al_avisar)
+                while not escucha.is_closed():
+                    await asyncio.sleep(ESPERA_ESCUCHA)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Se perdió la conexión que escucha %s", CANAL_IMPORTACIONES)
+        precios_importados()
+        await asyncio.sleep(ESPERA_ESCUCHA)
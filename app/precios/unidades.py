@@ -0,0 +1,97 @@
+# app/precios/unidades.py
+"""
+Precio por unidad base (kg, l o unidad) de cada ProductoProveedor.
+
+ConversionUnidad dice cuántas unidades base tiene cada UnidadMedida (gramo ->
+0.001 kg) y Producto.CantidadContenido cuántas UnidadMedida trae el empaque
+(500 g). Con eso PrecioUnidadBase = Precio / (CantidadContenido x Factor) se
+guarda en la propia fila de ProductoProveedor, junto a UnidadBase, y el índice
+(UnidadBase, PrecioUnidadBase) resuelve "lo más barato por kilo" sin cálculos
+en el cliente. Los productos cuya unidad no tiene conversión quedan en NULL.
+"""
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ConversionUnidad, Producto, ProductoProveedor
+
+
+UNIDADES_BASE = ("kg", "l", "unidad")
+TAMANO_TANDA = 1000
+
+
+async def recalcular_precio_unidad(db: AsyncSession, ids_productos: Iterable[int]) -> None:
+    """Recalcula UnidadBase y PrecioUnidadBase de los productos dados. Hace flush pero no commit."""
+    ids = sorted(set(ids_productos))
+    if not ids:
+        return
+
+    # La sesión no usa autoflush: los cambios pendientes deben llegar a la BD
+    await db.flush()
+
+    # Unidades base del empaque de cada producto, correlacionado con la fila a actualizar
+    unidades_empaque = (
+        select(ConversionUnidad.Factor * func.coalesce(Producto.CantidadContenido, 1))
+        .join(Producto, Producto.IdUnidadMedida == ConversionUnidad.IdUnidadMedida)
+        .where(Producto.IdProducto == ProductoProveedor.IdProducto)
+        .scalar_subquery()
+    )
+    unidad_base = (
+        select(ConversionUnidad.UnidadBase)
+        .join(Producto, Producto.IdUnidadMedida == ConversionUnidad.IdUnidadMedida)
+        .where(Producto.IdProducto == ProductoProveedor.IdProducto)
+        .scalar_subquery()
+    )
+
+    for inicio in range(0, len(ids), TAMANO_TANDA):
+        await db.execute(
+            update(ProductoProveedor)
+            .where(ProductoProveedor.IdProducto.in_(ids[inicio:inicio + TAMANO_TANDA]))
+            .values(
+                UnidadBase=unidad_base,
+                PrecioUnidadBase=func.round(ProductoProveedor.Precio / func.nullif(unidades_empaque, 0), 4)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def mas_baratos_por_unidad(
+    db: AsyncSession,
+    unidad_base: str,
+    id_categoria: Optional[int] = None,
+    id_proveedor: Optional[int] = None,
+    precio_unidad_max: Optional[Decimal] = None,
+    descendente: bool = False,
+    limite: int = 20
+) -> List[dict]:
+    """Ofertas de productos en `unidad_base` ordenadas por precio por unidad base."""
+    orden = ProductoProveedor.PrecioUnidadBase.desc() if descendente else ProductoProveedor.PrecioUnidadBase.asc()
+    stmt = (
+        select(
+            ProductoProveedor.IdProducto,
+            Producto.Nombre.label("NombreProducto"),
+            ProductoProveedor.IdProveedor,
+            ProductoProveedor.Precio,
+            Producto.CantidadContenido,
+            ProductoProveedor.UnidadBase,
+            ProductoProveedor.PrecioUnidadBase
+        )
+        .join(Producto, Producto.IdProducto == ProductoProveedor.IdProducto)
+        .where(
+            ProductoProveedor.UnidadBase == unidad_base,
+            ProductoProveedor.PrecioUnidadBase.isnot(None)
+        )
+        .order_by(orden, ProductoProveedor.IdProducto, ProductoProveedor.IdProveedor)
+        .limit(limite)
+    )
+    if id_categoria is not None:
+        stmt = stmt.where(Producto.IdCategoria == id_categoria)
+    if id_proveedor is not None:
+        stmt = stmt.where(ProductoProveedor.IdProveedor == id_proveedor)
+    if precio_unidad_max is not None:
+        stmt = stmt.where(ProductoProveedor.PrecioUnidadBase <= precio_unidad_max)
+
+    result = await db.execute(stmt)
+    return [dict(fila._mapping) for fila in result.all()]
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.orm import Session
+from typing import List, Annotated
+from app.models.models import AlertaPrecio, Usuario, Producto, ahora_local
+from app.schemas.alerta import AlertaPrecioCreate, AlertaPrecioResponse, AlertaPrecioUpdate
+from app.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.precios.alertas import indice_alertas
+
+
+
+router = APIRouter()
+
+async def get_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+#Crear una alerta de precio
+@router.post("/alertaprecio", response_model=AlertaPrecioResponse, status_code=status.HTTP_201_CREATED)
+async def crear_alerta(alertaParam: AlertaPrecioCreate, db: AsyncSession = Depends(get_db)):
+    # 1. Validar usuario y producto
+    if await db.get(Usuario, alertaParam.IdUsuario) is None:
+        raise HTTPException(status_code=400, detail="El usuario especificado no existe")
+    if await db.get(Producto, alertaParam.IdProducto) is None:
+        raise HTTPException(status_code=400, detail="El producto especificado no existe")
+
+    try:
+        # 2. Guardar la alerta
+        nueva_alerta = AlertaPrecio(
+            IdUsuario=alertaParam.IdUsuario,
+            IdProducto=alertaParam.IdProducto,
+            PrecioObjetivo=alertaParam.PrecioObjetivo,
+            Activa=True,
+            FechaCreacion=ahora_local()
+        )
+        db.add(nueva_alerta)
+        await db.commit()
+        await db.refresh(nueva_alerta)
+
+        # 3. Registrarla en el índice y revisar si el precio actual ya la cumple
+        indice_alertas.guardar(nueva_alerta.IdAlerta, nueva_alerta.IdProducto, nueva_alerta.PrecioObjetivo)
+        indice_alertas.revisar([nueva_alerta.IdProducto])
+
+        return nueva_alerta
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "Error al crear la alerta de precio", "details": str(e)}
+        )
+
+
+#Obtener las alertas de un usuario
+@router.get("/alertaprecio/usuario/{id_usuario}", response_model=List[AlertaPrecioResponse])
+async def obtener_alertas_usuario(id_usuario: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(AlertaPrecio)
+        .where(AlertaPrecio.IdUsuario == id_usuario)
+        .order_by(AlertaPrecio.Activa.desc(), AlertaPrecio.FechaCreacion.desc())
+    )
+    return result.scalars().all()
+
+
+#Cambiar el precio objetivo, reactivar o pausar una alerta
+@router.put("/alertaprecio/{id}", response_model=AlertaPrecioResponse)
+async def actualizar_alerta(id: int, alertaParam: AlertaPrecioUpdate, db: AsyncSession = Depends(get_db)):
+    alerta = await db.get(AlertaPrecio, id)
+    if alerta is None:
+        raise HTTPException(status_code=404, detail="No existe la alerta de precio")
+
+    update_data = alertaParam.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(alerta, field, value)
+
+    # Al reactivarla se limpia el disparo anterior
+    if update_data.get("Activa"):
+        alerta.FechaDisparo = None
+        alerta.PrecioDisparo = None
+        alerta.IdProveedorDisparo = None
+
+    await db.commit()
+    await db.refresh(alerta)
+
+    if alerta.Activa:
+        indice_alertas.guardar(alerta.IdAlerta, alerta.IdProducto, alerta.PrecioObjetivo)
+        indice_alertas.revisar([alerta.IdProducto])
+    else:
+        indice_alertas.eliminar(alerta.IdAlerta)
+
+    return alerta
+
+
+#Eliminar una alerta de precio
+@router.delete("/alertaprecio/{id}", response_model=AlertaPrecioResponse)
+async def eliminar_alerta(id: int, db: AsyncSession = Depends(get_db)):
+    alerta = await db.get(AlertaPrecio, id)
+    if alerta is None:
+        raise HTTPException(status_code=404, detail="No existe la alerta de precio")
+
+    await db.delete(alerta)
+    await db.commit()
+    indice_alertas.eliminar(id)
+
+    return alerta
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import Annotated
+from app.schemas.canasta import CanastaRequest, CanastaComparacionResponse
+from app.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.precios.matriz import matriz_precios
+import numpy as np
+
+
+router = APIRouter()
+
+async def get_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+# Comparar una lista de compras en todos los proveedores con una sola llamada
+@router.post("/canasta/comparar", response_model=CanastaComparacionResponse)
+async def comparar_canasta(datos: CanastaRequest, db: AsyncSession = Depends(get_db)):
+    # 1. Unificar productos repetidos sumando sus cantidades
+    cantidades_por_producto = {}
+    cantidades = datos.cantidades or [1] * len(datos.ids_productos)
+    for id_producto, cantidad in zip(datos.ids_productos, cantidades):
+        cantidades_por_producto[id_producto] = cantidades_por_producto.get(id_producto, 0) + cantidad
+    ids_productos = list(cantidades_por_producto)
+    cantidades = list(cantidades_por_producto.values())
+
+    # 2. Submatriz producto x proveedor desde la matriz de precios en memoria
+    await matriz_precios.asegurar_cargado(db)
+    ids_proveedores, centavos, disponible = matriz_precios.submatriz(ids_productos, datos.ids_proveedores)
+
+    # 3. Sin lista explícita, solo los proveedores que venden al menos un producto
+    if datos.ids_proveedores is None:
+        columnas = np.flatnonzero(disponible.any(axis=0))
+        ids_proveedores = [ids_proveedores[j] for j in columnas.tolist()]
+        centavos, disponible = centavos[:, columnas], disponible[:, columnas]
+
+    if not ids_proveedores or not disponible.any():
+        raise HTTPException(status_code=404, detail="Ningún proveedor vende estos productos")
+
+    # 4. Totales y faltantes por proveedor; ordenar columnas por (faltantes, total)
+    totales = np.asarray(cantidades, dtype=np.int64) @ centavos
+    faltantes = (~disponible).sum(axis=0)
+    orden = np.lexsort((totales, faltantes))
+
+    precios = np.where(disponible[:, orden], centavos[:, orden] / 100, np.nan)
+    return {
+        "IdsProveedores": [ids_proveedores[j] for j in orden.tolist()],
+        "IdsProductos": ids_productos,
+        "Cantidades": cantidades,
+        "Precios": [
+            [None if np.isnan(precio) else precio for precio in fila]
+            for fila in precios.tolist()
+        ],
+        "Totales": (totales[orden] / 100).tolist(),
+        "Faltantes": faltantes[orden].tolist()
+    }
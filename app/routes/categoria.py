@@ -2,11 +2,21 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List, Annotated
 from app.models.models import Categoria, Producto
-from app.schemas.categoria import CategoriaCreate, CategoriaResponse
+from app.schemas.categoria import CategoriaCreate, CategoriaResponse, SubcategoriaResponse
 from app.database import AsyncSessionLocal
 from sqlalchemy import select, delete
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.precios import sincronizacion
+from app.catalogo.autocompletado import autocompletado_productos
+from app.catalogo.categorias import (
+    CicloCategoriaError,
+    insertar_en_jerarquia,
+    mover_en_jerarquia,
+    quitar_de_jerarquia,
+    ruta_categoria,
+    subcategorias_con_conteo,
+)
 
 
 
@@ -22,6 +32,11 @@ async def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 
 
+async def _validar_padre(db: AsyncSession, id_padre):
+    if id_padre is not None and await db.get(Categoria, id_padre) is None:
+        raise HTTPException(status_code=404, detail="No existe la categoría padre")
+
+
 #Crear una nueva categoria
 @router.post("/categoria", response_model=CategoriaResponse)
 async def crear_categoria(
@@ -36,13 +51,16 @@ async def crear_categoria(
             raise ValueError("El nombre no puede estar vacío")
         if nombre_limpio.isdigit():
             raise ValueError("El nombre no puede ser solo números")
+        await _validar_padre(db, categoriaParams.IdCategoriaPadre)
 
         nueva_categoria = Categoria(
             NombreCategoria=nombre_limpio.title(),
+            IdCategoriaPadre=categoriaParams.IdCategoriaPadre,
             FechaCreacion=datetime.now().replace(tzinfo=None)  # <-- quita la zona horaria
         )
 
         db.add(nueva_categoria)
+        await insertar_en_jerarquia(db, nueva_categoria)
         await db.commit()
         await db.refresh(nueva_categoria)
         return nueva_categoria
@@ -58,6 +76,9 @@ async def crear_categoria(
                 "value": categoriaParams.NombreCategoria
             }
         )
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -96,6 +117,39 @@ async def obtener_categoria_por_id(id: int, db: AsyncSession = Depends(get_db)):
         return categoria
 
 
+#Obtener una categoria con todas sus subcategorias y la cantidad de productos de cada subarbol
+@router.get("/categoria/{id}/subcategorias", response_model=List[SubcategoriaResponse])
+async def obtener_subcategorias(id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(subcategorias_con_conteo(id))
+    filas = result.all()
+
+    if not filas:
+        raise HTTPException(status_code=404, detail="No existe la categoría")
+
+    return [
+        {
+            "IdCategoria": categoria.IdCategoria,
+            "NombreCategoria": categoria.NombreCategoria,
+            "IdCategoriaPadre": categoria.IdCategoriaPadre,
+            "FechaCreacion": categoria.FechaCreacion,
+            "Profundidad": profundidad,
+            "TotalProductos": total
+        }
+        for categoria, profundidad, total in filas
+    ]
+
+
+#Obtener los ancestros de una categoria, desde la raiz
+@router.get("/categoria/{id}/ruta", response_model=List[CategoriaResponse])
+async def obtener_ruta_categoria(id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(ruta_categoria(id))
+    ruta = result.scalars().all()
+
+    if not ruta:
+        raise HTTPException(status_code=404, detail="No existe la categoría")
+    return ruta
+
+
 #Actualizar unacategoria
 @router.put("/categoria/{id}", response_model=CategoriaResponse)
 async def actualizar_categoria(
@@ -114,6 +168,16 @@ async def actualizar_categoria(
         
         categoria.NombreCategoria = categoriaParams.NombreCategoria.strip().title()
 
+        # Solo se mueve si el cliente mandó el padre; omitirlo no la vuelve raíz
+        nuevo_padre = categoriaParams.IdCategoriaPadre
+        if "IdCategoriaPadre" in categoriaParams.model_fields_set and nuevo_padre != categoria.IdCategoriaPadre:
+            await _validar_padre(session, nuevo_padre)
+            try:
+                await mover_en_jerarquia(session, id, nuevo_padre)
+            except CicloCategoriaError as e:
+                await session.rollback()
+                raise HTTPException(status_code=400, detail=str(e))
+
         await session.commit()
         await session.refresh(categoria)
 
@@ -145,9 +209,17 @@ async def eliminar_categoria(id: int, db: AsyncSession = Depends(get_db)):
                 delete(Producto).where(Producto.IdCategoria == id)
             )
 
+        # Sus subcategorías pasan a colgar de su padre
+        await quitar_de_jerarquia(session, categoria)
+
         # Eliminar la categoría
         await session.delete(categoria)
         await session.commit()
 
+        # Sacar los productos borrados de las estructuras en memoria, como DELETE /producto/{id}
+        for producto in productos_relacionados:
+            sincronizacion.producto_eliminado(producto.IdProducto)
+            autocompletado_productos.eliminar(producto.IdProducto)
+
         return categoria
 
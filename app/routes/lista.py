@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
 from datetime import datetime
+from app.catalogo.autocompletado import autocompletado_productos
 
 
 
@@ -183,13 +184,18 @@ async def eliminar_lista(id: int, db: AsyncSession = Depends(get_db)):
 
     try:
         # Eliminar todos los productos relacionados con la lista
-        await db.execute(
-            delete(ListaProducto).where(ListaProducto.IdLista == id)
+        result_eliminados = await db.execute(
+            delete(ListaProducto)
+            .where(ListaProducto.IdLista == id)
+            .returning(ListaProducto.IdProducto)
         )
+        ids_productos = result_eliminados.scalars().all()
 
         # Luego eliminar la lista
         await db.delete(lista)
         await db.commit()
+        for id_producto in ids_productos:
+            autocompletado_productos.ajustar_popularidad(id_producto, -1)
 
         return lista
 
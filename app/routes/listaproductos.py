@@ -9,6 +9,7 @@ from sqlalchemy import func, extract, desc
 
 from sqlalchemy.future import select
 from app.models.models import Producto, ListaProducto, Lista, Proveedor, Sucursal, Categoria
+from app.catalogo.autocompletado import autocompletado_productos
 
 router = APIRouter()
 
@@ -33,6 +34,7 @@ async def crear_listaproducto(listaProductoParam: ListaProductoCreate, db: Async
     db.add(nueva_listaproducto)
     await db.commit()  # Esperar que la transacción se complete
     await db.refresh(nueva_listaproducto)  # Esperar que el objeto se actualice con los valores de la base de datos
+    autocompletado_productos.ajustar_popularidad(nueva_listaproducto.IdProducto, 1)
     return nueva_listaproducto
 
 # Obtener todos las listas de productos
@@ -144,6 +146,7 @@ async def eliminar_producto_lista(
     try:
         await db.delete(relacion)  # Asincrónico
         await db.commit()          # Asincrónico
+        autocompletado_productos.ajustar_popularidad(id_producto, -1)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     
     except Exception as e:
@@ -208,4 +211,6 @@ async def eliminar_productos_de_lista(
         await db.delete(producto)
 
     await db.commit()
+    for producto in productos:
+        autocompletado_productos.ajustar_popularidad(producto.IdProducto, -1)
 
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Annotated, Optional
+from datetime import datetime
+from app.models.models import PrecioCuarentena, ProductoProveedor, ahora_local
+from app.schemas.productoproveedor import PrecioCuarentenaResponse
+from app.database import AsyncSessionLocal
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.precios import sincronizacion
+from app.precios.historial import registrar_precio
+from app.precios.resumen import recalcular_resumen
+from app.precios.unidades import recalcular_precio_unidad
+
+
+
+router = APIRouter()
+
+async def get_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+async def _obtener_pendiente(db: AsyncSession, id: int) -> PrecioCuarentena:
+    cuarentena = await db.get(PrecioCuarentena, id)
+    if cuarentena is None:
+        raise HTTPException(status_code=404, detail="No existe ese precio en cuarentena")
+    if cuarentena.Estado != "pendiente":
+        raise HTTPException(status_code=409, detail=f"El precio ya fue {cuarentena.Estado}")
+    return cuarentena
+
+
+# Precios retenidos por anómalos, los más recientes primero
+@router.get("/preciocuarentena", response_model=List[PrecioCuarentenaResponse])
+async def obtener_precios_cuarentena(
+    estado: str = Query("pendiente", pattern="^(pendiente|aprobado|rechazado)$"),
+    id_proveedor: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    consulta = select(PrecioCuarentena).where(PrecioCuarentena.Estado == estado)
+    if id_proveedor is not None:
+        consulta = consulta.where(PrecioCuarentena.IdProveedor == id_proveedor)
+    result = await db.execute(consulta.order_by(PrecioCuarentena.FechaCreacion.desc()).limit(limite))
+    return result.scalars().all()
+
+
+# Aprobar un precio retenido: se publica en ProductoProveedor como cualquier otro
+@router.post("/preciocuarentena/{id}/aprobar", response_model=PrecioCuarentenaResponse)
+async def aprobar_precio_cuarentena(id: int, db: AsyncSession = Depends(get_db)):
+    cuarentena = await _obtener_pendiente(db, id)
+
+    try:
+        # 1. Crear o actualizar la relación con los datos retenidos
+        relacion = await db.get(ProductoProveedor, (cuarentena.IdProducto, cuarentena.IdProveedor))
+        if relacion is None:
+            relacion = ProductoProveedor(IdProducto=cuarentena.IdProducto, IdProveedor=cuarentena.IdProveedor)
+            db.add(relacion)
+        relacion.Precio = cuarentena.Precio
+        relacion.FechaPrecio = cuarentena.FechaPrecio
+        # Una oferta que terminó mientras esperaba la revisión se publica sin oferta
+        if cuarentena.FechaOferta is not None and cuarentena.FechaOferta <= ahora_local():
+            relacion.PrecioOferta = None
+            relacion.DescripcionOferta = "No habia oferta"
+            relacion.FechaOferta = None
+        else:
+            relacion.PrecioOferta = cuarentena.PrecioOferta
+            relacion.DescripcionOferta = cuarentena.DescripcionOferta or "No habia oferta"
+            relacion.FechaOferta = cuarentena.FechaOferta
+
+        # 2. Historial, resumen y precio por unidad, igual que una escritura normal
+        registrar_precio(db, relacion)
+        await recalcular_resumen(db, [cuarentena.IdProducto])
+        await recalcular_precio_unidad(db, [cuarentena.IdProducto])
+
+        # 3. Marcar como revisado y confirmar
+        cuarentena.Estado = "aprobado"
+        cuarentena.FechaRevision = datetime.now()
+        await db.commit()
+        await db.refresh(relacion)
+        sincronizacion.precio_guardado(relacion)
+        return cuarentena
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "Error al aprobar el precio", "details": str(e)}
+        )
+
+
+# Rechazar un precio retenido: queda como registro y no se publica
+@router.post("/preciocuarentena/{id}/rechazar", response_model=PrecioCuarentenaResponse)
+async def rechazar_precio_cuarentena(id: int, db: AsyncSession = Depends(get_db)):
+    cuarentena = await _obtener_pendiente(db, id)
+    cuarentena.Estado = "rechazado"
+    cuarentena.FechaRevision = datetime.now()
+    await db.commit()
+    return cuarentena
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Annotated
-from app.models.models import Producto, Categoria, UnidadMedida, Proveedor, ProductoProveedor, ListaProducto
-from app.schemas.producto import ProductoCreate, ProductoResponse, ProductoUpdate, BigProductoProveedorResponse, ProductoConPrecioPromedioResponse, ProductoPrecioProveedorResponse
+from app.models.models import Producto, Categoria, UnidadMedida, Proveedor, ProductoProveedor, ListaProducto, PrecioProductoResumen
+from app.schemas.producto import ProductoCreate, ProductoResponse, ProductoUpdate, BigProductoProveedorResponse, ProductoConPrecioPromedioResponse, PaginaProductoPrecioPromedioResponse, ProductoPrecioProveedorResponse, PaginaBusquedaProductoResponse, AutocompletadoProductoResponse, MejorPrecioProductoResponse, MejorPrecioRequest, SustitutoProductoResponse
 from sqlalchemy import select, func
 from typing import List
 from sqlalchemy.orm import joinedload
@@ -15,6 +15,16 @@ from datetime import datetime
 from sqlalchemy import delete  
 
 from sqlalchemy import or_
+from app.precios import sincronizacion
+from app.precios.mejor_precio import indice_mejor_precio
+from app.precios.resumen import recalcular_resumen, pagina_por_precio_promedio
+from app.precios.unidades import recalcular_precio_unidad
+from app.catalogo.busqueda import buscar_productos
+from app.catalogo.autocompletado import autocompletado_productos
+from app.catalogo.sustitutos import sustitutos_productos
+from app.catalogo.categorias import productos_del_subarbol
+from decimal import Decimal
+from typing import Optional
 
 
 router = APIRouter()
@@ -59,6 +69,7 @@ async def crear_producto(productoParam: ProductoCreate, db: Session = Depends(ge
             Nombre = productoParam.Nombre,
             UrlImagen = productoParam.UrlImagen,
             Descripcion = productoParam.Descripcion,
+            CantidadContenido = productoParam.CantidadContenido,
             FechaCreacion=datetime.now().replace(tzinfo=None)
             
         )
@@ -67,6 +78,11 @@ async def crear_producto(productoParam: ProductoCreate, db: Session = Depends(ge
         db.add(nuevo_producto)
         await db.commit()  # Usamos commit asincrónico
         await db.refresh(nuevo_producto)  # Refrescar para obtener el objeto actualizado
+        autocompletado_productos.actualizar(nuevo_producto.IdProducto, nuevo_producto.Nombre)
+        sustitutos_productos.actualizar_producto(
+            nuevo_producto.IdProducto, nuevo_producto.IdCategoria,
+            nuevo_producto.IdUnidadMedida, nuevo_producto.CantidadContenido
+        )
 
         return nuevo_producto
 
@@ -90,46 +106,93 @@ async def obtener_productos(db: AsyncSession = Depends(get_db)):
     
     return productos
 
+def _con_precio_promedio(producto, resumen) -> ProductoConPrecioPromedioResponse:
+    return ProductoConPrecioPromedioResponse(
+        IdProducto=producto.IdProducto,
+        IdCategoria=producto.IdCategoria,
+        IdUnidadMedida=producto.IdUnidadMedida,
+        Nombre=producto.Nombre,
+        UrlImagen=producto.UrlImagen,
+        Descripcion=producto.Descripcion,
+        FechaCreacion=producto.FechaCreacion,
+        PrecioPromedio=float(resumen.PrecioPromedio) if resumen else None,
+        PrecioMinimo=float(resumen.PrecioMinimo) if resumen else None,
+        PrecioMaximo=float(resumen.PrecioMaximo) if resumen else None,
+        CantidadProveedores=resumen.CantidadProveedores if resumen else 0
+    )
+
 # Obtener todos los productos   
 @router.get("/productoavg", response_model=List[ProductoConPrecioPromedioResponse])
 async def obtener_productos(db: AsyncSession = Depends(get_db)):
-    # Subconsulta: promedio de precios por producto
-    subquery = (
-        select(
-            ProductoProveedor.IdProducto,
-            func.avg(ProductoProveedor.Precio).label("precio_promedio")
-        )
-        .group_by(ProductoProveedor.IdProducto)
-        .subquery()
-    )
-
-    # Consulta principal: unir Producto con promedio, ordenar por precio_promedio ascendente
+    # Unir Producto con su resumen de precios (mantenido al escribir ProductoProveedor)
+    # y ordenar por precio promedio ascendente usando el índice del resumen
     stmt = (
-        select(
-            Producto,
-            subquery.c.precio_promedio
-        )
-        .outerjoin(subquery, Producto.IdProducto == subquery.c.IdProducto)
-        .order_by(asc(subquery.c.precio_promedio))
+        select(Producto, PrecioProductoResumen)
+        .outerjoin(PrecioProductoResumen, Producto.IdProducto == PrecioProductoResumen.IdProducto)
+        .order_by(asc(PrecioProductoResumen.PrecioPromedio), Producto.IdProducto)
     )
 
     result = await db.execute(stmt)
     filas = result.all()
 
-    respuesta = []
-    for producto, precio_promedio in filas:
-        respuesta.append(ProductoConPrecioPromedioResponse(
-            IdProducto=producto.IdProducto,
-            IdCategoria=producto.IdCategoria,
-            IdUnidadMedida=producto.IdUnidadMedida,
-            Nombre=producto.Nombre,
-            UrlImagen=producto.UrlImagen,
-            Descripcion=producto.Descripcion,
-            FechaCreacion=producto.FechaCreacion,
-            PrecioPromedio=float(precio_promedio) if precio_promedio is not None else None
-        ))
+    return [_con_precio_promedio(producto, resumen) for producto, resumen in filas]
 
-    return respuesta
+
+# Lo mismo que /productoavg, paginado por cursor sobre el índice del resumen
+@router.get("/productoavg/pagina", response_model=PaginaProductoPrecioPromedioResponse)
+async def obtener_productos_pagina(
+    cursor: Optional[str] = None,
+    limite: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        filas, siguiente = await pagina_por_precio_promedio(db, cursor, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "Productos": [_con_precio_promedio(producto, resumen) for producto, resumen in filas],
+        "SiguienteCursor": siguiente
+    }
+
+
+# Sugerencias de nombres de producto mientras se escribe, servidas desde memoria.
+# Debe declararse antes de /producto/{id}
+@router.get("/producto/autocompletar", response_model=List[AutocompletadoProductoResponse])
+async def autocompletar_producto(
+    q: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    await autocompletado_productos.asegurar_cargado(db)
+    return autocompletado_productos.sugerir(q, limite)
+
+
+# Buscar productos por nombre o descripción (sin distinguir acentos ni mayúsculas).
+# Debe declararse antes de /producto/{id}
+@router.get("/producto/buscar", response_model=PaginaBusquedaProductoResponse)
+async def buscar_producto(
+    q: str = Query(..., min_length=2, max_length=100),
+    id_categoria: Optional[int] = None,
+    precio_min: Optional[Decimal] = Query(None, ge=0),
+    precio_max: Optional[Decimal] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limite: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    # 1. Validar parámetros
+    if precio_min is not None and precio_max is not None and precio_min > precio_max:
+        raise HTTPException(status_code=400, detail="precio_min no puede ser mayor que precio_max")
+
+    # 2. Buscar la página pedida
+    try:
+        productos, siguiente = await buscar_productos(
+            db, q.strip(), id_categoria, precio_min, precio_max, cursor, limite
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    return {"Productos": productos, "SiguienteCursor": siguiente}
 
 
 # Obtener un producto por su id
@@ -149,6 +212,49 @@ async def obtener_producto_por_id(id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al obtener el producto: {str(e)}")
 
 
+# Proveedores más baratos de un producto, teniendo en cuenta las ofertas vigentes
+@router.get("/producto/{id}/mejor-precio", response_model=MejorPrecioProductoResponse)
+async def obtener_mejor_precio(
+    id: int,
+    n: int = Query(1, ge=1, le=20),
+    db: AsyncSession = Depends(get_db)
+):
+    await indice_mejor_precio.asegurar_cargado(db)
+    proveedores = indice_mejor_precio.mejores(id, n)
+
+    if not proveedores:
+        raise HTTPException(status_code=404, detail="No hay precios para este producto")
+
+    return {"IdProducto": id, "Proveedores": proveedores}
+
+
+# Mejor precio de varios productos en una sola llamada; omite los que no tienen precios
+@router.post("/producto/mejor-precio", response_model=List[MejorPrecioProductoResponse])
+async def obtener_mejores_precios(datos: MejorPrecioRequest, db: AsyncSession = Depends(get_db)):
+    await indice_mejor_precio.asegurar_cargado(db)
+
+    respuesta = []
+    for id_producto in dict.fromkeys(datos.ids_productos):
+        proveedores = indice_mejor_precio.mejores(id_producto, datos.n)
+        if proveedores:
+            respuesta.append({"IdProducto": id_producto, "Proveedores": proveedores})
+
+    return respuesta
+
+
+# Productos de la misma categoría y unidad compatible con el precio por unidad más parecido
+@router.get("/producto/{id}/sustitutos", response_model=List[SustitutoProductoResponse])
+async def obtener_sustitutos(
+    id: int,
+    n: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    await sustitutos_productos.asegurar_cargado(db)
+    if id not in sustitutos_productos:
+        raise HTTPException(status_code=404, detail="No existe el producto")
+    return sustitutos_productos.sustitutos(id, n)
+
+
 # Obtener productos por tipo de proveedor
 
 @router.get("/productotipoproveedor/{id}", response_model=list[ProductoResponse])
@@ -210,8 +316,10 @@ async def actualizar_producto(
         )
     
     try:
-        # 2. Obtener solo los campos proporcionados
+        # 2. Obtener solo los campos proporcionados (NombreProducto es la columna Nombre)
         update_data = productoParam.model_dump(exclude_unset=True)
+        if "NombreProducto" in update_data:
+            update_data["Nombre"] = update_data.pop("NombreProducto")
         
         # 3. Validaciones específicas asincrónicas
         if "IdCategoria" in update_data:
@@ -227,9 +335,20 @@ async def actualizar_producto(
         # 4. Aplicar actualizaciones
         for field, value in update_data.items():
             setattr(producto, field, value)
+
+        # 5. Si cambió el empaque, recalcular el precio por unidad base de sus precios
+        if "IdUnidadMedida" in update_data or "CantidadContenido" in update_data:
+            await recalcular_precio_unidad(db, [id])
         
         await db.commit()
         await db.refresh(producto)
+        if "Nombre" in update_data:
+            autocompletado_productos.actualizar(producto.IdProducto, producto.Nombre)
+        if update_data.keys() & {"IdCategoria", "IdUnidadMedida", "CantidadContenido"}:
+            sustitutos_productos.actualizar_producto(
+                producto.IdProducto, producto.IdCategoria,
+                producto.IdUnidadMedida, producto.CantidadContenido
+            )
         return producto
 
     except ValueError as ve:
@@ -264,10 +383,11 @@ async def eliminar_producto(id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="No existe el producto")
 
     try:
-        # 1. Eliminar relaciones con proveedores
+        # 1. Eliminar relaciones con proveedores y su resumen de precios
         await db.execute(
             delete(ProductoProveedor).where(ProductoProveedor.IdProducto == id)
         )
+        await recalcular_resumen(db, [id])
 
         # 2. Eliminar relaciones en ListaProducto
         await db.execute(
@@ -279,6 +399,8 @@ async def eliminar_producto(id: int, db: AsyncSession = Depends(get_db)):
 
         # 4. Confirmar
         await db.commit()
+        sincronizacion.producto_eliminado(id)
+        autocompletado_productos.eliminar(id)
 
         return producto
 
@@ -292,9 +414,16 @@ async def eliminar_producto(id: int, db: AsyncSession = Depends(get_db)):
 
 # Obtener productos por categoria
 @router.get("/productocategoria/{id}", response_model=List[ProductoResponse])
-async def obtener_productos_por_categoria(id: int, db: AsyncSession = Depends(get_db)):
+async def obtener_productos_por_categoria(
+    id: int,
+    subcategorias: bool = Query(False, description="Incluir los productos de todas las subcategorías"),
+    db: AsyncSession = Depends(get_db)
+):
     # Realizar la consulta asincrónica para obtener los productos
-    result = await db.execute(select(Producto).where(Producto.IdCategoria == id))
+    if subcategorias:
+        result = await db.execute(productos_del_subarbol(id))
+    else:
+        result = await db.execute(select(Producto).where(Producto.IdCategoria == id))
     productos = result.scalars().all()  # Obtener todos los productos de la categoría
     
     if not productos:
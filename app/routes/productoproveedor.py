@@ -1,13 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Response
+from fastapi import APIRouter, HTTPException, Depends, status, Response, Query, UploadFile, File, Form, Request, Header
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from typing import List, Annotated
+from typing import List, Annotated, Optional
+import asyncio
+from datetime import datetime
+from decimal import Decimal
 from app.models.models import ProductoProveedor, Producto, Proveedor
-from app.schemas.productoproveedor import ProductoProveedorCreate, ProductoProveedorResponse, ProductoProveedorUpdate
+from app.schemas.productoproveedor import ProductoProveedorCreate, ProductoProveedorResponse, ProductoProveedorUpdate, SeriePrecioResponse, ImportacionPreciosResponse, PrecioUnidadBaseResponse, PrecioCuarentenaResponse
 from app.database import AsyncSessionLocal
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.precios import sincronizacion
+from app.precios.resumen import recalcular_resumen
+from app.precios.unidades import recalcular_precio_unidad, mas_baratos_por_unidad, UNIDADES_BASE
+from app.precios.historial import registrar_precio, serie_precios
+from app.precios.importacion import importar_precios
+from app.precios.difusion import hub_precios, formatear_sse
+from app.precios.anomalias import retener_si_anomalo
 
 
+# Cada cuánto se manda un comentario para que proxies y clientes no cierren la conexión
+INTERVALO_LATIDO = 15
 
 router = APIRouter()
 
@@ -21,9 +35,14 @@ async def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 
 #Crear un nueva unidad de medida
-@router.post("/productoproveedor", response_model=ProductoProveedorResponse)
+@router.post(
+    "/productoproveedor",
+    response_model=ProductoProveedorResponse,
+    responses={202: {"model": PrecioCuarentenaResponse, "description": "Precio anómalo retenido en cuarentena"}}
+)
 async def crear_listaproducto(
     productoproveedorParam: ProductoProveedorCreate, 
+    forzar: bool = Query(False),  # Guardar aunque el precio parezca anómalo
     db: AsyncSession = Depends(get_db)
 ):
     # 1. Validar que el producto exista
@@ -48,7 +67,13 @@ async def crear_listaproducto(
             detail="Proveedor no encontrado"
         )
 
-    # 3. Crear el nuevo producto proveedor
+    # 3. Un precio anómalo no se publica: queda en cuarentena hasta que se revise
+    if not forzar:
+        cuarentena = await retener_si_anomalo(db, productoproveedorParam.model_dump())
+        if cuarentena is not None:
+            return await _responder_cuarentena(db, cuarentena)
+
+    # 4. Crear el nuevo producto proveedor
     nuevo_productoproveedor = ProductoProveedor(
         IdProducto=productoproveedorParam.IdProducto,
         IdProveedor=productoproveedorParam.IdProveedor,
@@ -59,15 +84,111 @@ async def crear_listaproducto(
         FechaPrecio=productoproveedorParam.FechaPrecio,
     )
 
-    # 4. Guardar en la base de datos
+    # 5. Guardar en la base de datos junto con el resumen de precios del producto
     db.add(nuevo_productoproveedor)
+    registrar_precio(db, nuevo_productoproveedor)
+    await recalcular_resumen(db, [nuevo_productoproveedor.IdProducto])
+    await recalcular_precio_unidad(db, [nuevo_productoproveedor.IdProducto])
     await db.commit()
     await db.refresh(nuevo_productoproveedor)
+    sincronizacion.precio_guardado(nuevo_productoproveedor)
 
-    # 5. Retornar el nuevo registro
+    # 6. Retornar el nuevo registro
     return nuevo_productoproveedor
 
 
+async def _responder_cuarentena(db: AsyncSession, cuarentena) -> JSONResponse:
+    await db.commit()
+    await db.refresh(cuarentena)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(PrecioCuarentenaResponse.model_validate(cuarentena))
+    )
+
+
+# Importar una hoja de precios (CSV o XLSX) de una sola vez
+@router.post("/productoproveedor/importar", response_model=ImportacionPreciosResponse)
+async def importar_productoproveedor(
+    archivo: UploadFile = File(...),
+    id_proveedor: Optional[int] = Form(None),  # Si la hoja no trae la columna IdProveedor
+    revisar_anomalias: bool = Form(True),  # Retener en cuarentena los precios anómalos
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        # 1. Validar, copiar y volcar las filas en una sola transacción
+        resultado = await importar_precios(
+            db, archivo.file, archivo.filename or "", id_proveedor, revisar_anomalias=revisar_anomalias
+        )
+
+    except LookupError as le:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=str(le))
+    except ValueError as ve:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "Error al importar precios", "details": str(e)}
+        )
+
+    # 2. Las estructuras en memoria que dependen de los precios se recargan
+    if resultado["Insertados"] or resultado["Actualizados"]:
+        sincronizacion.precios_importados()
+
+    return resultado
+
+
+# Precios ordenados por precio por kg / l / unidad ("lo más barato por kilo")
+@router.get("/productoproveedor/precio-unidad", response_model=List[PrecioUnidadBaseResponse])
+async def obtener_precios_por_unidad(
+    unidad_base: str = Query(..., pattern="^(" + "|".join(UNIDADES_BASE) + ")$"),
+    id_categoria: Optional[int] = None,
+    id_proveedor: Optional[int] = None,
+    precio_unidad_max: Optional[Decimal] = Query(None, gt=0),
+    descendente: bool = False,
+    limite: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    precios = await mas_baratos_por_unidad(
+        db, unidad_base, id_categoria, id_proveedor, precio_unidad_max, descendente, limite
+    )
+    if not precios:
+        raise HTTPException(status_code=404, detail="No hay precios con esa unidad")
+    return precios
+
+
+#Cambios de precios en vivo (server-sent events), opcionalmente filtrados por producto o proveedor
+@router.get("/productoproveedor/stream")
+async def stream_precios(
+    request: Request,
+    productos: Optional[List[int]] = Query(None),
+    proveedores: Optional[List[int]] = Query(None),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    suscripcion = hub_precios.suscribir(productos, proveedores, last_event_id)
+
+    async def eventos():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    id_evento, evento = await asyncio.wait_for(suscripcion.cola.get(), INTERVALO_LATIDO)
+                except asyncio.TimeoutError:
+                    yield ": latido\n\n"
+                    continue
+                yield formatear_sse(id_evento, evento)
+        finally:
+            hub_precios.desuscribir(suscripcion)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # Obtener todos los productos
 @router.get("/productoproveedor", response_model=List[ProductoProveedorResponse])
 async def obtener_productoproveedor(db: AsyncSession = Depends(get_db)):
@@ -105,11 +226,16 @@ async def obtener_productoproveedor_por_id(id_producto: int, id_proveedor: int,
 
 
 #actualizar un productoproveedor
-@router.put("/productos/{id_producto}/proveedores/{id_proveedor}", response_model=ProductoProveedorResponse)
+@router.put(
+    "/productos/{id_producto}/proveedores/{id_proveedor}",
+    response_model=ProductoProveedorResponse,
+    responses={202: {"model": PrecioCuarentenaResponse, "description": "Precio anómalo retenido en cuarentena"}}
+)
 async def actualizar_producto_proveedor(
     id_producto: int,
     id_proveedor: int,
     datos: ProductoProveedorUpdate,
+    forzar: bool = Query(False),  # Guardar aunque el precio parezca anómalo
     db: AsyncSession = Depends(get_db)
 ):
     # 1. Validar que el producto exista
@@ -152,13 +278,34 @@ async def actualizar_producto_proveedor(
     try:
         # 4. Validar y procesar datos
         update_data = datos.model_dump(exclude_unset=True)
+        precio_anterior = (relacion.Precio, relacion.PrecioOferta)
+
+        # Un precio u oferta nuevos anómalos quedan en cuarentena y la relación no cambia
+        cambia_precio = update_data.get("Precio") is not None and update_data["Precio"] != relacion.Precio
+        cambia_oferta = "PrecioOferta" in update_data and update_data["PrecioOferta"] != relacion.PrecioOferta
+        if (cambia_precio or cambia_oferta) and not forzar:
+            propuesta = {
+                campo: getattr(relacion, campo)
+                for campo in ("IdProducto", "IdProveedor", "Precio", "PrecioOferta", "DescripcionOferta", "FechaOferta")
+            }
+            propuesta.update({campo: valor for campo, valor in update_data.items() if valor is not None or campo != "Precio"})
+            cuarentena = await retener_si_anomalo(db, propuesta)
+            if cuarentena is not None:
+                return await _responder_cuarentena(db, cuarentena)
 
         for campo, valor in update_data.items():
             setattr(relacion, campo, valor)
 
-        # 5. Aplicar la actualización
+        # 5. Aplicar la actualización; si cambió el precio, guardarlo en el historial
+        #    y recalcular el resumen de precios
+        if (relacion.Precio, relacion.PrecioOferta) != precio_anterior:
+            registrar_precio(db, relacion)
+        if "Precio" in update_data:
+            await recalcular_resumen(db, [id_producto])
+            await recalcular_precio_unidad(db, [id_producto])
         await db.commit()
         await db.refresh(relacion)
+        sincronizacion.precio_guardado(relacion)
         return relacion
 
     except ValueError as ve:
@@ -174,6 +321,30 @@ async def actualizar_producto_proveedor(
             detail="Error interno del servidor"
         )
 
+# Serie histórica de precios de un producto, agregada por día, semana o mes
+@router.get("/productos/{id_producto}/historial-precios", response_model=List[SeriePrecioResponse])
+async def obtener_historial_precios(
+    id_producto: int,
+    id_proveedor: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    intervalo: str = Query("dia", pattern="^(dia|semana|mes)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    # 1. Validar el rango de fechas
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+
+    # 2. Agregar el historial en la base de datos
+    serie = await serie_precios(db, id_producto, id_proveedor, desde, hasta, intervalo)
+
+    # 3. Validar si no hay registros en el rango
+    if not serie:
+        raise HTTPException(status_code=404, detail="No hay historial de precios para este producto")
+
+    return serie
+
+
 #Eliminar un producto de un proveedor
 @router.delete(
     "/productos/{id_producto}/proveedores/{id_proveedor}",
@@ -225,9 +396,11 @@ async def eliminar_producto_proveedor(
                 detail="Producto o Proveedor no encontrado"
             )
 
-        # Eliminar la relación
+        # Eliminar la relación y recalcular el resumen de precios
         await db.delete(relacion)
+        await recalcular_resumen(db, [id_producto])
         await db.commit()
+        sincronizacion.precio_eliminado(id_producto, id_proveedor)
 
         # Retornar la información del Producto y Proveedor eliminados
         return {
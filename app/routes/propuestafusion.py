@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Annotated
+from datetime import datetime
+from app.models.models import Producto, PropuestaFusionProducto
+from app.schemas.producto import (
+    PropuestaFusionProductoResponse,
+    GeneracionPropuestasResponse,
+    FusionProductoResponse,
+)
+from app.database import AsyncSessionLocal
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.precios import sincronizacion
+from app.catalogo.autocompletado import autocompletado_productos
+from app.catalogo.deduplicacion import UMBRAL_FUSION, fusionar, generar_propuestas, precios_de
+
+
+
+router = APIRouter()
+
+async def get_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+async def _obtener_pendiente(db: AsyncSession, id: int) -> PropuestaFusionProducto:
+    propuesta = await db.get(PropuestaFusionProducto, id)
+    if propuesta is None:
+        raise HTTPException(status_code=404, detail="No existe la propuesta de fusión")
+    if propuesta.Estado != "pendiente":
+        raise HTTPException(status_code=409, detail=f"La propuesta ya fue {propuesta.Estado}")
+    return propuesta
+
+
+# Recalcular las propuestas sobre todo el catálogo
+@router.post("/propuestafusion/generar", response_model=GeneracionPropuestasResponse)
+async def generar_propuestas_fusion(
+    umbral: float = Query(UMBRAL_FUSION, ge=0.5, le=1),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        cantidad = await generar_propuestas(db, umbral)
+        await db.commit()
+        return {"Propuestas": cantidad}
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "Error al generar propuestas de fusión", "details": str(e)}
+        )
+
+
+# Propuestas por estado, las de mayor puntaje primero
+@router.get("/propuestafusion", response_model=List[PropuestaFusionProductoResponse])
+async def obtener_propuestas_fusion(
+    estado: str = Query("pendiente", pattern="^(pendiente|aplicada|descartada)$"),
+    limite: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(
+        select(PropuestaFusionProducto)
+        .where(PropuestaFusionProducto.Estado == estado)
+        .order_by(PropuestaFusionProducto.Puntaje.desc(), PropuestaFusionProducto.IdPropuesta)
+        .limit(limite)
+    )
+    return result.scalars().all()
+
+
+# Fusionar: precios, listas, historial y alertas pasan al producto conservado
+@router.post("/propuestafusion/{id}/aplicar", response_model=FusionProductoResponse)
+async def aplicar_propuesta_fusion(id: int, db: AsyncSession = Depends(get_db)):
+    propuesta = await _obtener_pendiente(db, id)
+
+    # 1. Ambos productos deben seguir existiendo
+    for id_producto in (propuesta.IdProductoConservar, propuesta.IdProductoDuplicado):
+        if await db.get(Producto, id_producto) is None:
+            raise HTTPException(status_code=409, detail=f"El producto {id_producto} ya no existe")
+
+    try:
+        # 2. Mover todo al conservado y borrar el duplicado
+        movidas = await fusionar(db, propuesta)
+        await db.commit()
+
+        # 3. Estructuras en memoria
+        relaciones = await precios_de(db, propuesta.IdProductoConservar)
+        sincronizacion.productos_fusionados(propuesta.IdProductoDuplicado, relaciones)
+        autocompletado_productos.eliminar(propuesta.IdProductoDuplicado)
+        autocompletado_productos.ajustar_popularidad(propuesta.IdProductoConservar, movidas["ListaProducto"])
+
+        await db.refresh(propuesta)
+        return {"Propuesta": propuesta, "FilasMovidas": movidas}
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "Error al fusionar productos", "details": str(e)}
+        )
+
+
+# Descartar: el par no se vuelve a proponer
+@router.post("/propuestafusion/{id}/descartar", response_model=PropuestaFusionProductoResponse)
+async def descartar_propuesta_fusion(id: int, db: AsyncSession = Depends(get_db)):
+    propuesta = await _obtener_pendiente(db, id)
+    propuesta.Estado = "descartada"
+    propuesta.FechaRevision = datetime.now()
+    await db.commit()
+    return propuesta
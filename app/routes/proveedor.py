@@ -8,6 +8,8 @@ from sqlalchemy import delete
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+from app.precios import sincronizacion
+from app.precios.resumen import recalcular_resumen
 
 
 
@@ -199,13 +201,17 @@ async def eliminar_proveedor(id: int, db: AsyncSession = Depends(get_db)):
         
         try:
             # Eliminar relaciones en ProductoProveedor
-            await session.execute(
-                delete(ProductoProveedor).where(ProductoProveedor.IdProveedor == id)
+            result_eliminados = await session.execute(
+                delete(ProductoProveedor)
+                .where(ProductoProveedor.IdProveedor == id)
+                .returning(ProductoProveedor.IdProducto)
             )
+            await recalcular_resumen(session, result_eliminados.scalars().all())
             
             # Ahora eliminar el proveedor
             await session.delete(proveedor)
             await session.commit()
+            sincronizacion.proveedor_eliminado(id)
 
             return proveedor
         
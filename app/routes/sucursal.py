@@ -2,14 +2,21 @@ from fastapi import APIRouter, HTTPException, Depends, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Annotated
 from app.models.models import Sucursal, Proveedor, ProductoProveedor
-from app.schemas.sucursal import SucursalCreate, SucursalResponse, SucursalUpdate, UbicacionProductoRequest, ProductoSucursalResponse, RutaProveedoresRequest
+from app.schemas.sucursal import SucursalCreate, SucursalResponse, SucursalUpdate, UbicacionProductoRequest, ProductoSucursalResponse, RutaProveedoresRequest, ClusterSucursalResponse
 from app.database import AsyncSessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import datetime
 from sqlalchemy import func
-from geopy.distance import geodesic
 from decimal import Decimal
+from app.geo.indice import indice_sucursales, parsear_coordenada
+from app.geo.busqueda import mas_cercana_por_proveedor
+from app.geo.distancia import geodesica_km
+from app.geo.ruta import planificar_ruta
+from app.geo.cache import cache_cercanas
+from app.precios.matriz import matriz_precios
+from app.catalogo.sustitutos import sustitutos_productos
+from app.geo.clusters import ZOOM_MAX_CLUSTER
 
 
 
@@ -72,11 +79,15 @@ async def crear_sucursal(sucursal: SucursalCreate, db: AsyncSession = Depends(ge
             NombreSucursal=sucursal.NombreSucursal,
             Latitud=sucursal.latitud,
             Longitud=sucursal.longitud,
+            LatitudNum=parsear_coordenada(sucursal.latitud, 90.0),
+            LongitudNum=parsear_coordenada(sucursal.longitud, 180.0),
             FechaCreacion=datetime.now().replace(tzinfo=None)
         )
         db.add(nueva_sucursal)
         await db.commit()
         await db.refresh(nueva_sucursal)
+        indice_sucursales.actualizar(nueva_sucursal)
+        cache_cercanas.invalidar()
 
         return nueva_sucursal
 
@@ -171,12 +182,22 @@ async def actualizar_sucursal(id: int, sucursal_data: SucursalUpdate, db: AsyncS
                     }
                 )
 
+        # Las coordenadas se guardan en texto y en su copia numérica
+        if "latitud" in update_data:
+            sucursal.Latitud = update_data.pop("latitud")
+            sucursal.LatitudNum = parsear_coordenada(sucursal.Latitud, 90.0)
+        if "longitud" in update_data:
+            sucursal.Longitud = update_data.pop("longitud")
+            sucursal.LongitudNum = parsear_coordenada(sucursal.Longitud, 180.0)
+
         # Actualizar los campos
         for field, value in update_data.items():
             setattr(sucursal, field, value)
 
         await db.commit()
         await db.refresh(sucursal)
+        indice_sucursales.actualizar(sucursal)
+        cache_cercanas.invalidar()
 
         return sucursal
 
@@ -214,6 +235,8 @@ async def eliminar_sucursal(id: int, db: AsyncSession = Depends(get_db)):
         # Eliminar la sucursal
         await db.delete(sucursal)
         await db.commit()
+        indice_sucursales.eliminar(id)
+        cache_cercanas.invalidar()
 
         return sucursal
 
@@ -241,93 +264,95 @@ async def obtener_producto_cercano(
     if len(ids_productos) != len(cantidades):
         raise HTTPException(status_code=400, detail="La cantidad de productos no coincide con la cantidad de unidades")
 
-    try:
-        # 1. Obtener todas las sucursales
-        result_sucursales = await db.execute(
-            select(
-                Sucursal.IdSucursal,
-                Sucursal.NombreSucursal,
-                Sucursal.Latitud,
-                Sucursal.Longitud,
-                Sucursal.IdProveedor
-            )
-        )
-        sucursales = result_sucursales.all()
+    # Respuestas recientes para la misma zona y la misma lista de productos
+    clave_cache = cache_cercanas.clave("sucursal-cercana", lat, lng, datos.model_dump(exclude={"lat", "lng"}))
+    en_cache = cache_cercanas.obtener(clave_cache)
+    if en_cache is not None:
+        return en_cache
+    generacion_cache = cache_cercanas.generacion
 
-        if not sucursales:
+    try:
+        # 1. Buscar la sucursal más cercana de cada proveedor, descartando las que
+        #    quedan fuera del radio antes de consultar precios
+        cercanas = await mas_cercana_por_proveedor(db, lat, lng, radio_km=datos.radio_km)
+        if not cercanas:
+            if datos.radio_km is not None:
+                raise HTTPException(status_code=404, detail="No hay sucursales dentro del radio indicado")
             raise HTTPException(status_code=404, detail="No hay sucursales registradas")
 
-        # 2. Calcular distancia a cada sucursal
-        sucursales_con_distancia = []
-        for s in sucursales:
-            try:
-                latitud = float(str(s.Latitud).replace(",", "").strip())
-                longitud = float(str(s.Longitud).replace(",", "").strip())
-                distancia = geodesic((lat, lng), (latitud, longitud)).km
-            except Exception:
-                continue
-
-            sucursales_con_distancia.append({
+        if datos.max_sucursales is not None:
+            cercanas = cercanas[:datos.max_sucursales]
+
+        # 2. Una sucursal por proveedor, con su distancia haversine
+        sucursales_filtradas = [
+            {
                 "IdSucursal": s.IdSucursal,
                 "NombreSucursal": s.NombreSucursal,
-                "Latitud": latitud,
-                "Longitud": longitud,
+                "Latitud": s.Latitud,
+                "Longitud": s.Longitud,
                 "IdProveedor": s.IdProveedor,
                 "Distancia": distancia
-            })
-
-        if not sucursales_con_distancia:
-            raise HTTPException(status_code=404, detail="No se pudo calcular la distancia a ninguna sucursal")
-
-        # 3. Ordenar por cercanía
-        sucursales_con_distancia.sort(key=lambda x: x["Distancia"])
-
-        # 4. Filtrar: solo una sucursal por proveedor
-        proveedor_visto = set()
-        sucursales_filtradas = []
-        for suc in sucursales_con_distancia:
-            if suc["IdProveedor"] not in proveedor_visto:
-                proveedor_visto.add(suc["IdProveedor"])
-                sucursales_filtradas.append(suc)
-
-        # 5. Calcular total por proveedor con cantidades
-        resultados = []
-        for suc in sucursales_filtradas:
-            total = Decimal("0.0")
-            precios_completos = True
-
-            for idx, id_prod in enumerate(ids_productos):
-                cantidad = cantidades[idx]
-
-                result_precio = await db.execute(
-                    select(ProductoProveedor.Precio).where(
-                        ProductoProveedor.IdProveedor == suc["IdProveedor"],
-                        ProductoProveedor.IdProducto == id_prod
-                    )
-                )
-                precio_unitario = result_precio.scalar()
-                if precio_unitario is None:
-                    precios_completos = False
-                    break
-
-                total += precio_unitario * cantidad
-
-            if precios_completos:
-                resultados.append({
-                    "NombreSucursal": suc["NombreSucursal"],
-                    "Latitud": suc["Latitud"],
-                    "Longitud": suc["Longitud"],
-                    "IdProveedor": suc["IdProveedor"],
-                    "Precio": float(round(total, 2)),
-                    "Distancia": round(suc["Distancia"], 2)
+            }
+            for s, distancia in cercanas
+        ]
+
+        # 3. Totales de la canasta en todos los proveedores con la matriz de precios en memoria
+        await matriz_precios.asegurar_cargado(db)
+        ids_proveedores = [suc["IdProveedor"] for suc in sucursales_filtradas]
+        _, totales, faltantes = matriz_precios.totales_canasta(ids_productos, cantidades, ids_proveedores)
+        totales = totales.tolist()
+        faltantes = faltantes.tolist()
+        sustituciones = [[] for _ in ids_proveedores]
+
+        # 4. Si se permite, completar los huecos con el sustituto más barato que vende cada proveedor
+        if datos.permitir_sustitutos and any(faltantes):
+            await sustitutos_productos.asegurar_cargado(db)
+            _, _, disponible = matriz_precios.submatriz(ids_productos, ids_proveedores)
+            cubiertos = sustitutos_productos.cubrir_faltantes(ids_productos, cantidades, ids_proveedores, disponible)
+            for (i, j), (id_sustituto, centavos, cantidad) in sorted(cubiertos.items()):
+                totales[j] += cantidad * centavos
+                faltantes[j] -= 1
+                sustituciones[j].append({
+                    "IdProducto": ids_productos[i],
+                    "IdProductoSustituto": id_sustituto,
+                    "PrecioSustituto": centavos / 100,
+                    "CantidadSustituto": cantidad
                 })
 
+        # 5. Solo los proveedores que tienen (o cubren) todos los productos
+        resultados = [
+            {
+                "NombreSucursal": suc["NombreSucursal"],
+                "Latitud": suc["Latitud"],
+                "Longitud": suc["Longitud"],
+                "IdProveedor": suc["IdProveedor"],
+                "Precio": total / 100,
+                "Distancia": suc["Distancia"],
+                "Sustituciones": cambios
+            }
+            for suc, total, falta, cambios in zip(sucursales_filtradas, totales, faltantes, sustituciones)
+            if falta == 0
+        ]
+
         if not resultados:
             raise HTTPException(status_code=204, detail="No hay proveedores que tengan todos los productos")
 
-        # 6. Devolver los 3 más baratos
+        # 6. Devolver los top_n más baratos, con distancia geodésica exacta solo para ellos
         resultados.sort(key=lambda x: x["Precio"])
-        return resultados[:3]
+        resultados = resultados[:datos.top_n]
+        exactas = geodesica_km(
+            lat, lng,
+            [r["Latitud"] for r in resultados],
+            [r["Longitud"] for r in resultados]
+        )
+        for resultado, distancia in zip(resultados, exactas.tolist()):
+            resultado["Distancia"] = round(distancia, 2)
+
+        cache_cercanas.guardar(clave_cache, resultados, generacion_cache)
+        return resultados
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener precios cercanos: {str(e)}")
@@ -346,52 +371,106 @@ async def obtener_sucursales_por_proveedor_mas_cercanas(
     if not ids_proveedores:
         raise HTTPException(status_code=400, detail="Debes proporcionar al menos un IdProveedor")
 
+    clave_cache = cache_cercanas.clave(
+        "ruta-multiples-listas", lat, lng,
+        {"ids_proveedores": ids_proveedores, "planificar_ruta": datos.planificar_ruta}
+    )
+    en_cache = cache_cercanas.obtener(clave_cache)
+    if en_cache is not None:
+        return en_cache
+    generacion_cache = cache_cercanas.generacion
+
     try:
-        # 1. Obtener todas las sucursales de los proveedores dados
-        result = await db.execute(
-            select(
-                Sucursal.IdSucursal,
-                Sucursal.NombreSucursal,
-                Sucursal.Latitud,
-                Sucursal.Longitud,
-                Sucursal.IdProveedor
-            ).where(Sucursal.IdProveedor.in_(ids_proveedores))
-        )
-        sucursales = result.all()
+        # 1. Sucursal más cercana de cada proveedor dado
+        cercanas = await mas_cercana_por_proveedor(db, lat, lng, ids_proveedores)
 
-        if not sucursales:
+        if not cercanas:
             raise HTTPException(status_code=404, detail="No se encontraron sucursales para los proveedores dados")
 
-        # 2. Calcular distancia a cada sucursal
-        sucursales_con_distancia = []
-        for s in sucursales:
-            try:
-                latitud = float(str(s.Latitud).replace(",", "").strip())
-                longitud = float(str(s.Longitud).replace(",", "").strip())
-                distancia = geodesic((lat, lng), (latitud, longitud)).km
-            except Exception:
-                continue  # Si hay error de formato, ignoramos esa sucursal
-
-            sucursales_con_distancia.append({
+        # 2. Armar lista de sucursales más cercanas con su distancia geodésica
+        exactas = geodesica_km(
+            lat, lng,
+            [s.Latitud for s, _ in cercanas],
+            [s.Longitud for s, _ in cercanas]
+        )
+        sucursales = [
+            {
                 "IdSucursal": s.IdSucursal,
                 "NombreSucursal": s.NombreSucursal,
-                "Latitud": latitud,
-                "Longitud": longitud,
+                "Latitud": s.Latitud,
+                "Longitud": s.Longitud,
                 "IdProveedor": s.IdProveedor,
                 "Distancia": distancia
+            }
+            for (s, _), distancia in zip(cercanas, exactas.tolist())
+        ]
+
+        if not datos.planificar_ruta:
+            cache_cercanas.guardar(clave_cache, sucursales, generacion_cache)
+            return sucursales
+
+        # 3. Ordenar las sucursales como un recorrido que sale de la ubicación del usuario
+        orden, tramos = await planificar_ruta(
+            lat, lng,
+            [(s["IdSucursal"], s["Latitud"], s["Longitud"]) for s in sucursales]
+        )
+        ruta = []
+        acumulada = 0.0
+        for posicion, (indice, tramo) in enumerate(zip(orden, tramos), start=1):
+            acumulada += tramo
+            ruta.append({
+                **sucursales[indice],
+                "Orden": posicion,
+                "DistanciaTramo": round(tramo, 2),
+                "DistanciaAcumulada": round(acumulada, 2)
             })
 
-        if not sucursales_con_distancia:
-            raise HTTPException(status_code=404, detail="No se pudo calcular distancia a ninguna sucursal válida")
+        cache_cercanas.guardar(clave_cache, ruta, generacion_cache)
+        return ruta
 
-        # 3. Obtener la sucursal más cercana por proveedor
-        sucursales_por_proveedor = {}
-        for suc in sorted(sucursales_con_distancia, key=lambda x: x["Distancia"]):
-            if suc["IdProveedor"] not in sucursales_por_proveedor:
-                sucursales_por_proveedor[suc["IdProveedor"]] = suc
-
-        # 4. Retornar lista de sucursales más cercanas
-        return list(sucursales_por_proveedor.values())
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al buscar sucursales más cercanas: {str(e)}")
+
+
+
+# Clusters de sucursales para la vista de mapa
+@router.get("/sucursal-clusters", response_model=List[ClusterSucursalResponse])
+async def obtener_clusters_sucursales(
+    lat_min: float = Query(..., ge=-90, le=90),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lng_min: float = Query(..., ge=-180, le=180),
+    lng_max: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=22),
+    db: AsyncSession = Depends(get_db)
+):
+    if lat_min > lat_max or lng_min > lng_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "La caja del mapa no es válida", "code": "INVALID_BOUNDS"}
+        )
+
+    try:
+        await indice_sucursales.asegurar_cargado(db)
+
+        # 1. Con zoom bajo se devuelven los agregados precalculados de cada celda
+        if zoom <= ZOOM_MAX_CLUSTER:
+            return indice_sucursales.clusters.en_caja(zoom, lat_min, lat_max, lng_min, lng_max)
+
+        # 2. Con zoom alto cada sucursal visible es su propio cluster
+        return [
+            {
+                "Latitud": s.Latitud,
+                "Longitud": s.Longitud,
+                "Cantidad": 1,
+                "Proveedores": [{"IdProveedor": s.IdProveedor, "Cantidad": 1}],
+                "IdSucursal": s.IdSucursal,
+                "NombreSucursal": s.NombreSucursal
+            }
+            for s in indice_sucursales.en_caja(lat_min, lat_max, lng_min, lng_max)
+        ]
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al agrupar sucursales: {str(e)}")
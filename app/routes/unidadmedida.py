@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from typing import List, Annotated
-from app.models.models import UnidadMedida
-from app.schemas.unidadmedida import UnidadMedidaCreate, UnidadMedidaResponse
+from app.models.models import UnidadMedida, ConversionUnidad, Producto
+from app.schemas.unidadmedida import UnidadMedidaCreate, UnidadMedidaResponse, ConversionUnidadBase, ConversionUnidadResponse
+from app.precios.unidades import recalcular_precio_unidad
+from app.catalogo.sustitutos import sustitutos_productos
 from app.database import AsyncSessionLocal
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -129,3 +131,53 @@ async def eliminar_unidadmedida(id: int, db: AsyncSession = Depends(get_db)):
         
         return unidadmedida  # Devuelve el objeto antes de eliminarlo en la sesión
 
+
+
+#Obtener las conversiones de unidades de medida a unidad base
+@router.get("/conversionunidad", response_model=List[ConversionUnidadResponse])
+async def obtener_conversiones(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(ConversionUnidad))
+    return result.scalars().all()
+
+
+#Crear o reemplazar la conversión de una unidad de medida
+@router.put("/unidadmedida/{id}/conversion", response_model=ConversionUnidadResponse)
+async def guardar_conversion(id: int, conversionParam: ConversionUnidadBase, db: AsyncSession = Depends(get_db)):
+    # 1. Validar que la unidad de medida exista
+    unidadmedida = await db.get(UnidadMedida, id)
+    if unidadmedida is None:
+        raise HTTPException(status_code=404, detail="No existe esa unidad de medida")
+
+    # 2. Crear o actualizar la conversión
+    conversion = await db.get(ConversionUnidad, id)
+    if conversion is None:
+        conversion = ConversionUnidad(IdUnidadMedida=id)
+        db.add(conversion)
+    conversion.UnidadBase = conversionParam.UnidadBase
+    conversion.Factor = conversionParam.Factor
+
+    # 3. Recalcular el precio por unidad base de los productos con esa unidad
+    result = await db.execute(select(Producto.IdProducto).where(Producto.IdUnidadMedida == id))
+    await recalcular_precio_unidad(db, result.scalars().all())
+
+    await db.commit()
+    await db.refresh(conversion)
+    sustitutos_productos.invalidar()
+    return conversion
+
+
+#Eliminar la conversión de una unidad de medida
+@router.delete("/unidadmedida/{id}/conversion", response_model=ConversionUnidadResponse)
+async def eliminar_conversion(id: int, db: AsyncSession = Depends(get_db)):
+    conversion = await db.get(ConversionUnidad, id)
+    if conversion is None:
+        raise HTTPException(status_code=404, detail="Esa unidad de medida no tiene conversión")
+
+    # Sin conversión, sus productos dejan de tener precio por unidad base
+    await db.delete(conversion)
+    result = await db.execute(select(Producto.IdProducto).where(Producto.IdUnidadMedida == id))
+    await recalcular_precio_unidad(db, result.scalars().all())
+
+    await db.commit()
+    sustitutos_productos.invalidar()
+    return conversion
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
 from app.dependencies import get_session
 from app.database import AsyncSessionLocal
+from app.precios.matriz import matriz_precios
 from app.auth.dependencies import AccessTokenBearer, RefreshTokenBearer
 from fastapi.responses import JSONResponse
 from pydantic import EmailStr
@@ -244,27 +245,21 @@ async def sugerir_productos(id_usuario: int, db: AsyncSession = Depends(get_db))
 
         ids_proveedores_top = [p[0] for p in proveedores_mas_frecuentes]
 
-        # 2. Buscar productos de esos proveedores (con precio)
-        result_productos = await db.execute(
-            select(
-                ProductoProveedor.IdProducto,
-                ProductoProveedor.IdProveedor,
-                ProductoProveedor.Precio
-            ).where(ProductoProveedor.IdProveedor.in_(ids_proveedores_top))
-        )
-        productos_por_proveedor = result_productos.all()
+        # 2. Productos de esos proveedores, con el más barato de ellos (matriz de precios en memoria)
+        await matriz_precios.asegurar_cargado(db)
+        ids_productos, mejores_proveedores, centavos = matriz_precios.productos_de(ids_proveedores_top)
 
-        if not productos_por_proveedor:
+        if not ids_productos:
             raise HTTPException(status_code=404, detail="No hay productos registrados para esos proveedores")
 
         # Mapear producto_id -> (proveedor_id, precio)
         producto_proveedor_map = {
-            producto_id: (proveedor_id, precio)
-            for producto_id, proveedor_id, precio in productos_por_proveedor
+            producto_id: (proveedor_id, precio / 100)
+            for producto_id, proveedor_id, precio in zip(
+                ids_productos, mejores_proveedores.tolist(), centavos.tolist()
+            )
         }
 
-        ids_productos = list(producto_proveedor_map.keys())
-
         # 3. Buscar productos más frecuentes en listas del usuario
         result_frecuencia = await db.execute(
             select(
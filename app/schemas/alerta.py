@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+from decimal import Decimal
+
+
+class AlertaPrecioBase(BaseModel):
+    IdUsuario: int = Field(..., alias="IdUsuario")
+    IdProducto: int = Field(..., alias="IdProducto")
+    PrecioObjetivo: Decimal = Field(..., gt=0, max_digits=10, decimal_places=2, alias="PrecioObjetivo")
+
+
+class AlertaPrecioCreate(AlertaPrecioBase):
+    pass
+
+class AlertaPrecioUpdate(BaseModel):
+    PrecioObjetivo: Optional[Decimal] = Field(None, gt=0, max_digits=10, decimal_places=2, alias="PrecioObjetivo")
+    # Volver a activar una alerta ya disparada, o pausarla
+    Activa: Optional[bool] = Field(None, alias="Activa")
+
+class AlertaPrecioResponse(AlertaPrecioBase):
+    IdAlerta: int
+    Activa: bool
+    FechaCreacion: datetime
+    FechaDisparo: Optional[datetime]
+    PrecioDisparo: Optional[Decimal]
+    IdProveedorDisparo: Optional[int]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+
+
+class CanastaRequest(BaseModel):
+    ids_productos: List[int] = Field(..., min_length=1, max_length=500)
+    # Una cantidad por producto, en el mismo orden; si se omite se asume 1
+    cantidades: Optional[List[int]] = None
+    # Limita la comparación a estos proveedores; si se omite, todos los que venden algún producto
+    ids_proveedores: Optional[List[int]] = Field(None, max_length=500)
+
+    @model_validator(mode="after")
+    def validar_cantidades(self):
+        if self.cantidades is not None:
+            if len(self.cantidades) != len(self.ids_productos):
+                raise ValueError("La cantidad de productos no coincide con la cantidad de unidades")
+            if any(c <= 0 for c in self.cantidades):
+                raise ValueError("Las cantidades deben ser mayores que cero")
+        return self
+
+
+class CanastaComparacionResponse(BaseModel):
+    """
+    Tabla en formato columnar: Precios[i][j] es el precio unitario del producto
+    IdsProductos[i] en el proveedor IdsProveedores[j] (None si no lo vende).
+    Los proveedores vienen ordenados por faltantes y luego por total.
+    """
+    IdsProveedores: List[int]
+    IdsProductos: List[int]
+    Cantidades: List[int]
+    Precios: List[List[Optional[float]]]
+    Totales: List[float]  # Suma de precio x cantidad de los productos disponibles
+    Faltantes: List[int]
@@ -1,9 +1,11 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel, Field
 
 class CategoriaBase(BaseModel):
     NombreCategoria: str = Field(..., alias="NombreCategoria") # ← Debe coincidir con el modelo SQLAlchemy
+    IdCategoriaPadre: Optional[int] = Field(None, alias="IdCategoriaPadre")  # None = categoría raíz
 
 class CategoriaCreate(CategoriaBase):
     pass
@@ -13,4 +15,8 @@ class CategoriaResponse(CategoriaBase):
     FechaCreacion: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SubcategoriaResponse(CategoriaResponse):
+    Profundidad: int  # 0 = la categoría consultada
+    TotalProductos: int  # Incluye los de sus propias subcategorías
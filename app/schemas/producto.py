@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, HttpUrl, validator
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from sqlalchemy import Column, Float
 from decimal import Decimal
 
@@ -11,6 +11,8 @@ class ProductoBase(BaseModel):
     Nombre: str = Field(..., max_length=100)
     UrlImagen: Optional[str] = Field(None, alias="UrlImagen")
     Descripcion: Optional[str] = Field(None, max_length=300, alias="Descripcion")
+    # Contenido del empaque en la unidad de medida (500 para 500 g); vacío equivale a 1
+    CantidadContenido: Optional[Decimal] = Field(None, gt=0, alias="CantidadContenido")
 
 
 class ProductoCreate(ProductoBase):
@@ -23,6 +25,7 @@ class ProductoUpdate(BaseModel):
     NombreProducto: Optional[str] = Field(None, max_length=100, alias="Nombre")
     UrlImagen: Optional[str] = Field(None, alias="UrlImagen")
     Descripcion: Optional[str] = Field(None, max_length=300, alias="Descripcion")
+    CantidadContenido: Optional[Decimal] = Field(None, gt=0, alias="CantidadContenido")
 
 
 class ProductoSugeridoResponse(BaseModel):
@@ -40,6 +43,54 @@ class ProductoConPrecioPromedioResponse(BaseModel):
     Descripcion: Optional[str]
     FechaCreacion: datetime
     PrecioPromedio: Optional[float]
+    PrecioMinimo: Optional[float] = None
+    PrecioMaximo: Optional[float] = None
+    CantidadProveedores: int = 0
+
+class PaginaProductoPrecioPromedioResponse(BaseModel):
+    Productos: List[ProductoConPrecioPromedioResponse]
+    SiguienteCursor: Optional[str]  # None cuando no hay más resultados
+
+class AutocompletadoProductoResponse(BaseModel):
+    IdProducto: int
+    Nombre: str
+    Popularidad: int  # Veces que aparece en listas de compras
+
+class ProductoBusquedaResponse(BaseModel):
+    IdProducto: int
+    IdCategoria: int
+    IdUnidadMedida: int
+    Nombre: str
+    UrlImagen: Optional[str]
+    Descripcion: Optional[str]
+    FechaCreacion: datetime
+    PrecioMinimo: Optional[Decimal]
+    Puntaje: float
+
+class PaginaBusquedaProductoResponse(BaseModel):
+    Productos: List[ProductoBusquedaResponse]
+    SiguienteCursor: Optional[str]  # None cuando no hay más resultados
+
+class PrecioEfectivoResponse(BaseModel):
+    IdProveedor: int
+    PrecioEfectivo: Decimal  # PrecioOferta si la oferta está vigente, si no Precio
+    Precio: Decimal
+    PrecioOferta: Optional[Decimal]
+    FechaFinOferta: Optional[datetime]
+    EnOferta: bool
+
+class MejorPrecioProductoResponse(BaseModel):
+    IdProducto: int
+    Proveedores: List[PrecioEfectivoResponse]  # Del más barato al más caro
+
+class MejorPrecioRequest(BaseModel):
+    ids_productos: List[int] = Field(..., min_length=1, max_length=500)
+    n: int = Field(1, ge=1, le=20)
+
+class SustitutoProductoResponse(BaseModel):
+    IdProducto: int
+    PrecioReferencia: float  # Precio promedio por unidad (base o de medida) del empaque
+    Similitud: Optional[float]  # Menor/mayor precio de referencia; None si el original no tiene precios
 
 class BigProductoProveedorResponse(BaseModel):
     IdProducto: int
@@ -68,3 +119,22 @@ class ProductoResponse(ProductoBase):
     
     class Config:
         from_attributes = True
+
+class PropuestaFusionProductoResponse(BaseModel):
+    IdPropuesta: int
+    IdProductoConservar: int
+    IdProductoDuplicado: int
+    Puntaje: Decimal
+    Estado: str
+    FechaCreacion: datetime
+    FechaRevision: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class GeneracionPropuestasResponse(BaseModel):
+    Propuestas: int
+
+class FusionProductoResponse(BaseModel):
+    Propuesta: PropuestaFusionProductoResponse
+    FilasMovidas: Dict[str, int]  # Por tabla
@@ -1,7 +1,16 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
+
+from app.models.models import ahora_local
+
+def validar_fecha_fin_oferta(v: Optional[datetime]) -> Optional[datetime]:
+    # Una fecha de fin pasada sería una fecha de registro con el formato viejo:
+    # el planificador de vencimientos borraría la oferta apenas se guarda
+    if v is not None and v.replace(tzinfo=None) <= ahora_local():
+        raise ValueError("FechaOferta es la fecha de fin de la oferta y debe ser futura")
+    return v
 
 class ProductoProveedorBase(BaseModel):
     IdProducto: int = Field(..., alias="IdProducto")
@@ -13,7 +22,11 @@ class ProductoProveedorBase(BaseModel):
     FechaPrecio: datetime = Field(..., alias="FechaPrecio")
 
 class ProductoProveedorCreate(ProductoProveedorBase):
-    pass
+    # Solo al escribir: las respuestas deben aceptar ofertas que vencieron y el
+    # planificador todavía no limpió
+    @field_validator('FechaOferta')
+    def validar_fin_oferta(cls, v):
+        return validar_fecha_fin_oferta(v)
 
 class ProductoProveedorUpdate(BaseModel):
     Precio: Optional[Decimal] = Field(alias="Precio")
@@ -28,14 +41,77 @@ class ProductoProveedorUpdate(BaseModel):
             raise ValueError("El precio debe ser mayor que cero")
         return v
 
-    @field_validator('FechaOferta', 'FechaPrecio')
+    # FechaOferta es la fecha en que termina la oferta, así que debe ser futura
+    # (antes era la fecha de registro; la migración 8e2f4b6a9c03 convirtió los valores viejos)
+    @field_validator('FechaOferta')
+    def validar_fin_oferta(cls, v):
+        return validar_fecha_fin_oferta(v)
+
+    @field_validator('FechaPrecio')
     def validar_fechas_futuras(cls, v):
-        if v is not None and v > datetime.now():
+        if v is not None and v.replace(tzinfo=None) > ahora_local():
             raise ValueError("Las fechas no pueden ser futuras")
         return v
 
+class SeriePrecioResponse(BaseModel):
+    IdProveedor: int
+    Periodo: datetime
+    PrecioMinimo: Decimal
+    PrecioPromedio: Decimal
+    PrecioMaximo: Decimal
+    PrecioOfertaMinimo: Optional[Decimal] = None
+    Registros: int
+
+class ErrorImportacionResponse(BaseModel):
+    Fila: int
+    Error: str
+
+class CuarentenaImportacionResponse(BaseModel):
+    Fila: int
+    Motivo: str
+
+class ImportacionPreciosResponse(BaseModel):
+    FilasLeidas: int
+    FilasValidas: int
+    Insertados: int
+    Actualizados: int
+    CambiosPrecio: int
+    EnCuarentena: int = 0  # Filas válidas retenidas por precio anómalo
+    FilasEnCuarentena: List[CuarentenaImportacionResponse] = []
+    TotalErrores: int
+    Errores: List[ErrorImportacionResponse]  # Como máximo las primeras 1000
+
+class PrecioUnidadBaseResponse(BaseModel):
+    IdProducto: int
+    NombreProducto: str
+    IdProveedor: int
+    Precio: Decimal
+    CantidadContenido: Optional[Decimal]
+    UnidadBase: str
+    PrecioUnidadBase: Decimal
+
 class ProductoProveedorResponse(ProductoProveedorBase):
-    # En este caso no agregamos campos adicionales ya que es una tabla de relación
+    UnidadBase: Optional[str] = None
+    PrecioUnidadBase: Optional[Decimal] = None
+
+    class Config:
+        from_attributes = True
+
+class PrecioCuarentenaResponse(BaseModel):
+    IdCuarentena: int
+    IdProducto: int
+    IdProveedor: int
+    Precio: Decimal
+    PrecioOferta: Optional[Decimal]
+    DescripcionOferta: Optional[str]
+    FechaOferta: Optional[datetime]
+    FechaPrecio: datetime
+    PrecioReferencia: Optional[Decimal]
+    Motivo: str
+    Origen: str
+    Estado: str
+    FechaCreacion: datetime
+    FechaRevision: Optional[datetime]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
@@ -3,8 +3,22 @@ from datetime import datetime
 from typing import Optional
 import pytz
 from typing import List
+import math
 
 
+# Una sucursal con coordenadas fuera de rango no entraría al índice espacial
+# ni al prefiltro por caja y desaparecería de todas las búsquedas
+def validar_coordenada(v: str, limite: float, nombre: str) -> str:
+    if not v.strip():
+        raise ValueError("Las coordenadas no pueden estar vacías")
+    try:
+        numero = float(v.replace(",", "").strip())
+    except ValueError:
+        raise ValueError("Las coordenadas deben ser valores numéricos")
+    if math.isnan(numero) or abs(numero) > limite:
+        raise ValueError(f"{nombre} debe estar entre -{limite:g} y {limite:g}")
+    return v
+
 class SucursalBase(BaseModel):
     IdProveedor: int = Field(..., alias="IdProveedor")
     NombreSucursal: str = Field(..., alias="NombreSucursal", max_length=100)
@@ -19,6 +33,14 @@ class SucursalCreate(SucursalBase):
             raise ValueError("El nombre debe tener al menos 3 caracteres")
         return v
 
+    @field_validator('latitud')
+    def validar_latitud(cls, v):
+        return validar_coordenada(v, 90.0, "La latitud")
+
+    @field_validator('longitud')
+    def validar_longitud(cls, v):
+        return validar_coordenada(v, 180.0, "La longitud")
+
 
 class SucursalUpdate(BaseModel):
     IdProveedor: Optional[int] = Field(None, alias="IdProveedor")
@@ -34,16 +56,19 @@ class SucursalUpdate(BaseModel):
                 raise ValueError("El nombre debe tener al menos 3 caracteres")
         return v
 
-    @field_validator('latitud', 'longitud')
-    def validar_coordenadas(cls, v):
-        if v is not None:
-            if not v.strip():
-                raise ValueError("Las coordenadas no pueden estar vacías")
-            try:
-                float(v)
-            except ValueError:
-                raise ValueError("Las coordenadas deben ser valores numéricos")
-        return v
+    @field_validator('latitud')
+    def validar_latitud(cls, v):
+        return validar_coordenada(v, 90.0, "La latitud") if v is not None else v
+
+    @field_validator('longitud')
+    def validar_longitud(cls, v):
+        return validar_coordenada(v, 180.0, "La longitud") if v is not None else v
+
+class SustitucionResponse(BaseModel):
+    IdProducto: int            # Producto pedido que el proveedor no tiene
+    IdProductoSustituto: int
+    PrecioSustituto: float
+    CantidadSustituto: int     # Empaques del sustituto que equivalen a la cantidad pedida
 
 class ProductoSucursalResponse(BaseModel):
     NombreSucursal: str
@@ -52,17 +77,40 @@ class ProductoSucursalResponse(BaseModel):
     IdProveedor: int
     Precio: float
     Distancia: float
+    Sustituciones: List[SustitucionResponse] = []
     
 class UbicacionProductoRequest(BaseModel):
     lat: float
     lng: float
     ids_productos: List[int]
     lista_cantidad: List[int]
+    # Solo se consideran sucursales a menos de radio_km (None = sin límite)
+    radio_km: Optional[float] = Field(None, gt=0)
+    # Máximo de proveedores (su sucursal más cercana) a los que se les calcula precio
+    max_sucursales: Optional[int] = Field(None, gt=0)
+    # Cantidad de resultados más baratos a devolver
+    top_n: int = Field(3, gt=0, le=50)
+    # Completar los productos que le faltan a un proveedor con su sustituto más barato
+    permitir_sustitutos: bool = False
 
 class RutaProveedoresRequest(BaseModel):
     lat: float
     lng: float
     ids_proveedores: List[int]
+    planificar_ruta: bool = False  # Ordena las sucursales como un recorrido desde (lat, lng)
+
+class ProveedorClusterResponse(BaseModel):
+    IdProveedor: int
+    Cantidad: int
+
+class ClusterSucursalResponse(BaseModel):
+    Latitud: float
+    Longitud: float
+    Cantidad: int
+    Proveedores: List[ProveedorClusterResponse]
+    # Solo en zooms altos, donde cada cluster es una sucursal
+    IdSucursal: Optional[int] = None
+    NombreSucursal: Optional[str] = None
 
 class SucursalResponse(SucursalBase):
     IdSucursal: int = Field(..., alias="IdSucursal")
@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from datetime import datetime
 from pydantic import BaseModel, Field
+from decimal import Decimal
+from typing import Literal
 
 class UnidadMedidaBase(BaseModel):
     NombreUnidadMedida: str  = Field(..., alias="NombreUnidadMedida")# ← Debe coincidir con el modelo SQLAlchemy
@@ -13,4 +15,14 @@ class UnidadMedidaResponse(UnidadMedidaBase):
     FechaCreacion: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ConversionUnidadBase(BaseModel):
+    UnidadBase: Literal["kg", "l", "unidad"]
+    Factor: Decimal = Field(..., gt=0)  # Unidades base por cada unidad de medida (gramo -> 0.001)
+
+class ConversionUnidadResponse(ConversionUnidadBase):
+    IdUnidadMedida: int
+
+    class Config:
+        from_attributes = True
@@ -2,6 +2,8 @@
 from datetime import datetime
 import pytz
 import random
+import re
+import unicodedata
 from datetime import datetime, timedelta
 from email.message import EmailMessage
 from email_validator import validate_email, EmailNotValidError
@@ -11,6 +13,12 @@ from aiosmtplib import send
 def now_bolivia():
     return datetime.now(pytz.timezone('America/La_Paz'))
 
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sin acentos y con los espacios colapsados ("  Café  Molido" -> "cafe molido")."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sin_acentos).strip().lower()
+
 def generar_codigo_otp() -> str:
     return str(random.randint(100000, 999999))
 
@@ -80,8 +88,22 @@ async def enviar_correo_otp(email: str, codigo: str):
     mensaje.set_content("Tu código de verificación es: " + codigo)  # fallback texto plano
     mensaje.add_alternative(html, subtype="html")
 
+    await _enviar_correo(mensaje)
+
+
+async def enviar_correo_alerta_precio(email: str, producto: str, proveedor: str, precio, precio_objetivo):
+    mensaje = EmailMessage()
+    mensaje["From"] = "tobaratodo@gmail.com"
+    mensaje["To"] = email
+    mensaje["Subject"] = f"¡{producto} bajó de precio!"
+    mensaje.set_content(
+        f"{producto} está a {precio} en {proveedor}, por debajo de tu precio objetivo de {precio_objetivo}."
+    )
+
+    await _enviar_correo(mensaje)
 
 
+async def _enviar_correo(mensaje: EmailMessage):
     await send(
         mensaje,
         hostname="smtp.gmail.com",
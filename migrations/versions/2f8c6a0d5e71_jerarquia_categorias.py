@@ -0,0 +1,61 @@
+"""Jerarquia de categorias con tabla de clausura
+
+Revision ID: 2f8c6a0d5e71
+Revises: 9b4e1c7d2a58
+Create Date: 2026-10-18 18:04:19.772530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8c6a0d5e71'
+down_revision: Union[str, None] = '9b4e1c7d2a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('Categoria', sa.Column('IdCategoriaPadre', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'categoria_idcategoriapadre_fkey', 'Categoria', 'Categoria',
+        ['IdCategoriaPadre'], ['IdCategoria']
+    )
+
+    op.create_table(
+        'CategoriaJerarquia',
+        sa.Column('IdAncestro', sa.Integer(), nullable=False),
+        sa.Column('IdDescendiente', sa.Integer(), nullable=False),
+        sa.Column('Profundidad', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['IdAncestro'], ['Categoria.IdCategoria'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['IdDescendiente'], ['Categoria.IdCategoria'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('IdAncestro', 'IdDescendiente')
+    )
+    op.create_index('ix_categoriajerarquia_descendiente', 'CategoriaJerarquia', ['IdDescendiente'])
+    op.create_index('ix_producto_idcategoria', 'Producto', ['IdCategoria'])
+
+    # Clausura de las categorías existentes (hoy todas raíz, pero se recorre el árbol por si acaso)
+    op.execute("""
+        WITH RECURSIVE caminos("IdAncestro", "IdDescendiente", "Profundidad") AS (
+            SELECT "IdCategoria", "IdCategoria", 0 FROM "Categoria"
+            UNION ALL
+            SELECT c."IdAncestro", h."IdCategoria", c."Profundidad" + 1
+            FROM caminos c
+            JOIN "Categoria" h ON h."IdCategoriaPadre" = c."IdDescendiente"
+        )
+        INSERT INTO "CategoriaJerarquia" ("IdAncestro", "IdDescendiente", "Profundidad")
+        SELECT "IdAncestro", "IdDescendiente", "Profundidad" FROM caminos
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_producto_idcategoria', table_name='Producto')
+    op.drop_index('ix_categoriajerarquia_descendiente', table_name='CategoriaJerarquia')
+    op.drop_table('CategoriaJerarquia')
+    op.drop_constraint('categoria_idcategoriapadre_fkey', 'Categoria', type_='foreignkey')
+    op.drop_column('Categoria', 'IdCategoriaPadre')
@@ -0,0 +1,52 @@
+"""Alertas de precio
+
+Revision ID: 3c9a7f51d2b8
+Revises: f81b2d6e4c37
+Create Date: 2026-10-18 15:12:44.681203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a7f51d2b8'
+down_revision: Union[str, None] = 'f81b2d6e4c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'AlertaPrecio',
+        sa.Column('IdAlerta', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('IdUsuario', sa.Integer(), nullable=False),
+        sa.Column('IdProducto', sa.Integer(), nullable=False),
+        sa.Column('PrecioObjetivo', sa.Numeric(10, 2), nullable=False),
+        sa.Column('Activa', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('FechaCreacion', sa.DateTime(), nullable=True),
+        sa.Column('FechaDisparo', sa.DateTime(), nullable=True),
+        sa.Column('PrecioDisparo', sa.Numeric(10, 2), nullable=True),
+        sa.Column('IdProveedorDisparo', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['IdUsuario'], ['Usuario.IdUsuario'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['IdProducto'], ['Producto.IdProducto'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('IdAlerta')
+    )
+    # Solo las alertas activas se evalúan; las disparadas quedan como registro
+    op.create_index(
+        'ix_alertaprecio_producto_activa',
+        'AlertaPrecio',
+        ['IdProducto'],
+        postgresql_where=sa.text('"Activa"')
+    )
+    op.create_index('ix_alertaprecio_usuario', 'AlertaPrecio', ['IdUsuario'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_alertaprecio_usuario', table_name='AlertaPrecio')
+    op.drop_index('ix_alertaprecio_producto_activa', table_name='AlertaPrecio')
+    op.drop_table('AlertaPrecio')
@@ -0,0 +1,39 @@
+"""Indice compuesto para paginar el resumen de precios
+
+Revision ID: 5a7d3e9c1b46
+Revises: 2f8c6a0d5e71
+Create Date: 2026-10-19 09:41:02.118345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7d3e9c1b46'
+down_revision: Union[str, None] = '2f8c6a0d5e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # /productoavg pagina por (PrecioPromedio, IdProducto); el índice viejo solo cubría el orden
+    op.create_index(
+        'ix_precioproductoresumen_preciopromedio_idproducto',
+        'PrecioProductoResumen',
+        ['PrecioPromedio', 'IdProducto']
+    )
+    op.drop_index('ix_precioproductoresumen_preciopromedio', table_name='PrecioProductoResumen')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_precioproductoresumen_preciopromedio',
+        'PrecioProductoResumen',
+        ['PrecioPromedio']
+    )
+    op.drop_index('ix_precioproductoresumen_preciopromedio_idproducto', table_name='PrecioProductoResumen')
@@ -0,0 +1,53 @@
+"""Cuarentena de precios anómalos
+
+Revision ID: 6d2e8b4f9a13
+Revises: 3c9a7f51d2b8
+Create Date: 2026-10-18 16:03:27.514902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e8b4f9a13'
+down_revision: Union[str, None] = '3c9a7f51d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'PrecioCuarentena',
+        sa.Column('IdCuarentena', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('IdProducto', sa.Integer(), nullable=False),
+        sa.Column('IdProveedor', sa.Integer(), nullable=False),
+        sa.Column('Precio', sa.Numeric(10, 2), nullable=False),
+        sa.Column('PrecioOferta', sa.Numeric(10, 2), nullable=True),
+        sa.Column('DescripcionOferta', sa.Text(), nullable=True),
+        sa.Column('FechaOferta', sa.DateTime(), nullable=True),
+        sa.Column('FechaPrecio', sa.DateTime(), nullable=False),
+        sa.Column('PrecioReferencia', sa.Numeric(10, 2), nullable=True),
+        sa.Column('Motivo', sa.String(length=300), nullable=False),
+        sa.Column('Origen', sa.String(length=20), nullable=False),
+        sa.Column('Estado', sa.String(length=15), nullable=False, server_default='pendiente'),
+        sa.Column('FechaCreacion', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('FechaRevision', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['IdProducto'], ['Producto.IdProducto'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['IdProveedor'], ['Proveedor.IdProveedor'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('IdCuarentena')
+    )
+    op.create_index(
+        'ix_preciocuarentena_estado_fechacreacion',
+        'PrecioCuarentena',
+        ['Estado', 'FechaCreacion']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_preciocuarentena_estado_fechacreacion', table_name='PrecioCuarentena')
+    op.drop_table('PrecioCuarentena')
@@ -0,0 +1,58 @@
+"""FechaOferta pasa a ser la fecha de fin de la oferta
+
+Revision ID: 8e2f4b6a9c03
+Revises: 5a7d3e9c1b46
+Create Date: 2026-10-19 10:22:37.904511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2f4b6a9c03'
+down_revision: Union[str, None] = '5a7d3e9c1b46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Antes FechaOferta era el día en que se registró la oferta y la API no
+    # aceptaba fechas futuras, así que todos los valores guardados son pasados.
+    # Leídos como fecha de fin, todas las ofertas quedarían vencidas y el
+    # planificador las borraría. Se dejan sin fecha de fin (vigentes, como se
+    # mostraban antes) y el valor viejo se guarda para poder volver atrás.
+    op.create_table(
+        'FechaOfertaLegado',
+        sa.Column('IdProducto', sa.Integer(), nullable=False),
+        sa.Column('IdProveedor', sa.Integer(), nullable=False),
+        sa.Column('FechaOferta', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('IdProducto', 'IdProveedor')
+    )
+    op.execute("""
+        INSERT INTO "FechaOfertaLegado" ("IdProducto", "IdProveedor", "FechaOferta")
+        SELECT "IdProducto", "IdProveedor", "FechaOferta"
+        FROM "ProductoProveedor"
+        WHERE "FechaOferta" IS NOT NULL AND "FechaOferta" <= now()
+    """)
+    op.execute("""
+        UPDATE "ProductoProveedor" pp
+        SET "FechaOferta" = NULL
+        FROM "FechaOfertaLegado" l
+        WHERE pp."IdProducto" = l."IdProducto" AND pp."IdProveedor" = l."IdProveedor"
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        UPDATE "ProductoProveedor" pp
+        SET "FechaOferta" = l."FechaOferta"
+        FROM "FechaOfertaLegado" l
+        WHERE pp."IdProducto" = l."IdProducto" AND pp."IdProveedor" = l."IdProveedor"
+          AND pp."FechaOferta" IS NULL
+    """)
+    op.drop_table('FechaOfertaLegado')
@@ -0,0 +1,44 @@
+"""Propuestas de fusion de productos duplicados
+
+Revision ID: 9b4e1c7d2a58
+Revises: 6d2e8b4f9a13
+Create Date: 2026-10-18 17:12:45.308116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e1c7d2a58'
+down_revision: Union[str, None] = '6d2e8b4f9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'PropuestaFusionProducto',
+        sa.Column('IdPropuesta', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('IdProductoConservar', sa.Integer(), nullable=False),
+        sa.Column('IdProductoDuplicado', sa.Integer(), nullable=False),
+        sa.Column('Puntaje', sa.Numeric(5, 4), nullable=False),
+        sa.Column('Estado', sa.String(length=15), nullable=False, server_default='pendiente'),
+        sa.Column('FechaCreacion', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('FechaRevision', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('IdPropuesta')
+    )
+    op.create_index(
+        'ix_propuestafusionproducto_estado_puntaje',
+        'PropuestaFusionProducto',
+        ['Estado', 'Puntaje']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_propuestafusionproducto_estado_puntaje', table_name='PropuestaFusionProducto')
+    op.drop_table('PropuestaFusionProducto')
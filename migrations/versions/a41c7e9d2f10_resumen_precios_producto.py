@@ -0,0 +1,54 @@
+"""Resumen de precios por producto
+
+Revision ID: a41c7e9d2f10
+Revises: d2b608741884
+Create Date: 2026-10-18 10:02:47.913520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e9d2f10'
+down_revision: Union[str, None] = 'd2b608741884'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'PrecioProductoResumen',
+        sa.Column('IdProducto', sa.Integer(), nullable=False),
+        sa.Column('PrecioPromedio', sa.Numeric(12, 4), nullable=False),
+        sa.Column('PrecioMinimo', sa.Numeric(10, 2), nullable=False),
+        sa.Column('PrecioMaximo', sa.Numeric(10, 2), nullable=False),
+        sa.Column('CantidadProveedores', sa.Integer(), nullable=False),
+        sa.Column('FechaActualizacion', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['IdProducto'], ['Producto.IdProducto'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('IdProducto')
+    )
+    op.create_index(
+        'ix_precioproductoresumen_preciopromedio',
+        'PrecioProductoResumen',
+        ['PrecioPromedio']
+    )
+
+    # Rellenar con los precios actuales
+    op.execute("""
+        INSERT INTO "PrecioProductoResumen"
+            ("IdProducto", "PrecioPromedio", "PrecioMinimo", "PrecioMaximo",
+             "CantidadProveedores", "FechaActualizacion")
+        SELECT "IdProducto", avg("Precio"), min("Precio"), max("Precio"), count(*), now()
+        FROM "ProductoProveedor"
+        GROUP BY "IdProducto"
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_precioproductoresumen_preciopromedio', table_name='PrecioProductoResumen')
+    op.drop_table('PrecioProductoResumen')
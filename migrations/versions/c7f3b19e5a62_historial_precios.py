@@ -0,0 +1,60 @@
+"""Historial de precios
+
+Revision ID: c7f3b19e5a62
+Revises: a41c7e9d2f10
+Create Date: 2026-10-18 10:41:05.220318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f3b19e5a62'
+down_revision: Union[str, None] = 'a41c7e9d2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'HistorialPrecio',
+        sa.Column('IdHistorialPrecio', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('IdProducto', sa.Integer(), nullable=False),
+        sa.Column('IdProveedor', sa.Integer(), nullable=False),
+        sa.Column('Precio', sa.Numeric(10, 2), nullable=False),
+        sa.Column('PrecioOferta', sa.Numeric(10, 2), nullable=True),
+        sa.Column('FechaPrecio', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('IdHistorialPrecio')
+    )
+
+    # Punto de partida: el precio vigente de cada relación, en orden de fecha
+    # para que el índice BRIN quede bien correlacionado
+    op.execute("""
+        INSERT INTO "HistorialPrecio" ("IdProducto", "IdProveedor", "Precio", "PrecioOferta", "FechaPrecio")
+        SELECT "IdProducto", "IdProveedor", "Precio", "PrecioOferta", coalesce("FechaPrecio", now())
+        FROM "ProductoProveedor"
+        ORDER BY "FechaPrecio"
+    """)
+
+    op.create_index(
+        'ix_historialprecio_fechaprecio_brin',
+        'HistorialPrecio',
+        ['FechaPrecio'],
+        postgresql_using='brin'
+    )
+    op.create_index(
+        'ix_historialprecio_producto_proveedor_fecha',
+        'HistorialPrecio',
+        ['IdProducto', 'IdProveedor', 'FechaPrecio']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_historialprecio_producto_proveedor_fecha', table_name='HistorialPrecio')
+    op.drop_index('ix_historialprecio_fechaprecio_brin', table_name='HistorialPrecio')
+    op.drop_table('HistorialPrecio')
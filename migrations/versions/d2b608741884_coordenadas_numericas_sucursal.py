@@ -0,0 +1,51 @@
+"""Coordenadas numericas en Sucursal
+
+Revision ID: d2b608741884
+Revises: 8b98ed1c6f73
+Create Date: 2026-10-18 09:12:31.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b608741884'
+down_revision: Union[str, None] = '8b98ed1c6f73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('Sucursal', sa.Column('latitud_num', sa.Numeric(9, 6), nullable=True))
+    op.add_column('Sucursal', sa.Column('longitud_num', sa.Numeric(9, 6), nullable=True))
+
+    # Rellenar a partir de las columnas de texto; las filas que no se puedan
+    # interpretar como número (o fuera de rango) quedan en NULL. El cast va
+    # dentro del CASE: Postgres no garantiza el orden de las condiciones de un
+    # WHERE y un solo texto no numérico abortaría la migración
+    for columna, limite in (("latitud", 90), ("longitud", 180)):
+        valor = f"replace(trim({columna}), ',', '')"
+        op.execute(rf"""
+            UPDATE "Sucursal"
+            SET {columna}_num = CASE
+                WHEN {valor} ~ '^-?[0-9]+(\.[0-9]+)?$' THEN
+                    CASE WHEN abs({valor}::numeric) <= {limite} THEN {valor}::numeric END
+            END
+        """)
+
+    op.create_index(
+        'ix_sucursal_latitud_longitud_num',
+        'Sucursal',
+        ['latitud_num', 'longitud_num']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sucursal_latitud_longitud_num', table_name='Sucursal')
+    op.drop_column('Sucursal', 'longitud_num')
+    op.drop_column('Sucursal', 'latitud_num')
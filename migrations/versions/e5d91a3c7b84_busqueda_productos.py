@@ -0,0 +1,53 @@
+"""Busqueda de productos por texto
+
+Revision ID: e5d91a3c7b84
+Revises: c7f3b19e5a62
+Create Date: 2026-10-18 11:26:13.640972
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5d91a3c7b84'
+down_revision: Union[str, None] = 'c7f3b19e5a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # unaccent() es STABLE y no se puede usar en un índice; este envoltorio fija
+    # el diccionario y se declara IMMUTABLE
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text)
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    # Las expresiones deben coincidir con las de app/catalogo/busqueda.py
+    op.execute("""
+        CREATE INDEX ix_producto_nombre_trgm
+        ON "Producto" USING gin (f_unaccent(lower("Nombre")) gin_trgm_ops)
+    """)
+    op.execute("""
+        CREATE INDEX ix_producto_documento_tsv
+        ON "Producto" USING gin (
+            to_tsvector('spanish'::regconfig,
+                        f_unaccent(coalesce("Nombre", '') || ' ' || coalesce("Descripcion", '')))
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_producto_documento_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_producto_nombre_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
@@ -0,0 +1,86 @@
+"""Precio por unidad base
+
+Revision ID: f81b2d6e4c37
+Revises: e5d91a3c7b84
+Create Date: 2026-10-18 12:48:22.105734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81b2d6e4c37'
+down_revision: Union[str, None] = 'e5d91a3c7b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (expresión regular sobre el nombre sin acentos en minúsculas, unidad base, factor)
+CONVERSIONES_CONOCIDAS = [
+    (r'^(kilo(gramo)?s?|kgs?)$', 'kg', 1),
+    (r'^(gramos?|grs?|g)$', 'kg', 0.001),
+    (r'^(libras?|lbs?)$', 'kg', 0.453592),
+    (r'^(onzas?|oz)$', 'kg', 0.0283495),
+    (r'^(litros?|lts?|l)$', 'l', 1),
+    (r'^(mililitros?|ml)$', 'l', 0.001),
+    (r'^(galon(es)?|gal)$', 'l', 3.785412),
+    (r'^(unidad(es)?|unds?|u|piezas?)$', 'unidad', 1),
+    (r'^docenas?$', 'unidad', 12),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ConversionUnidad',
+        sa.Column('IdUnidadMedida', sa.Integer(), nullable=False),
+        sa.Column('UnidadBase', sa.String(length=10), nullable=False),
+        sa.Column('Factor', sa.Numeric(14, 6), nullable=False),
+        sa.ForeignKeyConstraint(['IdUnidadMedida'], ['UnidadMedida.IdUnidadMedida'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('IdUnidadMedida')
+    )
+    op.add_column('Producto', sa.Column('CantidadContenido', sa.Numeric(10, 3), nullable=True))
+    op.add_column('ProductoProveedor', sa.Column('UnidadBase', sa.String(length=10), nullable=True))
+    op.add_column('ProductoProveedor', sa.Column('PrecioUnidadBase', sa.Numeric(14, 4), nullable=True))
+
+    # Conversiones para las unidades existentes cuyo nombre se reconoce
+    conexion = op.get_bind()
+    for patron, unidad_base, factor in CONVERSIONES_CONOCIDAS:
+        conexion.execute(
+            sa.text("""
+                INSERT INTO "ConversionUnidad" ("IdUnidadMedida", "UnidadBase", "Factor")
+                SELECT "IdUnidadMedida", :unidad_base, :factor
+                FROM "UnidadMedida"
+                WHERE f_unaccent(lower(trim("NombreUnidadMedida"))) ~ :patron
+                ON CONFLICT ("IdUnidadMedida") DO NOTHING
+            """),
+            {"patron": patron, "unidad_base": unidad_base, "factor": factor}
+        )
+
+    # Precio por unidad base de los precios actuales (contenido vacío = 1 unidad)
+    op.execute("""
+        UPDATE "ProductoProveedor" pp
+        SET "UnidadBase" = c."UnidadBase",
+            "PrecioUnidadBase" = round(pp."Precio" / (c."Factor" * coalesce(p."CantidadContenido", 1)), 4)
+        FROM "Producto" p
+        JOIN "ConversionUnidad" c ON c."IdUnidadMedida" = p."IdUnidadMedida"
+        WHERE p."IdProducto" = pp."IdProducto"
+    """)
+
+    op.create_index(
+        'ix_productoproveedor_unidadbase_preciounidadbase',
+        'ProductoProveedor',
+        ['UnidadBase', 'PrecioUnidadBase']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_productoproveedor_unidadbase_preciounidadbase', table_name='ProductoProveedor')
+    op.drop_column('ProductoProveedor', 'PrecioUnidadBase')
+    op.drop_column('ProductoProveedor', 'UnidadBase')
+    op.drop_column('Producto', 'CantidadContenido')
+    op.drop_table('ConversionUnidad')
@@ -0,0 +1,195 @@
+"""
+Benchmark de precisión y rendimiento del cálculo de distancias a sucursales.
+
+Genera conjuntos sintéticos de sucursales (1k, 10k y 100k) alrededor de La Paz
+y de Santo Domingo y compara:
+
+- geopy geodesic (referencia exacta, una llamada por sucursal)
+- haversine escalar (una llamada por sucursal)
+- haversine vectorizado con NumPy (una llamada para todo el arreglo)
+- consulta "más cercana por proveedor" en el índice en memoria
+
+Con --rutas mide además el orden de visita (app.geo.ruta) resuelto en el
+propio proceso y en el pool de procesos, para fijar UMBRAL_POOL_PROCESOS.
+
+No usa la base de datos ni la red. Con la misma semilla los datos son
+idénticos entre corridas, así que los números se pueden comparar.
+
+Uso:
+    python scripts/benchmark_distancias.py
+    python scripts/benchmark_distancias.py --tamanos 1000 10000 --muestra-geodesica 5000
+    python scripts/benchmark_distancias.py --salida bench_output.json
+    python scripts/benchmark_distancias.py --tamanos 1000 --rutas 12 50 150 300
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from geopy.distance import geodesic
+
+# Añade el directorio raíz al path de Python
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.geo.distancia import haversine_escalar, haversine_km
+from app.geo.indice import IndiceSucursales, SucursalIndexada
+from app.geo.ruta import MAX_PROCESOS_RUTA, haversine_matriz_km, resolver_ruta
+
+
+# Centro y semiancho (grados) de cada zona sintética
+REGIONES = {
+    "la_paz": {"centro": (-16.5000, -68.1500), "semiancho": (0.25, 0.20)},
+    "santo_domingo": {"centro": (18.4861, -69.9312), "semiancho": (0.20, 0.30)},
+}
+TAMANOS = (1_000, 10_000, 100_000)
+PROVEEDORES = 20
+CONSULTAS = 200
+
+
+def generar_sucursales(region: str, n: int, semilla: int):
+    rng = np.random.default_rng(semilla)
+    (lat0, lng0), (dlat, dlng) = REGIONES[region]["centro"], REGIONES[region]["semiancho"]
+    lats = lat0 + rng.uniform(-dlat, dlat, n)
+    lngs = lng0 + rng.uniform(-dlng, dlng, n)
+    proveedores = rng.integers(1, PROVEEDORES + 1, n)
+    origenes = np.column_stack((
+        lat0 + rng.uniform(-dlat, dlat, CONSULTAS),
+        lng0 + rng.uniform(-dlng, dlng, CONSULTAS),
+    ))
+    return lats, lngs, proveedores, origenes
+
+
+def cronometrar(funcion, repeticiones: int = 3) -> float:
+    """Mejor tiempo (segundos) de varias repeticiones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def medir(region: str, n: int, semilla: int, muestra_geodesica: int) -> dict:
+    lats, lngs, proveedores, origenes = generar_sucursales(region, n, semilla)
+    lat, lng = origenes[0]
+    m = min(n, muestra_geodesica) if muestra_geodesica else n
+
+    # 1. Referencia exacta (sobre una muestra si n es muy grande)
+    inicio = time.perf_counter()
+    referencia = np.array([geodesic((lat, lng), (a, b)).km for a, b in zip(lats[:m], lngs[:m])])
+    t_geodesica = time.perf_counter() - inicio
+
+    # 2. Haversine escalar
+    t_escalar = cronometrar(
+        lambda: [haversine_escalar(lat, lng, a, b) for a, b in zip(lats.tolist(), lngs.tolist())],
+        repeticiones=1
+    )
+
+    # 3. Haversine vectorizado
+    t_vectorizado = cronometrar(lambda: haversine_km(lat, lng, lats, lngs), repeticiones=5)
+    vectorizado = haversine_km(lat, lng, lats, lngs)
+
+    error_abs = np.abs(vectorizado[:m] - referencia)
+    error_rel = error_abs / np.maximum(referencia, 1e-9)
+
+    # 4. Índice en memoria: más cercana por proveedor
+    indice = IndiceSucursales()
+    t_carga = cronometrar(lambda: indice.cargar(
+        SucursalIndexada(i, f"S{i}", a, b, int(p))
+        for i, (a, b, p) in enumerate(zip(lats.tolist(), lngs.tolist(), proveedores.tolist()))
+    ), repeticiones=1)
+    t_indice = cronometrar(
+        lambda: [indice.mas_cercana_por_proveedor(a, b) for a, b in origenes.tolist()],
+        repeticiones=1
+    )
+
+    return {
+        "region": region,
+        "sucursales": n,
+        "geodesica_pts_s": m / t_geodesica,
+        "haversine_escalar_pts_s": n / t_escalar,
+        "haversine_vectorizado_pts_s": n / t_vectorizado,
+        "error_max_km": float(error_abs.max()),
+        "error_max_relativo": float(error_rel.max()),
+        "muestra_error": m,
+        "indice_carga_s": t_carga,
+        "indice_consulta_ms": 1000 * t_indice / len(origenes),
+    }
+
+
+def medir_rutas(paradas: list, semilla: int) -> list:
+    """Milisegundos por ruta resuelta en el proceso y en el pool, por cantidad de paradas."""
+    rng = np.random.default_rng(semilla)
+    (lat0, lng0), (dlat, dlng) = REGIONES["la_paz"]["centro"], REGIONES["la_paz"]["semiancho"]
+    resultados = []
+    with ProcessPoolExecutor(max_workers=MAX_PROCESOS_RUTA) as pool:
+        pool.submit(resolver_ruta, np.zeros((1, 1))).result()  # Arranque del proceso fuera de la medición
+        for n in paradas:
+            matriz = haversine_matriz_km(
+                lat0 + rng.uniform(-dlat, dlat, n + 1), lng0 + rng.uniform(-dlng, dlng, n + 1)
+            )
+            t_local = cronometrar(lambda: resolver_ruta(matriz), repeticiones=5)
+            t_pool = cronometrar(lambda: pool.submit(resolver_ruta, matriz).result(), repeticiones=5)
+            resultados.append({"paradas": n, "local_ms": 1000 * t_local, "pool_ms": 1000 * t_pool})
+    return resultados
+
+
+def imprimir_rutas(resultados: list) -> None:
+    print(f"\n{'paradas':>8}{'local ms':>12}{'pool ms':>12}")
+    for r in resultados:
+        print(f"{r['paradas']:>8}{r['local_ms']:>12.2f}{r['pool_ms']:>12.2f}")
+
+
+def imprimir(resultados: list) -> None:
+    encabezado = (
+        f"{'región':<14}{'n':>8}{'geodesic pt/s':>15}{'hav. esc pt/s':>15}"
+        f"{'hav. vec pt/s':>15}{'err máx km':>12}{'err rel':>10}{'índice ms':>11}"
+    )
+    print(encabezado)
+    print("-" * len(encabezado))
+    for r in resultados:
+        print(
+            f"{r['region']:<14}{r['sucursales']:>8}"
+            f"{r['geodesica_pts_s']:>15,.0f}{r['haversine_escalar_pts_s']:>15,.0f}"
+            f"{r['haversine_vectorizado_pts_s']:>15,.0f}"
+            f"{r['error_max_km']:>12.4f}{r['error_max_relativo']:>10.2%}"
+            f"{r['indice_consulta_ms']:>11.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de distancias a sucursales")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS))
+    parser.add_argument("--regiones", nargs="+", choices=list(REGIONES), default=list(REGIONES))
+    parser.add_argument("--semilla", type=int, default=20250513)
+    parser.add_argument(
+        "--muestra-geodesica", type=int, default=0,
+        help="Limita la referencia geodésica a las primeras N sucursales (0 = todas)"
+    )
+    parser.add_argument("--rutas", type=int, nargs="*", help="Cantidades de paradas para medir el orden de visita")
+    parser.add_argument("--salida", help="Guarda los resultados en un archivo JSON")
+    args = parser.parse_args()
+
+    resultados = [
+        medir(region, n, args.semilla, args.muestra_geodesica)
+        for region in args.regiones
+        for n in args.tamanos
+    ]
+    imprimir(resultados)
+
+    if args.rutas:
+        rutas = medir_rutas(args.rutas, args.semilla)
+        imprimir_rutas(rutas)
+        resultados.append({"rutas": rutas})
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
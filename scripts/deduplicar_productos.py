@@ -0,0 +1,66 @@
+"""
+Genera propuestas de fusión de productos duplicados sobre todo el catálogo.
+
+Hace lo mismo que POST /propuestafusion/generar: bloquea por categoría, unidad
+y contenido, compara nombres normalizados y reemplaza las propuestas
+pendientes. Las propuestas se revisan y aplican desde la API, que es la que
+mantiene al día las estructuras en memoria.
+
+Uso:
+    python scripts/deduplicar_productos.py
+    python scripts/deduplicar_productos.py --umbral 0.9
+    python scripts/deduplicar_productos.py --mostrar 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Añade el directorio raíz al path de Python
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.models import Producto, PropuestaFusionProducto
+from app.catalogo.deduplicacion import UMBRAL_FUSION, generar_propuestas
+
+
+async def deduplicar(umbral: float, mostrar: int):
+    async with AsyncSessionLocal() as db:
+        cantidad = await generar_propuestas(db, umbral)
+        await db.commit()
+
+        conservar = Producto.__table__.alias("conservar")
+        duplicado = Producto.__table__.alias("duplicado")
+        result = await db.execute(
+            select(PropuestaFusionProducto.Puntaje, conservar.c.Nombre, duplicado.c.Nombre)
+            .join(conservar, conservar.c.IdProducto == PropuestaFusionProducto.IdProductoConservar)
+            .join(duplicado, duplicado.c.IdProducto == PropuestaFusionProducto.IdProductoDuplicado)
+            .where(PropuestaFusionProducto.Estado == "pendiente")
+            .order_by(PropuestaFusionProducto.Puntaje.desc())
+            .limit(mostrar)
+        )
+        return cantidad, result.all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propone fusiones de productos duplicados")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_FUSION, help="Puntaje mínimo entre 0.5 y 1")
+    parser.add_argument("--mostrar", type=int, default=20, help="Cuántas propuestas imprimir")
+    args = parser.parse_args()
+
+    if not 0.5 <= args.umbral <= 1:
+        print("❌ El umbral debe estar entre 0.5 y 1")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    cantidad, ejemplos = asyncio.run(deduplicar(args.umbral, args.mostrar))
+    print(f"Propuestas pendientes: {cantidad} ({time.perf_counter() - inicio:.1f} s)")
+    for puntaje, nombre_conservar, nombre_duplicado in ejemplos:
+        print(f"  {puntaje:.4f}  {nombre_duplicado!r} -> {nombre_conservar!r}")
+
+
+if __name__ == "__main__":
+    main()
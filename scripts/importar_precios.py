@@ -0,0 +1,78 @@
+"""
+Importa una hoja de precios (CSV o XLSX) directamente en la base de datos.
+
+Hace lo mismo que POST /productoproveedor/importar: valida por lotes, carga
+con COPY y hace upsert en ProductoProveedor; los precios anómalos quedan en
+PrecioCuarentena salvo que se use --sin-anomalias. Al terminar avisa con NOTIFY
+a la API en ejecución (ver app.precios.sincronizacion), que recarga la matriz
+de precios, los índices, las alertas y el planificador de ofertas igual que
+tras una importación por HTTP.
+
+Uso:
+    python scripts/importar_precios.py precios.csv
+    python scripts/importar_precios.py precios.xlsx --proveedor 4
+    python scripts/importar_precios.py precios.csv --errores errores.csv
+    python scripts/importar_precios.py precios.csv --sin-anomalias
+"""
+import argparse
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+# Añade el directorio raíz al path de Python
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database import AsyncSessionLocal
+from app.precios.importacion import TAMANO_LOTE, importar_precios
+from app.precios.sincronizacion import avisar_importacion
+
+
+async def importar(ruta: Path, id_proveedor, tamano_lote: int, revisar_anomalias: bool) -> dict:
+    async with AsyncSessionLocal() as db:
+        with open(ruta, "rb") as archivo:
+            resultado = await importar_precios(db, archivo, ruta.name, id_proveedor, tamano_lote, revisar_anomalias)
+
+        # La API en ejecución no ve estos cambios en memoria hasta que se le avisa
+        if resultado["Insertados"] or resultado["Actualizados"]:
+            await avisar_importacion(db)
+            await db.commit()
+        return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa una hoja de precios a ProductoProveedor")
+    parser.add_argument("archivo", type=Path, help="Archivo .csv o .xlsx")
+    parser.add_argument("--proveedor", type=int, help="IdProveedor para todas las filas")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--errores", type=Path, help="Guarda los errores por fila en un CSV")
+    parser.add_argument("--sin-anomalias", action="store_true", help="No retener precios anómalos en cuarentena")
+    args = parser.parse_args()
+
+    try:
+        resultado = asyncio.run(importar(args.archivo, args.proveedor, args.tamano_lote, not args.sin_anomalias))
+    except (ValueError, LookupError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"Filas leídas:      {resultado['FilasLeidas']}")
+    print(f"Filas válidas:     {resultado['FilasValidas']}")
+    print(f"Insertados:        {resultado['Insertados']}")
+    print(f"Actualizados:      {resultado['Actualizados']}")
+    print(f"Cambios de precio: {resultado['CambiosPrecio']}")
+    print(f"En cuarentena:     {resultado['EnCuarentena']}")
+    print(f"Errores:           {resultado['TotalErrores']}")
+
+    if args.errores and resultado["Errores"]:
+        with open(args.errores, "w", newline="", encoding="utf-8") as salida:
+            escritor = csv.DictWriter(salida, fieldnames=["Fila", "Error"])
+            escritor.writeheader()
+            escritor.writerows(resultado["Errores"])
+        print(f"\n✅ Errores guardados en {args.errores}")
+    elif resultado["Errores"]:
+        for error in resultado["Errores"][:20]:
+            print(f"  fila {error['Fila']}: {error['Error']}")
+
+
+if __name__ == "__main__":
+    main()